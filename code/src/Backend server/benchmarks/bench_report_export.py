@@ -0,0 +1,73 @@
+"""
+Benchmark: writing the analysed-transactions report.
+
+Builds a file shaped like assets/sample_transaction.csv with a Reason column and a share of
+anomalous rows, then times the Styler export update_csv_with_reasons used to do (a per-row
+callback testing membership in the ID list, then Styler.to_excel) against
+services.report_export.export_report (set membership, write-only workbook, CSV and XLSX in
+parallel threads). The Styler export is skipped above --styler-rows, where it takes minutes.
+
+Run from the backend folder:
+    python benchmarks/bench_report_export.py --rows 100000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.report_export import export_report
+
+SAMPLE_FILE = "assets/sample_transaction.csv"
+ANOMALY_RATE = 0.02
+
+
+def make_report(rows: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    sample = pd.read_csv(SAMPLE_FILE, index_col="Transaction ID")
+    df = sample.iloc[rng.integers(0, len(sample), rows)].copy()
+    df.index = pd.Index([f"TXN{i}" for i in range(rows)], name="Transaction ID")
+    anomaly_ids = df.index[rng.random(rows) < ANOMALY_RATE].tolist()
+    df["Reason"] = np.where(df.index.isin(anomaly_ids), "Flagged by the anomaly model", "")
+    return df, anomaly_ids
+
+
+def styler_export(df, anomaly_ids, output_csv, output_xlsx):
+    df.to_csv(output_csv, index=True)
+
+    def highlight_anomalies(row):
+        return ["background-color: yellow" if str(row.name) in anomaly_ids else "" for _ in row]
+
+    df.style.apply(highlight_anomalies, axis=1).to_excel(output_xlsx, index=True, engine="openpyxl")
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--styler-rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    df, anomaly_ids = make_report(args.rows)
+    print(f"{len(df)} rows x {len(df.columns)} columns, {len(anomaly_ids)} anomalies")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, xlsx_path = os.path.join(tmp, "report.csv"), os.path.join(tmp, "report.xlsx")
+        if args.rows <= args.styler_rows:
+            print(f"Styler export:    {timed(styler_export, df, anomaly_ids, csv_path, xlsx_path):8.2f} s")
+        else:
+            print(f"Styler export:    skipped above {args.styler_rows} rows")
+        print(f"Streaming export: {timed(export_report, df, anomaly_ids, csv_path, xlsx_path):8.2f} s "
+              f"({os.path.getsize(xlsx_path) / 2 ** 20:.1f} MB xlsx)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: online scoring latency for POST /score.
+
+Compares the sklearn path (DataFrame, apply_feature_plan, scaler, IsolationForest.decision_function)
+with scoring_service's compiled scorer on the same model, per request of 1 and 32 transactions,
+and checks both give identical scores.
+
+Run from the backend folder:
+    python benchmarks/bench_scoring.py --requests 500
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.anamoly_service import train_model
+from services.feature_pipeline import apply_feature_plan
+from services.model_cache import load_model
+from services.scoring_service import score_records
+
+SAMPLE_FILE = "assets/sample_transaction.csv"
+
+
+def sklearn_scores(records, saved_data):
+    df = pd.DataFrame(records).set_index("Transaction ID")
+    df = apply_feature_plan(df, saved_data["feature_plan"], saved_data["encoders"])
+    return saved_data["model"].decision_function(saved_data["scaler"].transform(df))
+
+
+def percentiles(func, batches):
+    timings = []
+    for batch in batches:
+        start = time.perf_counter()
+        func(batch)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, 50) * 1000, np.percentile(timings, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    records = pd.read_csv(SAMPLE_FILE).to_dict("records")
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.pkl")
+        train_model(SAMPLE_FILE, model_path=model_path)
+        saved_data = load_model(model_path)
+
+        compiled = [r["score"] for r in score_records(records, model_path)]
+        identical = np.allclose(compiled, sklearn_scores(records, saved_data), atol=1e-6)
+
+        for size in (1, 32):
+            batches = [[records[(i * size + j) % len(records)] for j in range(size)] for i in range(args.requests)]
+            sk50, sk99 = percentiles(lambda batch: sklearn_scores(batch, saved_data), batches)
+            cs50, cs99 = percentiles(lambda batch: score_records(batch, model_path), batches)
+            print(f"{size:>3} transaction(s)/request  sklearn p50 {sk50:6.2f} ms  p99 {sk99:6.2f} ms  |  "
+                  f"compiled p50 {cs50:5.2f} ms  p99 {cs99:5.2f} ms")
+    print(f"identical scores: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 from fastapi import FastAPI
-from routers import anamoly_detection, db_router, rule_router, create_rules
+from routers import (anamoly_detection, db_router, audit_router, rule_router, create_rules, job_router, scoring_router,
+                     profile_router)
+from services.job_service import recover_jobs
+from services.model_registry import warm_model_cache
+from services.scoring_service import get_scorer
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -16,8 +20,26 @@ app.add_middleware(
 # Include the router
 app.include_router(anamoly_detection.router)
 app.include_router(db_router.router)
+# Before rule_router, whose /download/{identifier} would otherwise take /download/audit_result
+app.include_router(audit_router.router)
 app.include_router(rule_router.router)
 app.include_router(create_rules.router)
+app.include_router(job_router.router)
+app.include_router(scoring_router.router)
+app.include_router(profile_router.router)
+
+@app.on_event("startup")
+def resume_jobs():
+    # Re-queue jobs persisted before a restart; ones that were mid-run are marked interrupted
+    print(recover_jobs())
+
+@app.on_event("startup")
+def warm_models():
+    # Deserialize (and compile for /score) the models most requests use before the first request arrives
+    warmed = warm_model_cache()
+    for model_path in warmed:
+        get_scorer(model_path)
+    print(f"Model cache warmed with {warmed}")
 
 # Run the application (if needed for local testing)
 if __name__ == "__main__":
@@ -1,26 +1,107 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import os
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, StrictInt
 import json
-from services.anamoly_service import train_model, detect_anomalies, analyze_anomalies
+from services.anamoly_service import (detect_anomalies, analyze_anomalies, ExplanationMode,
+                                      DEFAULT_MODEL_PARAMS, TRAINING_N_JOBS)
+from services.session_service import get_session_paths
+from services.pipeline_context import PipelineContext
+from services.pipeline_service import run_detection_pipeline
+from services.model_registry import (list_models, get_model, pin_baseline, delete_model,
+                                     register_trained_model, DRIFT_THRESHOLD)
+from services.model_cache import cache_stats
+from services.scoring_service import resolve_model
+from services.detectors import DetectorName, DEFAULT_DETECTOR, HBOSDetector
 
 router = APIRouter()
 
+class TrainingRequest(BaseModel):
+    session_id: Optional[str] = None
+    detector: DetectorName = DEFAULT_DETECTOR
+    # Detector hyperparameters; only the ones sent become part of the model's registry key.
+    # contamination applies to every detector, n_bins to hbos, the others to isolation_forest
+    n_estimators: StrictInt = DEFAULT_MODEL_PARAMS["n_estimators"]
+    contamination: Union[float, Literal["auto"]] = DEFAULT_MODEL_PARAMS["contamination"]
+    max_samples: Union[StrictInt, float, Literal["auto"]] = "auto"
+    max_features: Union[StrictInt, float] = 1.0
+    random_state: StrictInt = DEFAULT_MODEL_PARAMS["random_state"]
+    n_bins: StrictInt = HBOSDetector.DEFAULTS["n_bins"]
+    # Rows to fit on via reservoir sampling; large files are sampled automatically when omitted
+    sample_size: Optional[StrictInt] = None
+    n_jobs: StrictInt = TRAINING_N_JOBS
+    # Also fit one detector per segment of these columns, e.g. ["Country"]
+    segment_by: Optional[List[str]] = None
+    pin_as_baseline: bool = False
+
 @router.get('/initiate')
 def initiate():
-    return train_model("../Temp_files/transaction.csv")
+    # The historical dataset trains a registry model, which becomes the baseline unless one is already pinned
+    return register_trained_model("../Temp_files/transaction.csv")
 
 @router.get("/anamoly_detection_and_analysis")
-def anamoly_detection_and_analysis():
-    anomalies = detect_anomalies("../Temp_files/new_tran.csv")
-    return analyze_anomalies(anomalies, "../Temp_files/new_tran.csv")
+def anamoly_detection_and_analysis(session_id: Optional[str] = None,
+                                   model_id: Optional[str] = None,
+                                   explanation_mode: Optional[ExplanationMode] = None):
+    paths = get_session_paths(session_id, create=True)
+    # Uses an existing model (the requested one, else the baseline), as /score does; never trains
+    model_path = resolve_model(model_id, paths["session_id"])["path"]
+    # Detection and analysis share one parse of the file
+    context = PipelineContext(paths["new_transactions"])
+    anomalies = detect_anomalies(paths["new_transactions"], model_path=model_path, output_file=paths["analysed_xlsx"],
+                                 context=context)
+    return analyze_anomalies(anomalies["anomaly_ids"], paths["new_transactions"], model_path=model_path,
+                             output_csv=paths["analysed_csv"], output_xlsx=paths["analysed_xlsx"],
+                             explanation_mode=explanation_mode, context=context)
 
 @router.get("/anamoly_detection_pipeline")
-def anamoly_detection_and_analysis():
-    training_result = train_model("../Temp_files/new_tran.csv")
-    print("======================================")
-    print(training_result)
-    anomalies = detect_anomalies("../Temp_files/new_tran.csv")
-    print("======================================")
-    print(anomalies)
-    print("======================================")
-    return analyze_anomalies(anomalies['anomaly_ids'], "../Temp_files/new_tran.csv")
\ No newline at end of file
+def anamoly_detection_and_analysis(session_id: Optional[str] = None,
+                                   retrain: bool = False,
+                                   drift_threshold: float = DRIFT_THRESHOLD,
+                                   explanation_mode: Optional[ExplanationMode] = None,
+                                   detector: Optional[DetectorName] = None,
+                                   segment_by: Optional[List[str]] = Query(None)):
+    return run_detection_pipeline(get_session_paths(session_id, create=True), retrain=retrain, drift_threshold=drift_threshold,
+                                  explanation_mode=explanation_mode, detector=detector, segment_by=segment_by)
+
+@router.post("/models/train")
+def train_registered_model(request: TrainingRequest):
+    options = request.dict(exclude_unset=True)
+    paths = get_session_paths(options.pop("session_id", None), create=True)
+    sample_size = options.pop("sample_size", None)
+    n_jobs = options.pop("n_jobs", TRAINING_N_JOBS)
+    segment_by = options.pop("segment_by", None)
+    pin = options.pop("pin_as_baseline", False)
+    if not os.path.exists(paths["new_transactions"]):
+        raise HTTPException(status_code=404, detail="No transactions uploaded for this session")
+    try:
+        model = register_trained_model(paths["new_transactions"], params=options, sample_size=sample_size, n_jobs=n_jobs,
+                                       segment_by=segment_by, session_id=paths["session_id"])
+    except ValueError as e:
+        # Detectors (and sklearn) reject unknown or out-of-range hyperparameters with a ValueError
+        raise HTTPException(status_code=422, detail=str(e))
+    if pin:
+        pin_baseline(model["model_id"], paths["session_id"])
+    return model
+
+@router.get("/models")
+def get_models(session_id: Optional[str] = None):
+    # Each session has its own registry; without a session ID the default (shared) one
+    return list_models(session_id)
+
+@router.get("/models/cache")
+def get_model_cache():
+    return cache_stats()
+
+@router.get("/models/{model_id}")
+def get_model_by_id(model_id: str, session_id: Optional[str] = None):
+    return get_model(model_id, session_id)
+
+@router.post("/models/{model_id}/baseline")
+def pin_model_as_baseline(model_id: str, session_id: Optional[str] = None):
+    return pin_baseline(model_id, session_id)
+
+@router.delete("/models/{model_id}")
+def delete_model_by_id(model_id: str, session_id: Optional[str] = None):
+    return delete_model(model_id, session_id)
@@ -0,0 +1,43 @@
+import os
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from services.audit_service import run_audit
+from services.anamoly_service import ExplanationMode
+from services.detectors import DetectorName
+from services.model_registry import DRIFT_THRESHOLD
+from services.session_service import get_session_paths
+from services.stream_service import negotiate_format, negotiate_encoding, iter_csv_batches, stream_rows
+from services.report_service import serve_report
+
+router = APIRouter()
+
+@router.get("/audit/{identifier}")
+def audit_transactions(identifier: str,
+                       session_id: Optional[str] = None,
+                       retrain: bool = False,
+                       drift_threshold: float = DRIFT_THRESHOLD,
+                       explanation_mode: Optional[ExplanationMode] = None,
+                       detector: Optional[DetectorName] = None,
+                       segment_by: Optional[List[str]] = Query(None)):
+    # Validation against the identifier's rules and anomaly detection over one load of the data
+    return run_audit(get_session_paths(session_id, create=True), identifier, retrain=retrain, drift_threshold=drift_threshold,
+                     explanation_mode=explanation_mode, detector=detector, segment_by=segment_by)
+
+@router.get("/audit_results")
+def get_audit_results(request: Request, session_id: Optional[str] = None):
+    # Every transaction with its anomaly flag, reason and failed rules, streamed as JSON, NDJSON or Arrow
+    file_path = get_session_paths(session_id)["audit_csv"]
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Audit results not found")
+    columns, batches = iter_csv_batches(file_path)
+    return stream_rows(columns, ["TEXT"] * len(columns), batches,
+                       negotiate_format(request.headers.get("accept")),
+                       negotiate_encoding(request.headers.get("accept-encoding")),
+                       json_key="results")
+
+@router.get("/download/audit_result")
+def download_audit_results(request: Request, session_id: Optional[str] = None):
+    paths = get_session_paths(session_id)
+    # Built on the first download (202 until ready), then served with an ETag
+    return serve_report(paths["audit_xlsx"], 'audit_results.xlsx', request.headers.get("if-none-match"),
+                        session_id=paths["session_id"])
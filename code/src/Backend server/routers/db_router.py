@@ -1,9 +1,11 @@
-from http.client import HTTPException
-import os
-from fastapi import APIRouter, UploadFile
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, HTTPException, Query, Request
 from pydantic import BaseModel
-from services.db_services import get_rules, edit_rules, delete_rules, add_rules, get_transactions, edit_transactions, get_transactions_by_id, update_transactions_from_csv, delete_transactions, downloadTransactionCsv, get_analysed_transactions
-from fastapi.responses import FileResponse
+from services.db_services import get_rules, edit_rules, delete_rules, add_rules, get_transactions, edit_transactions, get_transactions_by_id, update_transactions_from_csv, upsert_transactions_from_csv, delete_transactions, downloadTransactionCsv, get_analysed_transactions, get_transactions_page
+from services.session_service import get_session_paths, delete_session
+from services.db_pool import pool_stats
+from services.stream_service import negotiate_format, negotiate_encoding, stream_table
+from services.report_service import serve_report
 
 
 
@@ -39,38 +41,99 @@ def delete_rule(rule_id: int):
 def update_rule(rule_id: int, update_request: UpdateRuleRequest):
     return {"message": edit_rules(rule_id, update_request.field_name, update_request.value)}
 
+def paged_transactions(table_name, db_path, limit, cursor, columns, filters, sort_by, sort_dir):
+    try:
+        return get_transactions_page(table_name, db_path=db_path, limit=limit or 50, cursor=cursor,
+                                     columns=columns.split(",") if columns else None,
+                                     filters=filters, sort_by=sort_by, sort_dir=sort_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def is_paged_request(limit, cursor, columns, filters, sort_by):
+    return any(value is not None for value in (limit, cursor, columns, filters, sort_by))
+
+def streamed_table(request, table_name, db_path):
+    """Streams the whole table when the client asks for NDJSON or Arrow, otherwise returns None."""
+    media_format = negotiate_format(request.headers.get("accept"))
+    if media_format == "json":
+        return None
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    return stream_table(db_path, table_name, media_format, encoding)
+
 @router.get("/dbgetTransaction")
-def get_all_transactions():
-    return {"transactions": get_transactions()}
+def get_all_transactions(request: Request, session_id: Optional[str] = None, limit: Optional[int] = None,
+                         cursor: Optional[str] = None, columns: Optional[str] = None,
+                         filters: Optional[List[str]] = Query(None, alias="filter"),
+                         sort_by: Optional[str] = None, sort_dir: str = "asc"):
+    paths = get_session_paths(session_id)
+    # Without paging parameters keep returning the full table as before
+    if is_paged_request(limit, cursor, columns, filters, sort_by):
+        return paged_transactions("transactions", paths["transaction_db"], limit, cursor, columns, filters, sort_by, sort_dir)
+    streamed = streamed_table(request, "transactions", paths["transaction_db"])
+    if streamed is not None:
+        return streamed
+    return {"transactions": get_transactions(db_path=paths["transaction_db"])}
 
 @router.get("/dbgetTransactionById/{transaction_id}")
-def get_transaction_by_id(transaction_id: str):
-    return {"transactions": get_transactions_by_id(transaction_id)}
+def get_transaction_by_id(transaction_id: str, session_id: Optional[str] = None):
+    paths = get_session_paths(session_id)
+    return {"transactions": get_transactions_by_id(transaction_id, db_path=paths["transaction_db"])}
 
 @router.post("/uploadTransactionCSV/{analysed}")
-async def upload_transaction_csv(analysed: int):
-    return {"message": update_transactions_from_csv(analysed=analysed)}
+async def upload_transaction_csv(analysed: int, session_id: Optional[str] = None,
+                                 mode: str = "replace", delete_missing: bool = False):
+    paths = get_session_paths(session_id, create=True)
+    if mode == "upsert":
+        return upsert_transactions_from_csv(analysed=analysed, db_path=paths["transaction_db"],
+                                            new_transactions_file=paths["new_transactions"],
+                                            analysed_file=paths["analysed_csv"],
+                                            delete_missing=delete_missing)
+    if mode != "replace":
+        raise HTTPException(status_code=400, detail=f"Unsupported ingest mode: {mode}")
+    return {"message": update_transactions_from_csv(analysed=analysed, db_path=paths["transaction_db"],
+                                                    new_transactions_file=paths["new_transactions"],
+                                                    analysed_file=paths["analysed_csv"])}
 
 @router.put("/dbupdateTransaction/{transaction_id}")
-def update_transaction(transaction_id: str, update_request: UpdateTransactionRequest):
-    return {"message": edit_transactions(transaction_id, update_request.field_name, update_request.value)}
+def update_transaction(transaction_id: str, update_request: UpdateTransactionRequest, session_id: Optional[str] = None):
+    paths = get_session_paths(session_id, create=True)
+    return {"message": edit_transactions(transaction_id, update_request.field_name, update_request.value, db_path=paths["transaction_db"])}
 
 @router.delete("/dbdelete")
-def delete_transaction():
-    return {"message": delete_transactions()}
+def delete_transaction(session_id: Optional[str] = None):
+    paths = get_session_paths(session_id, create=True)
+    return {"message": delete_transactions(db_path=paths["transaction_db"])}
 
 @router.get("/dbanalysedTransaction")
-def get_all_analysed_transactions():
-    return {"transactions": get_analysed_transactions()}
+def get_all_analysed_transactions(request: Request, session_id: Optional[str] = None, limit: Optional[int] = None,
+                                  cursor: Optional[str] = None, columns: Optional[str] = None,
+                                  filters: Optional[List[str]] = Query(None, alias="filter"),
+                                  sort_by: Optional[str] = None, sort_dir: str = "asc"):
+    paths = get_session_paths(session_id)
+    if is_paged_request(limit, cursor, columns, filters, sort_by):
+        return paged_transactions("analysed_transaction", paths["transaction_db"], limit, cursor, columns, filters, sort_by, sort_dir)
+    streamed = streamed_table(request, "analysed_transaction", paths["transaction_db"])
+    if streamed is not None:
+        return streamed
+    return {"transactions": get_analysed_transactions(db_path=paths["transaction_db"])}
 
 @router.get("/downloadTransactionCSV")
-def download_transaction_csv():
-    return {"message": downloadTransactionCsv()}
+def download_transaction_csv(session_id: Optional[str] = None):
+    paths = get_session_paths(session_id)
+    return {"message": downloadTransactionCsv(file_path=paths["analysed_xlsx"])}
+
+@router.get("/dbhealth")
+def get_db_health():
+    return {"pools": pool_stats()}
+
+@router.delete("/session/{session_id}")
+def delete_session_data(session_id: str):
+    return {"message": delete_session(session_id)}
 
 
 @router.get("/download/anamoly_result")
-async def download_validation_results():
-    file_path = f'../Temp_files/analysed_transaction.xlsx'
-    if os.path.exists(file_path):
-        return FileResponse(file_path, filename=f'anamoly_results.xlsx')
-    raise HTTPException(status_code=404, detail="File not found")
+def download_validation_results(request: Request, session_id: Optional[str] = None):
+    paths = get_session_paths(session_id)
+    # Built on the first download (202 until ready), then served with an ETag
+    return serve_report(paths["analysed_xlsx"], 'anamoly_results.xlsx', request.headers.get("if-none-match"),
+                        session_id=paths["session_id"])
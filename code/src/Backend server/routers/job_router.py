@@ -0,0 +1,177 @@
+import json
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from services.anamoly_service import enrich_explanations, ExplanationMode
+from services.model_registry import DRIFT_THRESHOLD
+from services.pipeline_service import run_detection_pipeline
+from services.audit_service import run_audit
+from services.profile_service import get_profile
+from services.report_service import build_report
+from services.detectors import DetectorName
+from services.session_service import get_session_paths
+from services.sql_executor import SQLiteValidator
+from services.job_service import (register_job, submit_job, get_job, get_job_result, list_jobs, cancel_job,
+                                  progress_snapshot, FINISHED_STATUSES)
+
+router = APIRouter()
+
+# Server-sent events: how often job state is checked, and the heartbeat for idle streams
+EVENT_POLL_INTERVAL = 0.5
+EVENT_HEARTBEAT_INTERVAL = 10.0
+
+class PDFRequest(BaseModel):
+    file_path: str
+    output_file: str
+
+
+def run_anomaly_pipeline(params, context):
+    return run_detection_pipeline(get_session_paths(params.get("session_id"), create=True), retrain=params.get("retrain", False),
+                                  drift_threshold=params.get("drift_threshold", DRIFT_THRESHOLD),
+                                  explanation_mode=params.get("explanation_mode"), detector=params.get("detector"),
+                                  segment_by=params.get("segment_by"), report=context.report)
+
+
+def run_validation(params, context):
+    paths = get_session_paths(params.get("session_id"), create=True)
+    identifier = params["identifier"]
+    validator = SQLiteValidator(paths["transaction_db"])
+    context.report("validate", 0.0)
+    results = validator.validate_data(f'../Database/rules/{identifier}.json', identifier=identifier,
+                                      output_file=f'{paths["output_dir"]}/{identifier}.csv',
+                                      excel_output_file=f'{paths["output_dir"]}/{identifier}.xlsx',
+                                      original_file=paths["new_transactions"],
+                                      progress_callback=lambda done, total, rows: context.report(
+                                          "validate", done / total if total else 0.0,
+                                          rules_completed=done, total_rules=total,
+                                          rows_processed=done * rows))
+    context.check_cancelled()
+    if "error" in results:
+        raise RuntimeError(results["error"])
+    results["session_id"] = paths["session_id"]
+    return results
+
+
+def run_audit_job(params, context):
+    return run_audit(get_session_paths(params.get("session_id"), create=True), params["identifier"],
+                     retrain=params.get("retrain", False),
+                     drift_threshold=params.get("drift_threshold", DRIFT_THRESHOLD),
+                     explanation_mode=params.get("explanation_mode"), detector=params.get("detector"),
+                     segment_by=params.get("segment_by"), report=context.report)
+
+
+def run_profiling(params, context):
+    paths = get_session_paths(params.get("session_id"))
+    context.report("profile", 0.0)
+    profile = get_profile(paths["new_transactions"], refresh=params.get("refresh", False),
+                          progress_callback=lambda rows: context.report("profile", None, rows_processed=rows))
+    profile["session_id"] = paths["session_id"]
+    return profile
+
+
+def run_rule_generation(params, context):
+    # Imported lazily: both generators build LLM clients on construction
+    from services.pdf_rule_generator import DocumentProcessor
+    from services.sql_query_generator import SQLiteQueryGenerator
+
+    context.report("extract_rules", 0.0)
+    processor = DocumentProcessor(model_name="gemini-2.0-flash")
+    processor.process_document(params["file_path"])
+    context.report("generate_sql", 0.5)
+    generator = SQLiteQueryGenerator(model_name="gemini-2.0-flash", output_file=params["output_file"])
+    results = generator.process_rules()
+    print(f"Summary: {json.dumps(results, indent=2)}")
+    return {"message": "Rules generated successfully", "results": results}
+
+
+register_job("anamoly_detection_pipeline", run_anomaly_pipeline)
+register_job("validate_rules", run_validation)
+register_job("audit", run_audit_job)
+register_job("profile_dataset", run_profiling)
+register_job("generate_rules", run_rule_generation)
+register_job("enrich_explanations", enrich_explanations)
+register_job("build_report", build_report)
+
+
+@router.post("/jobs/anamoly_detection_pipeline")
+def submit_anomaly_pipeline(session_id: Optional[str] = None,
+                            retrain: bool = False,
+                            drift_threshold: float = DRIFT_THRESHOLD,
+                            explanation_mode: Optional[ExplanationMode] = None,
+                            detector: Optional[DetectorName] = None,
+                            segment_by: Optional[List[str]] = Query(None)):
+    session_id = get_session_paths(session_id)["session_id"]
+    return submit_job("anamoly_detection_pipeline",
+                      {"session_id": session_id, "retrain": retrain, "drift_threshold": drift_threshold,
+                       "explanation_mode": explanation_mode, "detector": detector, "segment_by": segment_by},
+                      session_id=session_id)
+
+@router.post("/jobs/rules/validate/{identifier}")
+def submit_validation(identifier: str, session_id: Optional[str] = None):
+    session_id = get_session_paths(session_id)["session_id"]
+    return submit_job("validate_rules", {"identifier": identifier, "session_id": session_id}, session_id=session_id)
+
+@router.post("/jobs/audit/{identifier}")
+def submit_audit(identifier: str,
+                 session_id: Optional[str] = None,
+                 retrain: bool = False,
+                 drift_threshold: float = DRIFT_THRESHOLD,
+                 explanation_mode: Optional[ExplanationMode] = None,
+                 detector: Optional[DetectorName] = None,
+                 segment_by: Optional[List[str]] = Query(None)):
+    session_id = get_session_paths(session_id)["session_id"]
+    return submit_job("audit",
+                      {"identifier": identifier, "session_id": session_id, "retrain": retrain,
+                       "drift_threshold": drift_threshold, "explanation_mode": explanation_mode,
+                       "detector": detector, "segment_by": segment_by},
+                      session_id=session_id)
+
+@router.post("/jobs/profile")
+def submit_profiling(session_id: Optional[str] = None, refresh: bool = False):
+    session_id = get_session_paths(session_id)["session_id"]
+    return submit_job("profile_dataset", {"session_id": session_id, "refresh": refresh}, session_id=session_id)
+
+@router.post("/jobs/generate/rules")
+def submit_rule_generation(request: PDFRequest):
+    return submit_job("generate_rules", {"file_path": request.file_path, "output_file": request.output_file})
+
+@router.get("/jobs")
+def get_jobs(session_id: Optional[str] = None, limit: int = 50):
+    return {"jobs": list_jobs(session_id, limit)}
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    return get_job(job_id)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    get_job(job_id)
+
+    async def events():
+        last_state = None
+        idle_time = 0.0
+        while not await request.is_disconnected():
+            job = await run_in_threadpool(progress_snapshot, job_id)
+            state = (job["status"], job["stage"], job["progress"], json.dumps(job.get("details")))
+            if state != last_state or idle_time >= EVENT_HEARTBEAT_INTERVAL:
+                event = "done" if job["status"] in FINISHED_STATUSES else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job, default=str)}\n\n"
+                last_state, idle_time = state, 0.0
+                if event == "done":
+                    break
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+            idle_time += EVENT_POLL_INTERVAL
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/jobs/{job_id}/result")
+def get_job_output(job_id: str):
+    return get_job_result(job_id)
+
+@router.delete("/jobs/{job_id}")
+def cancel_job_by_id(job_id: str):
+    return cancel_job(job_id)
@@ -0,0 +1,14 @@
+from typing import Optional
+from fastapi import APIRouter
+from services.profile_service import get_profile
+from services.session_service import get_session_paths
+
+router = APIRouter()
+
+@router.get("/profile")
+def get_dataset_profile(session_id: Optional[str] = None, refresh: bool = False):
+    # Per-column profile of the session's transactions, computed once per dataset content
+    paths = get_session_paths(session_id)
+    profile = get_profile(paths["new_transactions"], refresh=refresh)
+    profile["session_id"] = paths["session_id"]
+    return profile
@@ -1,10 +1,12 @@
-from http.client import HTTPException
 import json
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
 import os
+from typing import Optional
 from services.rule_services import get_rules, edit_rule, delete_rule
 from services.sql_executor import SQLiteValidator
+from services.session_service import get_session_paths
+from services.stream_service import negotiate_format, negotiate_encoding, iter_csv_batches, stream_rows
+from services.report_service import serve_report
 from pydantic import BaseModel
 
 class UpdateRuleRequest(BaseModel):
@@ -34,20 +36,38 @@ def delete_rule_by_identifier(identifier: str, rule_id: str):
 
 
 @router.get("/rules/validate/{identifier}")
-def validate_rules_by_identifier(identifier: str):
+def validate_rules_by_identifier(identifier: str, session_id: Optional[str] = None):
     try:
+        paths = get_session_paths(session_id, create=True)
         file_path = f'../Database/rules/{identifier}.json'
-        validator = SQLiteValidator("../Database/transaction.db")
-        results = validator.validate_data(file_path, identifier=identifier,output_file= f'../Database/{identifier}.csv',excel_output_file= f'../Database/{identifier}.xlsx')
+        validator = SQLiteValidator(paths["transaction_db"])
+        results = validator.validate_data(file_path, identifier=identifier,
+                                          output_file=f'{paths["output_dir"]}/{identifier}.csv',
+                                          excel_output_file=f'{paths["output_dir"]}/{identifier}.xlsx',
+                                          original_file=paths["new_transactions"])
+        results["session_id"] = paths["session_id"]
         print(json.dumps(results, indent=2))
         return results
     except Exception as e:
         print(f"Validation failed: {e}")
 
 
+@router.get("/rules/results/{identifier}")
+def get_validation_failures(identifier: str, request: Request, session_id: Optional[str] = None):
+    # Per-transaction rule failures from the last validation run, streamed as JSON, NDJSON or Arrow
+    file_path = f'{get_session_paths(session_id)["output_dir"]}/{identifier}.csv'
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Validation results not found")
+    columns, batches = iter_csv_batches(file_path)
+    return stream_rows(columns, ["TEXT"] * len(columns), batches,
+                       negotiate_format(request.headers.get("accept")),
+                       negotiate_encoding(request.headers.get("accept-encoding")),
+                       json_key="results")
+
+
 @router.get("/download/{identifier}")
-async def download_validation_results(identifier: str):
-    file_path = f'../Database/{identifier}.xlsx'
-    if os.path.exists(file_path):
-        return FileResponse(file_path, filename=f'{identifier}_validation_results.xlsx')
-    raise HTTPException(status_code=404, detail="File not found")
+def download_validation_results(identifier: str, request: Request, session_id: Optional[str] = None):
+    paths = get_session_paths(session_id)
+    # Built on the first download (202 until ready), then served with an ETag
+    return serve_report(f'{paths["output_dir"]}/{identifier}.xlsx', f'{identifier}_validation_results.xlsx',
+                        request.headers.get("if-none-match"), session_id=paths["session_id"])
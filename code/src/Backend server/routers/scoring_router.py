@@ -0,0 +1,32 @@
+import time
+from typing import Any, Dict, List, Optional, Union
+from fastapi import APIRouter, Body, HTTPException
+from services.scoring_service import batcher, resolve_model, MAX_RECORDS_PER_REQUEST
+
+router = APIRouter()
+
+@router.post("/score")
+async def score(transactions: Union[Dict[str, Any], List[Dict[str, Any]]] = Body(...),
+                model_id: Optional[str] = None,
+                session_id: Optional[str] = None):
+    # Accepts one transaction object or a list of them, with the same columns as the uploaded CSV
+    start = time.perf_counter()
+    records = [transactions] if isinstance(transactions, dict) else transactions
+    if not records:
+        raise HTTPException(status_code=422, detail="No transactions to score")
+    if len(records) > MAX_RECORDS_PER_REQUEST:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {MAX_RECORDS_PER_REQUEST} transactions per request, "
+                                   f"use the anomaly detection pipeline for files")
+    model = resolve_model(model_id, session_id)
+    results = await batcher.score(records, model["path"])
+    return {
+        "model_id": model["model_id"],
+        "results": results,
+        "anomalies": sum(result["is_anomaly"] for result in results),
+        "latency_ms": round((time.perf_counter() - start) * 1000, 3)
+    }
+
+@router.get("/score/stats")
+def score_stats():
+    return batcher.stats()
@@ -1,12 +1,23 @@
-import re
 import os
 import json
+import tempfile
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sklearn.ensemble import IsolationForest
+from typing import Literal, get_args
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 import joblib
+from joblib import parallel_config
+from services.stage_metrics import StageRecorder
+from services.pipeline_context import PipelineContext
+from services.report_export import export_report
+from services.report_service import defer_report, discard_report, REPORT_GENERATION
+from services.feature_pipeline import build_feature_plan, apply_feature_plan, encoded_columns, category_texts
+from services.detectors import (make_detector, resolve_model_params, detector_name, DEFAULT_MODEL_PARAMS,
+                                DETECTOR_LABELS)
+from services.segmentation import segment_keys, fit_segment_models, route, MIN_SEGMENT_ROWS
+from services.explanation_service import explain_with_llm, template_explanations
+from services.job_service import submit_job
 import google.generativeai as genai
 from google.generativeai import GenerativeModel
 from dotenv import load_dotenv
@@ -15,105 +26,376 @@ from dotenv import load_dotenv
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Validate API key
-if not API_KEY:
-    raise ValueError(
-        " Missing Gemini API key. Make sure it's set in the .env file.")
-
-# Configure Gemini API
-genai.configure(api_key=API_KEY)
+# Configure Gemini API; without a key only template explanations are available (see EXPLANATION_MODES)
+if API_KEY:
+    genai.configure(api_key=API_KEY)
 
 # File paths
 MODEL_PATH = "./models/anomoly_detection_model.pkl"
+ANALYSED_CSV_PATH = "../Temp_files/analysed_transaction.csv"
+ANALYSED_XLSX_PATH = "../Temp_files/analysed_transaction.xlsx"
 gemini_model = genai.GenerativeModel("gemini-1.5-pro")
 
-def train_model(file_path):
-    start_time = datetime.now()
-    
-    df = pd.read_csv(file_path, index_col="Transaction ID")  
-    df.fillna("Unknown", inplace=True)
-
-    # Encode categorical features
-    label_encoders = {}
-    categorical_cols = df.select_dtypes(include=['object']).columns
+# How anomaly reasons are written:
+# - "llm": Gemini explains every anomaly (the original behaviour)
+# - "template": local templates built from the structured differences; no network, works air-gapped
+# - "template_then_llm": templates are returned at once and a background job enriches them with Gemini
+ExplanationMode = Literal["llm", "template", "template_then_llm"]
+EXPLANATION_MODES = get_args(ExplanationMode)
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "llm")
+
+# Column profiles stored with the model in place of the training data
+PROFILE_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+TOP_CATEGORIES = 20
+# Categories rarer than this in training are "unusual"; columns whose distinct values exceed
+# ID_LIKE_CARDINALITY of the rows are identifiers and are not explained category by category
+RARE_CATEGORY_FREQUENCY = 0.01
+ID_LIKE_CARDINALITY = 0.5
+
+# Large-file training: files over LARGE_FILE_BYTES (or any file given a sample_size) are streamed in
+# TRAINING_CHUNK_ROWS chunks and the forest is fitted on a uniform reservoir sample of the rows.
+# Column statistics still cover every row; category counts are kept up to MAX_TRACKED_CATEGORIES per column.
+LARGE_FILE_BYTES = 256 * 1024 * 1024
+TRAINING_SAMPLE_ROWS = 200_000
+TRAINING_CHUNK_ROWS = 100_000
+MAX_TRACKED_CATEGORIES = 100_000
+# Isolation Forest trees are built on all cores; the resulting forest is identical to a single-core fit
+TRAINING_N_JOBS = -1
+
+def build_column_profiles(df, categorical_cols):
+    """
+    Summarises each training column in a few numbers so explanations never need the data itself:
+    numeric columns keep mean, std, min/max and quantiles; categorical columns keep cardinality
+    and the most frequent categories with their relative frequencies.
+    """
+    profiles = {}
+    for col in df.columns:
+        if col in categorical_cols:
+            frequencies = df[col].astype(str).value_counts(normalize=True)
+            profiles[col] = {
+                "type": "categorical",
+                "cardinality": int(len(frequencies)),
+                "id_like": bool(len(frequencies) > ID_LIKE_CARDINALITY * len(df)),
+                "top_categories": {str(k): round(float(v), 6) for k, v in frequencies.head(TOP_CATEGORIES).items()},
+            }
+        else:
+            values = pd.to_numeric(df[col], errors="coerce")
+            quantiles = values.quantile(PROFILE_QUANTILES)
+            profiles[col] = {
+                "type": "numeric",
+                "mean": float(values.mean()),
+                "std": float(values.std()),
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "quantiles": {str(q): float(v) for q, v in quantiles.items()},
+            }
+    return profiles
 
+def encode_categoricals(df, label_encoders):
+    # Maps categorical columns onto the training encoders; unseen values and columns become -1.
+    # Columns encoded at training time stay categorical even if this file happens to parse them as numbers.
+    object_cols = set(df.select_dtypes(include=['object']).columns)
+    categorical_cols = [col for col in df.columns if col in object_cols or col in label_encoders]
     for col in categorical_cols:
         df[col] = df[col].astype(str)
-        le = LabelEncoder()
-        df[col] = le.fit_transform(df[col])
-        label_encoders[col] = le
+        if col in label_encoders:
+            # Categorical codes against the encoder's sorted classes_ are exactly le.transform(); unknowns get -1
+            df[col] = pd.Categorical(df[col], categories=label_encoders[col].classes_).codes.astype(np.int64)
+        else:
+            df[col] = -1
+    return df
+
+def prepare_features(df, saved_data):
+    """Raw transactions to the model's feature frame, using the feature plan saved with the model."""
+    plan = saved_data.get("feature_plan")
+    if plan is None:
+        # Models from before feature plans label encoded every object column as is
+        df = df.fillna("Unknown")
+        return encode_categoricals(df[list(saved_data["scaler"].feature_names_in_)], saved_data["encoders"])
+    return apply_feature_plan(df, plan, saved_data["encoders"])
+
+def profiled_categoricals(plan, categorical_cols):
+    # Object columns the plan parses as numbers are profiled (and explained) as numbers; dates stay categories,
+    # and integer code columns the plan encodes are profiled as categories even when read as numbers
+    return {col for col, spec in plan["columns"].items()
+            if (col in categorical_cols and spec["kind"] != "numeric") or spec["kind"] in ("categorical", "hashed")}
+
+def resolve_sample_size(file_path, sample_size=None):
+    """Rows to fit on: an explicit sample_size, TRAINING_SAMPLE_ROWS for large files, else None (every row)."""
+    if sample_size:
+        return int(sample_size)
+    if os.path.getsize(file_path) > LARGE_FILE_BYTES:
+        return TRAINING_SAMPLE_ROWS
+    return None
+
+def _merge_moments(moments, values):
+    # Chan et al. parallel update of count / mean / sum of squared deviations, plus min and max
+    values = values.dropna().to_numpy(dtype=np.float64)
+    if not len(values):
+        return moments
+    count, mean = len(values), values.mean()
+    m2 = ((values - mean) ** 2).sum()
+    if moments is None:
+        return {"count": count, "mean": mean, "m2": m2, "min": values.min(), "max": values.max()}
+    total = moments["count"] + count
+    delta = mean - moments["mean"]
+    return {
+        "count": total,
+        "mean": moments["mean"] + delta * count / total,
+        "m2": moments["m2"] + m2 + delta ** 2 * moments["count"] * count / total,
+        "min": min(moments["min"], values.min()),
+        "max": max(moments["max"], values.max()),
+    }
 
-    # Normalize numerical features
-    scaler = StandardScaler()
-    df_scaled = scaler.fit_transform(df)
+def stream_training_sample(file_path, sample_size, chunk_size=TRAINING_CHUNK_ROWS, random_state=None):
+    """
+    Reads the CSV once in chunks and keeps a uniform random sample of `sample_size` rows
+    (reservoir sampling, Algorithm R, vectorised per chunk), so the full file is never in memory.
 
-    # Train Isolation Forest
-    iso_forest = IsolationForest(n_estimators=100, contamination=0.02, random_state=42)
-    iso_forest.fit(df_scaled)  # Training step
+    Alongside the sample it gathers statistics over every row: which columns are categorical
+    (any non-numeric or missing value, matching train_model's fillna("Unknown")), running
+    moments for numeric columns and category counts for categorical ones.
+    Returns (sample DataFrame with raw string values, stats dict).
+    """
+    rng = np.random.default_rng(random_state)
+    columns, sample_values, sample_index = None, None, None
+    seen = 0
+    categorical, moments, counts = set(), {}, {}
+
+    for chunk in pd.read_csv(file_path, index_col="Transaction ID", dtype=str, chunksize=chunk_size):
+        if columns is None:
+            columns = list(chunk.columns)
+            sample_values = np.empty((sample_size, len(columns)), dtype=object)
+            sample_index = np.empty(sample_size, dtype=object)
+
+        for col in columns:
+            values = chunk[col]
+            if col not in categorical:
+                numbers = pd.to_numeric(values, errors="coerce")
+                if numbers.isna().any():
+                    categorical.add(col)
+                else:
+                    moments[col] = _merge_moments(moments.get(col), numbers)
+            if counts.get(col, 0) is not None:
+                chunk_counts = values.fillna("Unknown").value_counts()
+                merged = chunk_counts if col not in counts else counts[col].add(chunk_counts, fill_value=0)
+                # Identifier-like columns stop being counted once they pass the cap
+                counts[col] = merged if len(merged) <= MAX_TRACKED_CATEGORIES else None
+
+        rows, index = chunk.to_numpy(dtype=object), chunk.index.to_numpy(dtype=object)
+        fill = min(max(sample_size - seen, 0), len(rows))
+        sample_values[seen:seen + fill], sample_index[seen:seen + fill] = rows[:fill], index[:fill]
+        if fill < len(rows):
+            # Row i (0-based over the whole file) replaces a random slot j in [0, i] when j < sample_size
+            positions = seen + np.arange(fill, len(rows))
+            slots = rng.integers(0, positions + 1)
+            chosen = np.flatnonzero(slots < sample_size) + fill
+            # When several rows of a chunk draw the same slot the last one wins, as in a row-by-row pass
+            chosen_slots = slots[chosen - fill]
+            _, last = np.unique(chosen_slots[::-1], return_index=True)
+            chosen, chosen_slots = chosen[::-1][last], chosen_slots[::-1][last]
+            sample_values[chosen_slots], sample_index[chosen_slots] = rows[chosen], index[chosen]
+        seen += len(rows)
+
+    if columns is None:
+        raise ValueError(f"No transactions found in {file_path}")
+    kept = min(seen, sample_size)
+    sample = pd.DataFrame(sample_values[:kept], columns=columns,
+                          index=pd.Index(sample_index[:kept], name="Transaction ID"))
+    for col in columns:
+        if col in categorical:
+            sample[col] = sample[col].fillna("Unknown")
+        else:
+            sample[col] = pd.to_numeric(sample[col])
+    categorical_cols = [col for col in columns if col in categorical]
+    # Columns that turned out categorical in a later chunk drop the moments gathered before that
+    return sample, {"rows": seen, "categorical_columns": categorical_cols,
+                    "moments": {col: moment for col, moment in moments.items() if col not in categorical},
+                    "category_counts": {col: counts[col] for col in categorical_cols}}
+
+def _profiles_from_stream(sample, stats, categorical_cols):
+    """Column profiles from the sample, with every statistic the stream saw exactly replaced by the exact value."""
+    profiles = build_column_profiles(sample, categorical_cols)
+    rows = stats["rows"]
+    for col, moment in stats["moments"].items():
+        profiles[col].update({
+            "mean": float(moment["mean"]),
+            "std": float(np.sqrt(moment["m2"] / (moment["count"] - 1))) if moment["count"] > 1 else float("nan"),
+            "min": float(moment["min"]),
+            "max": float(moment["max"]),
+        })
+    for col, col_counts in stats["category_counts"].items():
+        if col_counts is None or col not in categorical_cols:
+            continue
+        frequencies = col_counts.sort_values(ascending=False, kind="stable") / rows
+        profiles[col].update({
+            "cardinality": int(len(frequencies)),
+            "id_like": bool(len(frequencies) > ID_LIKE_CARDINALITY * rows),
+            "top_categories": {str(k): round(float(v), 6) for k, v in frequencies.head(TOP_CATEGORIES).items()},
+        })
+    return profiles
+
+def train_model(file_path, model_path=MODEL_PATH, params=None, sample_size=None, n_jobs=TRAINING_N_JOBS,
+                segment_by=None, min_segment_rows=MIN_SEGMENT_ROWS, data=None):
+    """
+    Fits the scaler, encoders and anomaly detector on `file_path` and saves them to `model_path`.
+    The detector is params["detector"] (see services.detectors), an Isolation Forest by default.
+    With a sample_size (automatic for files over LARGE_FILE_BYTES) the file is streamed and the
+    forest is fitted on a reservoir sample; encoders still know every counted category.
+    Columns become features through a feature plan (see feature_pipeline.build_feature_plan),
+    which drops identifiers and parses numbers and dates, and is saved with the model.
+    With segment_by (e.g. ["Country"]) a detector is also fitted per segment of at least min_segment_rows
+    rows, in parallel processes (see services.segmentation); the global detector scores the other rows.
+    Wall time and peak memory of every stage are returned in the training metadata.
+    `data` is the file already parsed by the caller (see PipelineContext), used unless the file is streamed.
+    """
+    start_time = datetime.now()
+    params = resolve_model_params(params)
+    sample_size = resolve_sample_size(file_path, sample_size)
+    stages = StageRecorder()
+    if segment_by:
+        # Checked on the header so a typo fails before the file is read
+        segment_keys(pd.read_csv(file_path, index_col="Transaction ID", nrows=0), segment_by)
+
+    label_encoders = {}
+    if sample_size:
+        with stages.stage("stream_sample") as stage:
+            df, stats = stream_training_sample(file_path, sample_size, random_state=params.get("random_state"))
+            stage["rows"] = stats["rows"]
+        keys = segment_keys(df, segment_by) if segment_by else None
+        total_transactions = stats["rows"]
+        categorical_cols = stats["categorical_columns"]
+        with stages.stage("plan"):
+            feature_plan = build_feature_plan(df, set(categorical_cols), stats["category_counts"], stats["moments"])
+        with stages.stage("profile"):
+            profiles = _profiles_from_stream(df, stats, profiled_categoricals(feature_plan, categorical_cols))
+        with stages.stage("encode"):
+            for col in encoded_columns(feature_plan):
+                known = set(category_texts(df[col]))
+                if stats["category_counts"].get(col) is not None:
+                    known.update(stats["category_counts"][col].index)
+                label_encoders[col] = LabelEncoder().fit(sorted(known))
+            df = apply_feature_plan(df, feature_plan, label_encoders)
+    else:
+        with stages.stage("read") as stage:
+            # fillna copies, so a frame passed in by the caller is left as it was
+            df = (pd.read_csv(file_path, index_col="Transaction ID") if data is None else data).fillna("Unknown")
+            stage["rows"] = len(df)
+        keys = segment_keys(df, segment_by) if segment_by else None
+        total_transactions = len(df)
+        categorical_cols = list(df.select_dtypes(include=['object']).columns)
+        with stages.stage("plan"):
+            feature_plan = build_feature_plan(df, set(categorical_cols))
+        with stages.stage("profile"):
+            profiles = build_column_profiles(df, profiled_categoricals(feature_plan, categorical_cols))
+        with stages.stage("encode"):
+            # Encode categorical features
+            for col in encoded_columns(feature_plan):
+                label_encoders[col] = LabelEncoder().fit(category_texts(df[col]))
+            df = apply_feature_plan(df, feature_plan, label_encoders)
+
+    # Normalize numerical features
+    with stages.stage("scale"):
+        scaler = StandardScaler()
+        df_scaled = scaler.fit_transform(df)
+
+    # Train the anomaly detector
+    with stages.stage("fit"):
+        detector = make_detector(params, n_jobs=n_jobs)
+        # Threads also spread the Isolation Forest scoring pass that sets offset_, which sklearn otherwise runs on one core
+        with parallel_config(backend="threading", n_jobs=n_jobs):
+            detector.fit(df_scaled)  # Training step
+
+    segments = None
+    if segment_by:
+        with stages.stage("segment_fit") as stage:
+            segment_models, segment_rows = fit_segment_models(df_scaled, keys, params, min_segment_rows)
+            stage["segments"] = len(segment_models)
+        segments = {"by": list(segment_by), "min_rows": min_segment_rows, "models": segment_models}
 
     end_time = datetime.now()
 
-    # Save trained model, scaler, and encoders
+    # Save trained model, scaler, encoders and column profiles (not the training data itself)
     model_metadata = {
-        "model": iso_forest, 
+        "model": detector, 
         "scaler": scaler, 
         "encoders": label_encoders, 
-        "df_original": df,
+        "profiles": profiles,
+        "feature_plan": feature_plan,
+        "segments": segments,
         "training_metadata": {
             "timestamp": start_time.isoformat(),
-            "total_transactions": len(df),
+            "total_transactions": total_transactions,
+            "training_rows": len(df),
+            "sample_size": sample_size,
             "categorical_columns": list(categorical_cols),
+            "features": feature_plan["features"],
+            "dropped_columns": {col: spec["reason"] for col, spec in feature_plan["columns"].items()
+                                if spec["kind"] == "dropped"},
             "training_time": (end_time - start_time).total_seconds(),
-            "model_params": {
-                "n_estimators": 100,
-                "contamination": 0.02,
-                "random_state": 42
-            }
+            "model_params": params,
+            "detector": detector_name(params),
+            "n_jobs": n_jobs,
+            "segment_by": list(segment_by) if segment_by else None,
+            "segments": {key: segment_rows[key] for key in segment_models} if segment_by else None,
+            "fallback_rows": sum(rows for key, rows in segment_rows.items() if key not in segment_models)
+                             if segment_by else None,
+            "stages": stages.summary()
         }
     }
     
-    joblib.dump(model_metadata, MODEL_PATH)
+    with stages.stage("save"):
+        # Written aside and swapped in, so requests still memory-mapping the old artifact keep reading it intact
+        # A unique temporary file, so concurrent trainings of the same model never write into one file
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(model_path) or ".", suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+        joblib.dump(model_metadata, tmp_path)
+        os.replace(tmp_path, model_path)
+    # The returned metadata also covers the save itself
+    model_metadata["training_metadata"]["stages"] = stages.summary()
     
     return {
         "status": "success",
-        "message": f" Model trained and saved to {MODEL_PATH}",
+        "message": f" Model trained and saved to {model_path}",
         "model_details": model_metadata["training_metadata"]
     }
 
-def detect_anomalies(file_path):
+def detect_anomalies(file_path, model_path=MODEL_PATH, output_file=ANALYSED_XLSX_PATH, context=None):
+    """
+    Flags the anomalous transactions of `file_path`. Within a pipeline run, `context` (a PipelineContext)
+    supplies the already parsed file and keeps the features, predictions and anomalous rows for later stages.
+    """
     start_time = datetime.now()
     
-    if not os.path.exists(MODEL_PATH):
+    if not os.path.exists(model_path):
         return {
             "error": "Model not found! Please train the model first.",
             "status": "failed"
         }
 
-    saved_data = joblib.load(MODEL_PATH)
-    iso_forest = saved_data["model"]
+    context = context or PipelineContext(file_path, track_memory=False)
+    saved_data = context.load_model(model_path)
+    detector = saved_data["model"]
     scaler = saved_data["scaler"]
-    label_encoders = saved_data["encoders"]
-    
-    df_new = pd.read_csv(file_path, index_col="Transaction ID")
-    total_transactions = len(df_new)
     
-    df_new.fillna("Unknown", inplace=True)
-    
-    categorical_cols = df_new.select_dtypes(include=['object']).columns
-    for col in categorical_cols:
-        df_new[col] = df_new[col].astype(str)
-        if col in label_encoders:
-            le = label_encoders[col]
-            df_new[col] = df_new[col].apply(lambda x: le.transform([x])[0] if x in le.classes_ else -1)
-        else:
-            df_new[col] = -1  
+    df_raw = context.load_data()
+    total_transactions = len(df_raw)
     
-    df_scaled_new = scaler.transform(df_new)
-    df_new["Anomaly"] = iso_forest.predict(df_scaled_new)
-
-    anomalous_transactions = df_new[df_new["Anomaly"] == -1].index.tolist()
+    segments = saved_data.get("segments")
+    with context.stage("features"):
+        # Without its segment columns a file is scored by the global detector alone
+        keys = segment_keys(df_raw, segments["by"]) if segments and set(segments["by"]) <= set(df_raw.columns) else None
+        context.features = scaler.transform(prepare_features(df_raw, saved_data))
+    with context.stage("predict") as stage:
+        # Rows of a segment with its own detector are scored by it, the rest by the global detector
+        context.predictions = route(segments["models"] if segments else {}, detector, context.features, keys).astype(int)
+        anomalous = context.predictions == -1
+        context.anomalies = df_raw[anomalous]
+        context.anomaly_ids = anomalous_transactions = context.anomalies.index.tolist()
+        stage["anomalies"] = len(anomalous_transactions)
     
     end_time = datetime.now()
+    model_params = saved_data.get("training_metadata", {}).get("model_params", DEFAULT_MODEL_PARAMS)
     
     return {
         "timestamp": start_time.isoformat(),
@@ -123,114 +405,184 @@ def detect_anomalies(file_path):
         "anomaly_ids": anomalous_transactions,
         "execution_time": (end_time - start_time).total_seconds(),
         "model_details": {
-            "model_type": "Isolation Forest",
-            "contamination_rate": 0.02,
-            "n_estimators": 100
+            "model_type": DETECTOR_LABELS[detector_name(model_params)],
+            "contamination_rate": model_params["contamination"],
+            "n_estimators": model_params.get("n_estimators"),
+            "segment_by": segments["by"] if segments else None
         },
-        "output_file": "../Temp_files/analysed_transaction.xlsx",
+        "output_file": output_file,
         "status": "success"
     }
 
-def analyze_anomalies(transaction_ids, new_data_path):
-    start_time = datetime.now()
-    saved_data = joblib.load(MODEL_PATH)
-    df_original = saved_data["df_original"]
-    df_new = pd.read_csv(new_data_path, index_col="Transaction ID")
+def explain_anomalies(anomalous_df, profiles):
+    """
+    Compares every flagged transaction with the training profiles in one pass per column:
+    numeric values more than 2 std from the training mean, and categories rarer than
+    RARE_CATEGORY_FREQUENCY, are reported. Returns the per-transaction report lines and
+    a {transaction_id: {column: difference}} dict.
+    """
+    masks, differences, lines = {}, {}, {}
+    for col, profile in profiles.items():
+        if col not in anomalous_df.columns:
+            continue
+        if profile["type"] == "categorical":
+            if profile["id_like"]:
+                continue
+            values = anomalous_df[col].fillna("Unknown").astype(str)
+            frequencies = values.map(profile["top_categories"]).astype(float).fillna(0.0)
+            masks[col] = (frequencies < RARE_CATEGORY_FREQUENCY).to_numpy()
+            differences[col] = ("Unusual category: " + values).to_numpy()
+            lines[col] = (f"   - *{col}*: " + values + " is not a common category.\n").to_numpy()
+        else:
+            mean, std = profile["mean"], profile["std"]
+            values = pd.to_numeric(anomalous_df[col], errors="coerce")
+            masks[col] = ((values - mean).abs() > 2 * std).to_numpy()
+            text = values.astype(str)
+            differences[col] = ("Outlier value: " + text + f" (Normal: Mean {mean:.2f}, Std {std:.2f})").to_numpy()
+            lines[col] = (f"   - *{col}*: " + text +
+                          f" is far from the usual range (Mean: {mean:.2f}, Std: {std:.2f}).\n").to_numpy()
+
+    txn_ids = [str(txn_id) for txn_id in anomalous_df.index]
+    anomalies_data = {txn_id: {} for txn_id in txn_ids}
+    explanations = [[f"🔹 *Transaction ID: {txn_id}*\n"] for txn_id in txn_ids]
+    columns = list(masks)
+    if columns:
+        # Only the flagged cells are visited; row-major order keeps columns in profile order per transaction
+        rows, cols = np.nonzero(np.column_stack([masks[col] for col in columns]))
+        for r, c in zip(rows, cols):
+            col = columns[c]
+            anomalies_data[txn_ids[r]][col] = differences[col][r]
+            explanations[r].append(lines[col][r])
+    return ["".join(parts) for parts in explanations], anomalies_data
+
+def get_gemini_model():
+    if not API_KEY:
+        raise ValueError(
+            " Missing Gemini API key. Make sure it's set in the .env file, or use the 'template' explanation mode.")
+    return gemini_model
+
+def _anomaly_details(transaction_ids, new_data_path, model_path, context=None):
+    context = context or PipelineContext(new_data_path, track_memory=False)
+    saved_data = context.load_model(model_path)
+    # Artifacts from before column profiles carried the (encoded) training frame instead
+    profiles = saved_data.get("profiles") or build_column_profiles(saved_data["df_original"], set(saved_data["encoders"]))
 
     # Extract only the anomalous transactions using the provided list of IDs
-    anomalous_df = df_new.loc[transaction_ids]
-
-    # Merge original dataset with detected anomalies and mark anomaly flag
-    df_full = pd.concat([df_original, anomalous_df])  
-    df_full["Anomaly"] = df_full.index.isin(anomalous_df.index).astype(int)
-
-    # Get only normal transactions for comparison
-    normal_transactions = df_full[df_full["Anomaly"] == 0].drop(columns=["Anomaly"], errors="ignore")
+    anomalous_df = context.anomaly_rows(transaction_ids)
 
     # Prepare human-readable analysis document
-    anomaly_report = []
-    anomalies_data = {}
-
-    for txn_id, row in anomalous_df.iterrows():
-        differences = {}
-        explanation = f"🔹 *Transaction ID: {txn_id}*\n"
-
-        for col in df_original.columns:
-            if col in normal_transactions:
-                normal_mean = normal_transactions[col].mean()
-                normal_std = normal_transactions[col].std()
-
-                if col in saved_data["encoders"]:  # Categorical column
-                    normal_mode = normal_transactions[col].mode().values
-                    if row[col] not in normal_mode:
-                        differences[col] = f"Unusual category: {row[col]}"
-                        explanation += f"   - *{col}*: {row[col]} is not a common category.\n"
-                else:  # Numerical column
-                    if abs(row[col] - normal_mean) > 2 * normal_std:
-                        differences[col] = f"Outlier value: {row[col]} (Normal: Mean {normal_mean:.2f}, Std {normal_std:.2f})"
-                        explanation += f"   - *{col}*: {row[col]} is far from the usual range (Mean: {normal_mean:.2f}, Std: {normal_std:.2f}).\n"
-
-        anomaly_report.append(explanation)
-        anomalies_data[str(txn_id)] = differences
+    with context.stage("compare"):
+        anomaly_report, anomalies_data = explain_anomalies(anomalous_df, profiles)
+    return [str(txn_id) for txn_id in anomalous_df.index], anomaly_report, anomalies_data
 
-    # Combine everything into a human-readable document
-    report_text = "\n".join(anomaly_report)
-
-    # Convert to JSON and send to Gemini
-    anomalies_json = json.dumps(anomalies_data, indent=2)
-    prompt = f"""
-    Below is a human-readable report of financial transactions flagged as anomalous:
-
-    {report_text}
-
-    Additionally, here is a JSON containing structured anomaly details:
-
-    {anomalies_json}
-
-    Please analyze these transactions and return a JSON output explaining why each transaction might be suspicious.
-    
-    The JSON should look like:
-    
-        "transaction Id1": "Explanation for anomaly 1",
-        "transaction Id2": "Explanation for anomaly 2"
-    
+def analyze_anomalies(transaction_ids, new_data_path, model_path=MODEL_PATH,
+                      output_csv=ANALYSED_CSV_PATH, output_xlsx=ANALYSED_XLSX_PATH, progress_callback=None,
+                      explanation_mode=None, context=None):
     """
+    Explains the flagged transactions and writes the analysed CSV and Excel files. Given the
+    PipelineContext of detect_anomalies, the anomalous rows and the full file come from memory.
+    """
+    start_time = datetime.now()
+    mode = explanation_mode or EXPLANATION_MODE
+    if mode not in EXPLANATION_MODES:
+        raise ValueError(f"Unknown explanation mode '{mode}', expected one of {EXPLANATION_MODES}")
+
+    context = context or PipelineContext(new_data_path, track_memory=False)
+    txn_ids, anomaly_report, anomalies_data = _anomaly_details(transaction_ids, new_data_path, model_path, context)
+
+    llm = None
+    with context.stage("explain") as stage:
+        stage["mode"] = mode
+        if mode == "llm":
+            # Gemini explains the transactions in bounded, concurrent batches; reruns reuse cached explanations
+            llm = explain_with_llm(txn_ids, anomaly_report, anomalies_data,
+                                   get_gemini_model(), progress_callback=progress_callback)
+            explanations = llm["explanations"]
+        else:
+            explanations = template_explanations(txn_ids, anomalies_data)
+        context.explanations = explanations
+    with context.stage("write_outputs"):
+        update_csv_with_reasons(new_data_path, transaction_ids, explanations,
+                                output_csv=output_csv, output_xlsx=output_xlsx, data=context.load_data())
 
-    ai_response = gemini_model.generate_content(prompt).text
-    cleaned_text = re.sub(r'```json\n|\n```', '', ai_response)
-    print(cleaned_text)
-    update_csv_with_reasons(new_data_path, transaction_ids, json.loads(cleaned_text))
-    
-    end_time = datetime.now()
-    
-    return {
+    result = {
         "timestamp": start_time.isoformat(),
         "total_anomalies": len(transaction_ids),
-        "ai_analysis_time": (end_time - start_time).total_seconds(),
-        "output_file": "../Temp_files/analysed_transaction.xlsx",
-        "status": "success",
-        "raw_analysis": cleaned_text
+        "ai_analysis_time": (datetime.now() - start_time).total_seconds(),
+        "output_file": output_xlsx,
+        "status": "partial" if llm and llm["failed_transactions"] else "success",
+        "raw_analysis": json.dumps(explanations, indent=2),
+        "explanation_mode": mode
+    }
+    if llm:
+        result.update({
+            "cached_explanations": llm["cached"],
+            "llm_batches": llm["batches"],
+            "failed_batches": llm["failed_batches"],
+            "unexplained_transactions": llm["failed_transactions"]
+        })
+    if mode == "template_then_llm":
+        result["enrichment_job_id"] = _submit_enrichment(transaction_ids, new_data_path, model_path,
+                                                         output_csv, output_xlsx)
+    return result
+
+def _submit_enrichment(transaction_ids, new_data_path, model_path, output_csv, output_xlsx):
+    if not API_KEY or not len(transaction_ids):
+        print("Skipping Gemini enrichment: " + ("no API key configured" if not API_KEY else "no anomalies"))
+        return None
+    job = submit_job("enrich_explanations", {
+        "transaction_ids": [str(txn_id) for txn_id in transaction_ids],
+        "new_data_path": new_data_path,
+        "model_path": model_path,
+        "output_csv": output_csv,
+        "output_xlsx": output_xlsx
+    })
+    return job["job_id"]
+
+def enrich_explanations(params, context):
+    """
+    Background half of the "template_then_llm" mode: asks Gemini about the transactions that were
+    answered with templates and rewrites the analysed files. Anything Gemini cannot explain keeps
+    its template reason.
+    """
+    context.report("prepare", 0.0)
+    txn_ids, anomaly_report, anomalies_data = _anomaly_details(params["transaction_ids"], params["new_data_path"],
+                                                               params["model_path"])
+    llm = explain_with_llm(txn_ids, anomaly_report, anomalies_data, get_gemini_model(),
+                           progress_callback=lambda done, total, explained: context.report(
+                               "explain", done / total, batches_completed=done, total_batches=total,
+                               explained=explained))
+    context.check_cancelled()
+    explanations = {**template_explanations(txn_ids, anomalies_data), **llm["explanations"]}
+    update_csv_with_reasons(params["new_data_path"], params["transaction_ids"], explanations,
+                            output_csv=params["output_csv"], output_xlsx=params["output_xlsx"])
+    return {
+        "enriched": len(llm["explanations"]),
+        "cached_explanations": llm["cached"],
+        "unexplained_transactions": llm["failed_transactions"],
+        "output_file": params["output_xlsx"],
+        "raw_analysis": json.dumps(explanations, indent=2)
     }
 
-def update_csv_with_reasons(file_path, anomaly_ids, explanations):
-    df_new = pd.read_csv(file_path, index_col="Transaction ID")
+def update_csv_with_reasons(file_path, anomaly_ids, explanations,
+                            output_csv=ANALYSED_CSV_PATH, output_xlsx=ANALYSED_XLSX_PATH, data=None):
+    # `data` is the file already parsed by the caller; it is copied, not modified
+    df_new = pd.read_csv(file_path, index_col="Transaction ID") if data is None else data
 
     # Ensure all anomaly IDs are strings for consistency with the dictionary
     explanations = {str(k): v for k, v in explanations.items()}
 
     # Add a new "Reason" column, defaulting to "Normal transaction"
-    df_new["Reason"] = df_new.index.map(lambda txn: explanations.get(str(txn), ""))
-    
-    df_new.to_csv("../Temp_files/analysed_transaction.csv", index=True)
-    
-    # Function to highlight anomalies in yellow
-    def highlight_anomalies(row):
-        return ["background-color: yellow" if str(row.name) in anomaly_ids else "" for _ in row]
-
-    # Apply highlighting
-    styled_df = df_new.style.apply(highlight_anomalies, axis=1)
-
-    # Save to Excel with formatting
-    styled_df.to_excel("../Temp_files/analysed_transaction.xlsx", index=True, engine="openpyxl")  
-
-    print(f" Updated CSV saved as 'analysed_transaction.xlsx' with anomaly reasons.")
\ No newline at end of file
+    df_new = df_new.assign(Reason=df_new.index.map(lambda txn: explanations.get(str(txn), "")))
+
+    if REPORT_GENERATION == "eager":
+        # CSV, and Excel with the anomalous rows highlighted in yellow, written side by side
+        export_report(df_new, anomaly_ids, output_csv, output_xlsx)
+        discard_report(output_xlsx)
+    else:
+        df_new.to_csv(output_csv, index=True)
+        # The highlighted Excel copy is built from the CSV when first downloaded (see services.report_service)
+        defer_report(output_xlsx, "anomaly_report", {"source": output_csv, "anomaly_ids": [str(txn) for txn in anomaly_ids]},
+                     sources=[output_csv])
+
+    print(f" Updated CSV saved as '{output_csv}' with anomaly reasons.")
\ No newline at end of file
@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from fastapi import HTTPException
+from services.db_pool import close_pool
+from services.db_services import update_transactions_from_csv
+from services.model_registry import DRIFT_THRESHOLD
+from services.pipeline_context import PipelineContext
+from services.pipeline_service import run_detection_pipeline
+from services.report_export import write_audit_xlsx
+from services.report_service import defer_report, discard_report, REPORT_GENERATION
+from services.sql_executor import SQLiteValidator
+
+# Rule sets, by identifier, as written by rule generation
+RULES_DIR = "../Database/rules"
+# Columns the audit adds to every transaction of the dataset
+AUDIT_COLUMNS = ["Anomaly", "Anomaly Reason", "Failed Rules"]
+
+
+def _failed_rules(transaction_failures: Dict[str, List[Dict[str, str]]]) -> Dict[str, str]:
+    return {txn_id: " && ".join(f"{rule['rule_name']} ({rule['rule_id']})" for rule in rules)
+            for txn_id, rules in transaction_failures.items()}
+
+
+def merge_audit(data: pd.DataFrame, anomaly_ids: List[Any], explanations: Dict[str, str],
+                transaction_failures: Dict[str, List[Dict[str, str]]]) -> pd.DataFrame:
+    """
+    The transactions of `data` with the AUDIT_COLUMNS added: the anomaly flag and its reason from
+    detection, and the rules each transaction failed in validation. `data` itself is not modified.
+    """
+    txn_ids = data.index.astype(str)
+    anomalous = txn_ids.isin({str(txn_id) for txn_id in anomaly_ids})
+    explanations = {str(txn_id): reason for txn_id, reason in explanations.items()}
+    return data.assign(**{
+        "Anomaly": anomalous,
+        "Anomaly Reason": pd.Series(explanations, dtype=object).reindex(txn_ids).fillna("").to_numpy(),
+        "Failed Rules": pd.Series(_failed_rules(transaction_failures), dtype=object)
+                          .reindex(txn_ids).fillna("").to_numpy(),
+    })
+
+
+def _write_audit(audit: pd.DataFrame, anomaly_ids: List[str], failed_ids: List[str],
+                 output_csv: str, output_xlsx: str):
+    audit.to_csv(output_csv, index=True)
+    if REPORT_GENERATION == "eager":
+        write_audit_xlsx(audit, anomaly_ids, failed_ids, output_xlsx)
+        discard_report(output_xlsx)
+    else:
+        # The coloured workbook is built from the CSV when first downloaded (see services.report_service)
+        defer_report(output_xlsx, "audit_report",
+                     {"source": output_csv, "anomaly_ids": anomaly_ids, "failed_ids": failed_ids},
+                     sources=[output_csv])
+
+
+def run_audit(paths: Dict[str, str],
+              identifier: str,
+              retrain: bool = False,
+              drift_threshold: float = DRIFT_THRESHOLD,
+              explanation_mode: Optional[str] = None,
+              detector: Optional[str] = None,
+              segment_by: Optional[List[str]] = None,
+              report: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """
+    Rule validation against the `identifier` rules and anomaly detection of a session's transactions
+    in one pass: the file is parsed once into a PipelineContext, and the two run concurrently on that
+    frame. Validation runs against a staging database (paths["audit_db"]) loaded from the frame, so both
+    see the same data and the session's own transactions table, with its upserts and edits, is left as
+    it is. The results are merged per transaction into the audit CSV and Excel report.
+    `report(stage, progress, **details)` gets the combined progress of both (a job's progress reporter).
+    """
+    rules_file = f'{RULES_DIR}/{identifier}.json'
+    if not os.path.exists(rules_file):
+        raise HTTPException(status_code=404, detail=f"Rules not found: {identifier}")
+    report = report or (lambda *args, **kwargs: None)
+    start_time, started = datetime.now(), time.perf_counter()
+
+    context = PipelineContext(paths["new_transactions"])
+    report("load_data", 0.0)
+    data = context.load_data()
+
+    # Each branch reports its own progress; the audit's is their mean
+    lock = threading.Lock()
+    progress = {"detect": 0.0, "validate": 0.0}
+
+    def branch_report(branch):
+        def branch_progress(stage, value=None, **details):
+            with lock:
+                if value is not None:
+                    progress[branch] = value
+                overall = 0.05 + 0.85 * sum(progress.values()) / len(progress)
+            report(stage, overall, **details)
+        return branch_progress
+
+    def detect():
+        return run_detection_pipeline(paths, retrain=retrain, drift_threshold=drift_threshold,
+                                      explanation_mode=explanation_mode, detector=detector,
+                                      segment_by=segment_by, report=branch_report("detect"), context=context)
+
+    def validate():
+        branch = branch_report("validate")
+        branch("load_database", 0.0, rows_processed=len(data))
+        # The rules query a "transactions" table, which the staging database holds for the audited data only
+        with context.stage("load_database"):
+            message = update_transactions_from_csv(False, db_path=paths["audit_db"],
+                                                   new_transactions_file=paths["new_transactions"], data=data)
+        try:
+            if message.startswith("Error"):
+                raise RuntimeError(message)
+            validator = SQLiteValidator(paths["audit_db"])
+            with context.stage("validate") as stage:
+                evaluation = validator.evaluate_rules(rules_file, progress_callback=lambda done, total, rows: branch(
+                    "validate", 0.1 + 0.9 * done / total if total else 1.0, rules_completed=done, total_rules=total))
+                stage["failed_transactions"] = len(evaluation["transaction_failures"])
+        finally:
+            close_pool(paths["audit_db"])
+            if os.path.exists(paths["audit_db"]):
+                os.remove(paths["audit_db"])
+        return evaluation
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="audit") as pool:
+        detection_future, validation_future = pool.submit(detect), pool.submit(validate)
+        detection, evaluation = detection_future.result(), validation_future.result()
+
+    report("merge", 0.9)
+    with context.stage("merge"):
+        anomaly_ids = [str(txn_id) for txn_id in context.anomaly_ids or []]
+        failures = evaluation["transaction_failures"]
+        audit = merge_audit(data, anomaly_ids, context.explanations or {}, failures)
+        flagged = audit[audit["Anomaly"] | (audit["Failed Rules"] != "")]
+    with context.stage("write_audit"):
+        _write_audit(audit, anomaly_ids, list(failures), paths["audit_csv"], paths["audit_xlsx"])
+
+    both = int((flagged["Anomaly"] & (flagged["Failed Rules"] != "")).sum())
+    return {
+        "timestamp": start_time.isoformat(),
+        "session_id": paths["session_id"],
+        "identifier": identifier,
+        "total_transactions": len(data),
+        "anomalous_transactions": len(anomaly_ids),
+        "failed_transactions": len(failures),
+        "anomalous_and_failed": both,
+        "flagged_transactions": len(flagged),
+        "flag_rate": round(len(flagged) / len(data) * 100, 2) if len(data) else 0.0,
+        "transactions": [{"transaction_id": str(txn_id), "anomaly": bool(row["Anomaly"]),
+                          "anomaly_reason": row["Anomaly Reason"], "failed_rules": row["Failed Rules"]}
+                         for txn_id, row in flagged[AUDIT_COLUMNS].iterrows()],
+        "total_rules": evaluation["total_rules"],
+        "rule_performance": evaluation["rule_performance"],
+        "universal_failure_rules": evaluation["universal_failure_rules"],
+        "model_selection": detection["model_selection"],
+        "explanation_mode": detection["explanation_mode"],
+        "output_file": paths["audit_csv"],
+        "excel_output_file": paths["audit_xlsx"],
+        "execution_time": round(time.perf_counter() - started, 4),
+        # Stages of the two branches overlap, so their seconds add up to more than the execution time
+        "pipeline_stages": context.timings(),
+    }
@@ -1,138 +1,357 @@
+import re
+import json
+import base64
 import sqlite3
 import csv
 import pandas as pd
 from fastapi.responses import FileResponse
+from services.db_pool import get_connection
+
+RULES_DB = '../Database/rules.db'
+TRANSACTION_DB = '../Database/transaction.db'
+NEW_TRANSACTIONS_CSV = '../Temp_files/new_tran.csv'
+ANALYSED_TRANSACTIONS_CSV = '../Temp_files/analysed_transaction.csv'
+ANALYSED_TRANSACTIONS_XLSX = '../Temp_files/analysed_transaction.xlsx'
+
+TRANSACTION_KEY = 'Transaction ID'
+MAX_PAGE_SIZE = 1000
+FILTER_PATTERN = re.compile(r'^(.+?)(>=|<=|!=|=|~|>|<)(.*)$')
 
 def initialize_db():
-    conn = sqlite3.connect('../Database/rules.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS rules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            status TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with get_connection(RULES_DB) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                description TEXT,
+                status TEXT NOT NULL
+            )
+        """)
+        conn.commit()
     
 def get_rules():
-    conn = sqlite3.connect('../Database/rules.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM rules")
-    rules = cursor.fetchall()
-    conn.close()
+    with get_connection(RULES_DB) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM rules")
+        rules = cursor.fetchall()
     print(rules)
     return rules
 
 def edit_rules(rule_id, field_name, value):
-    conn = sqlite3.connect('../Database/rules.db')
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE rules SET {field_name} = ? WHERE id = ?", (value, rule_id))
-    conn.commit()
-    conn.close()
+    with get_connection(RULES_DB) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE rules SET {field_name} = ? WHERE id = ?", (value, rule_id))
+        conn.commit()
     return f"Rule with ID {rule_id} updated successfully."
 
 def delete_rules(rule_id): 
-    conn = sqlite3.connect('../Database/rules.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
-    conn.commit()
-    conn.close()
+    with get_connection(RULES_DB) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
+        conn.commit()
     return f"Rule with ID {rule_id} deleted successfully."
 
 def add_rules(name, description, status):    
-    conn = sqlite3.connect('../Database/rules.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT INTO rules (name, description, status)
-            VALUES (?, ?, ?)
-        """, (name, description, status))
-        conn.commit()
-    except sqlite3.OperationalError:
-        conn.close()
-        initialize_db()
-        conn = sqlite3.connect('../Database/rules.db')
+    with get_connection(RULES_DB) as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO rules (name, description, status)
-            VALUES (?, ?, ?)
-        """, (name, description, status))
-        conn.commit()
-    finally:
-        conn.close()
+        try:
+            cursor.execute("""
+                INSERT INTO rules (name, description, status)
+                VALUES (?, ?, ?)
+            """, (name, description, status))
+            conn.commit()
+        except sqlite3.OperationalError:
+            initialize_db()
+            cursor.execute("""
+                INSERT INTO rules (name, description, status)
+                VALUES (?, ?, ?)
+            """, (name, description, status))
+            conn.commit()
     return "New rule added successfully."
 
 
 
 
-def get_transactions():
-    conn = sqlite3.connect('../Database/transaction.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions")
-    transactions = cursor.fetchall()
-    conn.close()
+def get_transactions(db_path=TRANSACTION_DB):
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM transactions")
+        transactions = cursor.fetchall()
     return transactions
 
-def edit_transactions(transaction_id, field_name, value):
-    conn = sqlite3.connect('../Database/transaction.db')
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE transactions SET \"{field_name}\" = ? WHERE \"Transaction ID\" = ?", (value, transaction_id))
-    conn.commit()
-    conn.close()
+def edit_transactions(transaction_id, field_name, value, db_path=TRANSACTION_DB):
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE transactions SET \"{field_name}\" = ? WHERE \"Transaction ID\" = ?", (value, transaction_id))
+        conn.commit()
     return f"Transaction with ID {transaction_id} updated successfully."
 
-def get_transactions_by_id(transaction_id):
-    conn = sqlite3.connect('../Database/transaction.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM transactions WHERE \"Transaction ID\" = ?", (transaction_id,))
-    transaction = cursor.fetchone()
-    conn.close()
+def get_transactions_by_id(transaction_id, db_path=TRANSACTION_DB):
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM transactions WHERE \"Transaction ID\" = ?", (transaction_id,))
+        transaction = cursor.fetchone()
     return transaction
 
-def update_transactions_from_csv(analysed):
+def update_transactions_from_csv(analysed, db_path=TRANSACTION_DB,
+                                 new_transactions_file=NEW_TRANSACTIONS_CSV,
+                                 analysed_file=ANALYSED_TRANSACTIONS_CSV, data=None):
     """
     Updates the transaction database from a CSV file.
     If `analysed` is True, updates from 'analysed_transaction.csv'.
-    Otherwise, updates from 'transaction.csv'.
+    Otherwise, updates from 'new_tran.csv'.
+    `data` is that file already parsed by the caller (indexed by 'Transaction ID'), loaded instead of reading it again.
     """
-    conn = sqlite3.connect('../Database/transaction.db')
-    file_path = '../Temp_files/analysed_transaction.csv' if analysed else '../Temp_files/new_tran.csv'
+    file_path = analysed_file if analysed else new_transactions_file
     table_name = 'analysed_transaction' if analysed else 'transactions'
 
-    try:
-        # Read CSV content directly from the file
-        df = pd.read_csv(file_path)
-        # Set 'Transaction ID' as the index
-        df.set_index('Transaction ID', inplace=True)
-        # Insert data into the appropriate table
-        df.to_sql(table_name, conn, if_exists='replace', index=True)
-        return f"{table_name.capitalize()} database updated successfully from CSV."
-    except Exception as e:
-        return f"Error updating {table_name} from CSV: {str(e)}"
-    finally:
-        conn.close()
-
-def delete_transactions():
-    conn = sqlite3.connect('../Database/transaction.db')
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM transactions")
-    conn.commit()
-    conn.close()
+    with get_connection(db_path) as conn:
+        try:
+            if data is None:
+                # Read CSV content directly from the file
+                df = pd.read_csv(file_path)
+                # Set 'Transaction ID' as the index
+                df.set_index('Transaction ID', inplace=True)
+            else:
+                df = data
+            # Insert data into the appropriate table
+            df.to_sql(table_name, conn, if_exists='replace', index=True)
+            return f"{table_name.capitalize()} database updated successfully from CSV."
+        except Exception as e:
+            return f"Error updating {table_name} from CSV: {str(e)}"
+
+def upsert_transactions_from_csv(analysed, db_path=TRANSACTION_DB,
+                                 new_transactions_file=NEW_TRANSACTIONS_CSV,
+                                 analysed_file=ANALYSED_TRANSACTIONS_CSV,
+                                 delete_missing=False):
+    """
+    Applies a delta CSV to the transaction table, keyed on 'Transaction ID'.
+    New IDs are inserted, changed rows are updated and, if `delete_missing` is set,
+    rows absent from the CSV are deleted. Rows without an ID cannot be matched, so they are
+    skipped and counted. Everything runs in a single transaction.
+    """
+    file_path = analysed_file if analysed else new_transactions_file
+    table_name = 'analysed_transaction' if analysed else 'transactions'
+    key = 'Transaction ID'
+
+    with get_connection(db_path) as conn:
+        try:
+            df = pd.read_csv(file_path)
+            missing_key = df[key].isna() | (df[key].astype(str).str.strip() == '')
+            skipped = int(missing_key.sum())
+            df = df[~missing_key].drop_duplicates(subset=key, keep='last')
+            cursor = conn.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+            if cursor.fetchone() is None:
+                # Nothing to merge into yet, so the delta becomes the initial load
+                df.set_index(key, inplace=True)
+                df.to_sql(table_name, conn, if_exists='replace', index=True)
+                return {
+                    "message": f"{table_name.capitalize()} database created from CSV.",
+                    "inserted": len(df), "updated": 0, "unchanged": 0, "deleted": 0, "skipped": skipped
+                }
+
+            cursor.execute(f'PRAGMA table_info("{table_name}")')
+            existing_columns = [row[1] for row in cursor.fetchall()]
+            columns = [key] + [col for col in df.columns if col != key]
+            quoted = ", ".join(f'"{col}"' for col in columns)
+            value_columns = [col for col in columns if col != key]
+
+            cursor.execute("BEGIN")
+            for col in value_columns:
+                if col not in existing_columns:
+                    cursor.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{col}"')
+
+            # Stage the delta with the same column affinities as the target table
+            cursor.execute("DROP TABLE IF EXISTS temp.upsert_staging")
+            cursor.execute(f'CREATE TEMP TABLE upsert_staging AS SELECT {quoted} FROM "{table_name}" WHERE 0')
+            rows = df[columns].astype(object).where(pd.notna(df[columns]), None).itertuples(index=False, name=None)
+            cursor.executemany(
+                f"INSERT INTO upsert_staging ({quoted}) VALUES ({', '.join('?' for _ in columns)})", rows
+            )
+            cursor.execute(f'CREATE INDEX temp.ix_upsert_staging ON upsert_staging ("{key}")')
+
+            changed = " OR ".join(f't."{col}" IS NOT s."{col}"' for col in value_columns) or "0"
+            cursor.execute(f"""
+                SELECT
+                    SUM(t."{key}" IS NULL),
+                    SUM(t."{key}" IS NOT NULL AND ({changed})),
+                    SUM(t."{key}" IS NOT NULL AND NOT ({changed}))
+                FROM upsert_staging s LEFT JOIN "{table_name}" t ON t."{key}" = s."{key}"
+            """)
+            inserted, updated, unchanged = [count or 0 for count in cursor.fetchone()]
+
+            if value_columns:
+                assignments = ", ".join(f'"{col}" = s."{col}"' for col in value_columns)
+                cursor.execute(f"""
+                    UPDATE "{table_name}" AS t SET {assignments}
+                    FROM upsert_staging s
+                    WHERE t."{key}" = s."{key}" AND ({changed})
+                """)
+            cursor.execute(f"""
+                INSERT INTO "{table_name}" ({quoted})
+                SELECT {quoted} FROM upsert_staging s
+                WHERE NOT EXISTS (SELECT 1 FROM "{table_name}" t WHERE t."{key}" = s."{key}")
+            """)
+
+            deleted = 0
+            if delete_missing:
+                cursor.execute(f"""
+                    DELETE FROM "{table_name}" AS t
+                    WHERE NOT EXISTS (SELECT 1 FROM upsert_staging s WHERE s."{key}" = t."{key}")
+                """)
+                deleted = cursor.rowcount
+
+            cursor.execute("DROP TABLE temp.upsert_staging")
+            conn.commit()
+            return {
+                "message": f"{table_name.capitalize()} database upserted successfully from CSV.",
+                "inserted": inserted, "updated": updated, "unchanged": unchanged, "deleted": deleted,
+                "skipped": skipped
+            }
+        except Exception as e:
+            conn.rollback()
+            return {"message": f"Error upserting {table_name} from CSV: {str(e)}"}
+
+def delete_transactions(db_path=TRANSACTION_DB):
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM transactions")
+            conn.commit()
+        except sqlite3.OperationalError:
+            # A fresh session database has no transactions table yet
+            pass
     return "All transactions deleted successfully."
 
-def get_analysed_transactions():
-    conn = sqlite3.connect('../Database/transaction.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM analysed_transaction")
-    transactions = cursor.fetchall()
-    conn.close()
+def get_analysed_transactions(db_path=TRANSACTION_DB):
+    with get_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM analysed_transaction")
+        transactions = cursor.fetchall()
     return transactions
 
-def downloadTransactionCsv():
-    file_path = "../Temp_files/analysed_transaction.xlsx"  # Path to the Excel file
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def _parse_filters(filters, table_columns):
+    """
+    Turns 'column<op>value' strings into SQL conditions.
+    Supported operators: = != > >= < <= and ~ (substring match).
+    'a|b|c~value' matches the substring in any of the listed columns (a search box); listed
+    columns the table does not have are skipped, as long as at least one of them exists.
+    """
+    conditions, params = [], []
+    for expression in filters or []:
+        match = FILTER_PATTERN.match(expression)
+        if not match:
+            raise ValueError(f"Invalid filter: {expression}")
+        column, operator, value = match.group(1).strip(), match.group(2), match.group(3)
+        if operator == '~' and '|' in column:
+            searched = [col.strip() for col in column.split('|') if col.strip() in table_columns]
+            if not searched:
+                raise ValueError(f"Unknown filter column: {column}")
+            conditions.append("(" + " OR ".join(f'"{col}" LIKE ?' for col in searched) + ")")
+            params.extend([f"%{value}%"] * len(searched))
+            continue
+        if column not in table_columns:
+            raise ValueError(f"Unknown filter column: {column}")
+        if operator == '~':
+            conditions.append(f'"{column}" LIKE ?')
+            params.append(f"%{value}%")
+        else:
+            conditions.append(f'"{column}" {operator} ?')
+            params.append(value)
+    return conditions, params
+
+def get_transactions_page(table_name='transactions', db_path=TRANSACTION_DB, limit=50, cursor=None,
+                          columns=None, filters=None, sort_by=None, sort_dir='asc'):
+    """
+    Returns one keyset-paginated page of a transaction table.
+
+    Rows are ordered by `sort_by` (default 'Transaction ID') with 'Transaction ID' as the
+    tie-breaker, and `cursor` is the opaque position returned as `next_cursor` by the previous
+    page, so each page is a bounded index range instead of an OFFSET scan.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    sort_dir = sort_dir.lower()
+    if sort_dir not in ('asc', 'desc'):
+        raise ValueError(f"Invalid sort direction: {sort_dir}")
+
+    with get_connection(db_path) as conn:
+        db_cursor = conn.cursor()
+        db_cursor.execute(f'PRAGMA table_info("{table_name}")')
+        table_columns = [row[1] for row in db_cursor.fetchall()]
+        if not table_columns:
+            raise ValueError(f"Table {table_name} does not exist")
+
+        selected = columns or table_columns
+        unknown = [col for col in selected if col not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        if TRANSACTION_KEY not in selected:
+            selected = [TRANSACTION_KEY] + list(selected)
+        sort_by = sort_by or TRANSACTION_KEY
+        if sort_by not in table_columns:
+            raise ValueError(f"Unknown sort column: {sort_by}")
+
+        conditions, params = _parse_filters(filters, table_columns)
+        comparison = '>' if sort_dir == 'asc' else '<'
+
+        if sort_by == TRANSACTION_KEY:
+            order_keys = [f'"{TRANSACTION_KEY}"']
+        else:
+            # NULL-safe sort key so the row-value comparison below never sees a NULL
+            order_keys = [f'("{sort_by}" IS NOT NULL)', f'COALESCE("{sort_by}", 0)', f'"{TRANSACTION_KEY}"']
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor:
+            cursor_values = _decode_cursor(cursor)
+            if len(cursor_values) != len(order_keys):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            page_conditions.append(f"({', '.join(order_keys)}) {comparison} ({', '.join('?' for _ in order_keys)})")
+            page_params.extend(cursor_values)
+
+        where = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+        order = ", ".join(f"{key} {sort_dir.upper()}" for key in order_keys)
+        projection = ", ".join(f'"{col}"' for col in selected)
+        db_cursor.execute(
+            f'SELECT {projection}, {", ".join(order_keys)} FROM "{table_name}" {where} ORDER BY {order} LIMIT ?',
+            page_params + [limit + 1]
+        )
+        rows = db_cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(list(rows[-1][len(selected):])) if has_more and rows else None
+
+        # Cheap size estimate: the rowid high-water mark for the whole table, an exact count
+        # (first page only) when filters narrow the result.
+        total_estimate = None
+        if conditions:
+            if not cursor:
+                db_cursor.execute(f'SELECT COUNT(*) FROM "{table_name}" WHERE {" AND ".join(conditions)}', params)
+                total_estimate = db_cursor.fetchone()[0]
+        else:
+            db_cursor.execute(f'SELECT MAX(rowid) FROM "{table_name}"')
+            total_estimate = db_cursor.fetchone()[0] or 0
+
+    return {
+        "transactions": [dict(zip(selected, row[:len(selected)])) for row in rows],
+        "columns": selected,
+        "next_cursor": next_cursor,
+        "total_estimate": total_estimate,
+        "limit": limit
+    }
+
+def downloadTransactionCsv(file_path=ANALYSED_TRANSACTIONS_XLSX):
     try:
         return FileResponse(file_path, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", filename="analysed_transaction.xlsx")
     except:
@@ -0,0 +1,154 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Literal, Optional, get_args
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+# Anomaly detectors selectable per request. isolation_forest is the default and the most thorough;
+# hbos and robust_z fit and score in a few vectorised NumPy passes, for a fast first triage of large files.
+DetectorName = Literal["isolation_forest", "hbos", "robust_z"]
+DETECTOR_NAMES = get_args(DetectorName)
+DEFAULT_DETECTOR = "isolation_forest"
+DETECTOR_LABELS = {"isolation_forest": "Isolation Forest", "hbos": "HBOS", "robust_z": "Robust Z-Score"}
+
+# Isolation Forest hyperparameters; part of every model's registry key
+DEFAULT_MODEL_PARAMS = {
+    "n_estimators": 100,
+    "contamination": 0.02,
+    "random_state": 42
+}
+
+
+class ThresholdDetector(ABC):
+    """
+    The slice of IsolationForest's interface the service relies on: fit(X), score_samples(X)
+    (higher is more normal), decision_function(X) (negative is anomalous) and predict(X) (-1 / 1).
+    As in IsolationForest, offset_ is set so that a `contamination` share of the training rows is anomalous.
+    Subclasses implement _fit and score_samples; one missing either cannot be instantiated.
+    """
+
+    DEFAULTS: Dict[str, Any] = {"contamination": 0.02}
+
+    def __init__(self, contamination: float = 0.02):
+        if not 0 < contamination <= 0.5:
+            raise ValueError(f"contamination must be in (0, 0.5], got {contamination}")
+        self.contamination = contamination
+
+    def fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        training_scores = self._fit(X)
+        self.offset_ = float(np.quantile(training_scores, self.contamination))
+        return self
+
+    @abstractmethod
+    def _fit(self, X: np.ndarray) -> np.ndarray:
+        """Learns the per-column statistics and returns the training rows' scores."""
+
+    @abstractmethod
+    def score_samples(self, X) -> np.ndarray:
+        """Scores of the rows of X; higher is more normal."""
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+
+class HBOSDetector(ThresholdDetector):
+    """
+    Histogram-based outlier score: each column gets an equal-width histogram over its training range,
+    and a row's score is the sum of the log densities of its values (columns treated as independent).
+    Fitting bins every cell once and counts all columns in a single bincount; the training scores
+    come from the same bin indices. Values outside the training range land in an empty bin.
+    """
+
+    DEFAULTS = {"contamination": 0.02, "n_bins": 20}
+    # Pseudo-count added to every bin, so an empty bin has a low but finite density
+    SMOOTHING = 0.5
+
+    def __init__(self, contamination: float = 0.02, n_bins: int = 20):
+        super().__init__(contamination)
+        if n_bins < 2:
+            raise ValueError(f"n_bins must be at least 2, got {n_bins}")
+        self.n_bins = n_bins
+
+    def _bins(self, X: np.ndarray) -> np.ndarray:
+        bins = np.minimum(np.floor((X - self.min_) / self.width_), self.n_bins - 1)
+        # The training maximum belongs to the last bin; anything outside the range goes to the empty bin
+        bins[(X < self.min_) | (X > self.max_) | np.isnan(X)] = self.n_bins
+        return bins.astype(np.int64) + np.arange(X.shape[1]) * (self.n_bins + 1)
+
+    def _fit(self, X):
+        self.min_, self.max_ = X.min(axis=0), X.max(axis=0)
+        span = self.max_ - self.min_
+        self.width_ = np.where(span > 0, span / self.n_bins, 1.0)
+        bins = self._bins(X)
+        counts = np.bincount(bins.ravel(), minlength=X.shape[1] * (self.n_bins + 1)).astype(np.float64)
+        counts = counts.reshape(X.shape[1], self.n_bins + 1)
+        counts[:, -1] = 0.0
+        self.log_density_ = np.log((counts + self.SMOOTHING) / (len(X) + self.SMOOTHING * (self.n_bins + 1))).ravel()
+        return self.log_density_[bins].sum(axis=1)
+
+    def score_samples(self, X):
+        return self.log_density_[self._bins(np.asarray(X, dtype=np.float64))].sum(axis=1)
+
+
+class RobustZDetector(ThresholdDetector):
+    """
+    Per-column robust z-score: distance from the training median in units of 1.4826 x MAD (the std
+    for normal data, but unmoved by the outliers themselves). A row scores by the root mean square of
+    its columns' z-scores; taking the single most extreme column ties too often on discrete columns.
+    """
+
+    def _fit(self, X):
+        self.median_ = np.median(X, axis=0)
+        mad = np.median(np.abs(X - self.median_), axis=0) * 1.4826
+        # Columns with a constant majority have no spread; the scaler has already put them on a unit scale
+        self.scale_ = np.where(mad > 0, mad, 1.0)
+        return self.score_samples(X)
+
+    def score_samples(self, X):
+        z = (np.asarray(X, dtype=np.float64) - self.median_) / self.scale_
+        return -np.sqrt(np.mean(np.nan_to_num(z, nan=np.inf) ** 2, axis=1))
+
+
+DETECTORS = {"hbos": HBOSDetector, "robust_z": RobustZDetector}
+
+
+def detector_name(params: Optional[Dict[str, Any]]) -> str:
+    return (params or {}).get("detector") or DEFAULT_DETECTOR
+
+
+def resolve_model_params(params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The chosen detector's defaults overlaid with `params`. The detector name is only kept for
+    detectors other than the default, so Isolation Forest params (and registry keys) are unchanged.
+    Raises ValueError for an unknown detector or a parameter the detector does not take.
+    """
+    params = dict(params or {})
+    name = params.pop("detector", None) or DEFAULT_DETECTOR
+    if name not in DETECTOR_NAMES:
+        raise ValueError(f"Unknown detector '{name}', choose one of {', '.join(DETECTOR_NAMES)}")
+    if name == DEFAULT_DETECTOR:
+        # n_jobs is a training option, not part of the model
+        defaults, accepted = DEFAULT_MODEL_PARAMS, set(IsolationForest().get_params()) - {"n_jobs"}
+    else:
+        defaults = DETECTORS[name].DEFAULTS
+        accepted = set(defaults)
+    unknown = sorted(set(params) - accepted)
+    if unknown:
+        raise ValueError(f"{DETECTOR_LABELS[name]} does not take {', '.join(unknown)}")
+    resolved = {**defaults, **params}
+    if name != DEFAULT_DETECTOR:
+        resolved["detector"] = name
+    return resolved
+
+
+def make_detector(params: Dict[str, Any], n_jobs: Optional[int] = None):
+    """An unfitted detector for resolved `params`; n_jobs only applies to the Isolation Forest."""
+    params = dict(params)
+    name = params.pop("detector", DEFAULT_DETECTOR)
+    if name == DEFAULT_DETECTOR:
+        return IsolationForest(**params, n_jobs=n_jobs)
+    return DETECTORS[name](**params)
@@ -0,0 +1,226 @@
+import re
+import json
+import math
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from services.db_pool import get_connection
+
+EXPLANATION_CACHE_DB = "../Database/explanations.db"
+
+# Each Gemini call explains at most EXPLANATION_BATCH_SIZE transactions so the response fits the output limit
+EXPLANATION_BATCH_SIZE = 50
+MAX_CONCURRENT_REQUESTS = 4
+REQUESTS_PER_MINUTE = 60
+MAX_RETRIES = 3
+RETRY_DELAY = 2  # seconds, doubled on every retry; rate-limit (429) errors wait ten times longer
+
+# Part of every cache key: bump it when the prompt changes so older explanations are not reused
+PROMPT_VERSION = 1
+PROMPT_TEMPLATE = """
+    Below is a human-readable report of financial transactions flagged as anomalous:
+
+    {report_text}
+
+    Additionally, here is a JSON containing structured anomaly details:
+
+    {anomalies_json}
+
+    Please analyze these transactions and return a JSON output explaining why each transaction might be suspicious.
+
+    The JSON should look like:
+
+        "transaction Id1": "Explanation for anomaly 1",
+        "transaction Id2": "Explanation for anomaly 2"
+
+    """
+
+
+# The two difference formats produced by anamoly_service.explain_anomalies
+OUTLIER_PATTERN = re.compile(r"^Outlier value: (?P<value>.+) \(Normal: Mean (?P<mean>\S+), Std (?P<std>\S+)\)$")
+CATEGORY_PATTERN = re.compile(r"^Unusual category: (?P<value>.*)$")
+
+
+class RateLimiter:
+    """Spaces call start times evenly so no more than `per_minute` calls begin in any minute."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# The quota belongs to the API key, so every analysis in the process shares one limiter
+_rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+
+
+def _describe_difference(column: str, difference: str) -> str:
+    outlier = OUTLIER_PATTERN.match(difference)
+    if outlier:
+        try:
+            value, mean, std = (float(outlier[name]) for name in ("value", "mean", "std"))
+        except ValueError:
+            return f"{column}: {difference}"
+        if not all(math.isfinite(number) for number in (value, mean, std)):
+            return f"{column}: {difference}"
+        if std > 0:
+            z_score = (value - mean) / std
+            direction = "above" if z_score > 0 else "below"
+            return (f"{column} of {outlier['value']} is {abs(z_score):.1f} standard deviations "
+                    f"{direction} its usual average of {outlier['mean']}")
+        return f"{column} of {outlier['value']} differs from the constant {outlier['mean']} seen historically"
+    category = CATEGORY_PATTERN.match(difference)
+    if category:
+        return f"{column} '{category['value']}' is rare or unseen in historical transactions"
+    return f"{column}: {difference}"
+
+
+def template_explanation(differences: Dict[str, str]) -> str:
+    """Deterministic, offline reason for one transaction built from its structured differences."""
+    if not differences:
+        return ("Flagged by the anomaly model for an unusual combination of values; "
+                "no single field is far from its historical range.")
+    return "Flagged by the anomaly model: " + "; ".join(
+        _describe_difference(column, difference) for column, difference in differences.items()) + "."
+
+
+def template_explanations(transaction_ids: List[str], anomalies_data: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    return {txn_id: template_explanation(anomalies_data.get(txn_id, {})) for txn_id in transaction_ids}
+
+
+def transaction_fingerprint(txn_id: str, report_line: str, differences: Dict[str, str], model_name: str) -> str:
+    """Hashes everything the prompt says about one transaction, so a rerun on the same data hits the cache."""
+    payload = json.dumps([PROMPT_VERSION, model_name, txn_id, report_line, differences], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _init_cache(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS explanations (
+            fingerprint TEXT PRIMARY KEY,
+            explanation TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def get_cached_explanations(fingerprints: List[str], chunk_size: int = 500) -> Dict[str, str]:
+    cached = {}
+    with get_connection(EXPLANATION_CACHE_DB) as conn:
+        _init_cache(conn)
+        for start in range(0, len(fingerprints), chunk_size):
+            chunk = fingerprints[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT fingerprint, explanation FROM explanations WHERE fingerprint IN ({placeholders})",
+                                chunk).fetchall()
+            cached.update(rows)
+    return cached
+
+
+def store_explanations(explanations: Dict[str, str]):
+    if not explanations:
+        return
+    created_at = datetime.now().isoformat()
+    with get_connection(EXPLANATION_CACHE_DB) as conn:
+        _init_cache(conn)
+        conn.executemany("INSERT OR REPLACE INTO explanations (fingerprint, explanation, created_at) VALUES (?, ?, ?)",
+                         [(fingerprint, text, created_at) for fingerprint, text in explanations.items()])
+        conn.commit()
+
+
+def parse_explanations(text: str) -> Optional[Dict[str, Any]]:
+    start_idx = text.find("{")
+    end_idx = text.rfind("}")
+    if start_idx == -1 or end_idx == -1:
+        return None
+    try:
+        parsed = json.loads(text[start_idx:end_idx + 1])
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _explain_batch(model, batch_ids: List[str], report_lines: Dict[str, str],
+                   anomalies_data: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    prompt = PROMPT_TEMPLATE.format(
+        report_text="\n".join(report_lines[txn_id] for txn_id in batch_ids),
+        anomalies_json=json.dumps({txn_id: anomalies_data[txn_id] for txn_id in batch_ids}, indent=2))
+    wanted = set(batch_ids)
+    last_error = None
+    for retry in range(MAX_RETRIES):
+        _rate_limiter.wait()
+        try:
+            parsed = parse_explanations(model.generate_content(prompt).text)
+            if parsed is None:
+                raise ValueError("Response did not contain a JSON object")
+            explanations = {str(k): str(v) for k, v in parsed.items() if str(k) in wanted}
+            if not explanations:
+                raise ValueError("Response explained none of the requested transactions")
+            # A partial answer is kept; transactions it left out are reported as unexplained
+            return explanations
+        except Exception as e:
+            last_error = e
+            if retry < MAX_RETRIES - 1:
+                wait_time = RETRY_DELAY * (2 ** retry) * (10 if "429" in str(e) else 1)
+                print(f"Explanation batch failed ({e}), retry {retry + 1}/{MAX_RETRIES} in {wait_time} seconds...")
+                time.sleep(wait_time)
+    raise last_error
+
+
+def explain_with_llm(transaction_ids: List[str],
+                     report_lines: List[str],
+                     anomalies_data: Dict[str, Dict[str, str]],
+                     model,
+                     progress_callback: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Asks Gemini why each transaction is suspicious, EXPLANATION_BATCH_SIZE transactions per call and
+    up to MAX_CONCURRENT_REQUESTS calls at once under the shared rate limit.
+    Explanations are cached per transaction fingerprint; only uncached transactions are sent.
+    A batch that still fails after MAX_RETRIES is skipped and its transactions listed as failed,
+    so one bad response no longer sinks the whole analysis.
+    `progress_callback(batches_done, total_batches, explained)` is called after every batch.
+    """
+    lines = dict(zip(transaction_ids, report_lines))
+    model_name = getattr(model, "model_name", "")
+    fingerprints = {txn_id: transaction_fingerprint(txn_id, lines[txn_id], anomalies_data[txn_id], model_name)
+                    for txn_id in transaction_ids}
+    cached = get_cached_explanations(list(fingerprints.values()))
+    explanations = {txn_id: cached[fp] for txn_id, fp in fingerprints.items() if fp in cached}
+
+    pending = [txn_id for txn_id in transaction_ids if txn_id not in explanations]
+    batches = [pending[i:i + EXPLANATION_BATCH_SIZE] for i in range(0, len(pending), EXPLANATION_BATCH_SIZE)]
+    failed_batches = 0
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(batches))) as executor:
+            futures = {executor.submit(_explain_batch, model, batch, lines, anomalies_data): batch for batch in batches}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    batch_explanations = future.result()
+                except Exception as e:
+                    failed_batches += 1
+                    print(f"Giving up on explanation batch of {len(futures[future])} transactions: {e}")
+                else:
+                    explanations.update(batch_explanations)
+                    store_explanations({fingerprints[txn_id]: text for txn_id, text in batch_explanations.items()})
+                if progress_callback:
+                    progress_callback(done, len(batches), len(explanations))
+
+    return {
+        "explanations": explanations,
+        "failed_transactions": [txn_id for txn_id in transaction_ids if txn_id not in explanations],
+        "cached": len(cached),
+        "batches": len(batches),
+        "failed_batches": failed_batches,
+    }
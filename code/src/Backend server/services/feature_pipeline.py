@@ -0,0 +1,279 @@
+import re
+import zlib
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Feature preparation before scaling: every training column is profiled once and given a "kind",
+# saved with the model as its feature plan so detection and online scoring build the same features.
+FEATURE_PLAN_VERSION = 1
+
+# Object columns whose present values parse as numbers (or ISO dates) at least this often are treated as such;
+# the rest ("INVALID", typos) become the column's training median and are counted in INVALID_COUNT_FEATURE
+COERCE_RATIO = 0.9
+# Columns with more distinct values than this share of their present values can be identifiers, which are dropped:
+# text columns always are; integer columns only when named like one or shaped like one (see _identifier_shape),
+# so high-cardinality integer measurements (exposures, amounts) stay numeric
+IDENTIFIER_CARDINALITY = 0.5
+# Integer columns named like this are identifiers or codes, never magnitudes (Zip Code, Account Number)
+IDENTIFIER_NAME_PATTERN = re.compile(r"(?<![a-z0-9])(id|code|zip|number|no|key|tin|cusip|isin)(?![a-z0-9])",
+                                     re.IGNORECASE)
+# Integer-valued columns with at most this many distinct values are codes (Credit Facility Type), encoded as categories
+MAX_CODE_CARDINALITY = 64
+# Categorical columns with more categories than this are hashed into HASH_BUCKETS codes instead of label encoded
+MAX_ENCODED_CATEGORIES = 256
+HASH_BUCKETS = 64
+# High-cardinality columns are first checked on this many sampled rows before every distinct value is parsed
+PARSE_PROBE_ROWS = 1000
+# Per-row count of numeric and date values that were missing or did not parse
+INVALID_COUNT_FEATURE = "Invalid Value Count"
+MISSING_VALUE = "Unknown"
+
+INTEGER_PATTERN = r"[+-]?\d+"
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == MISSING_VALUE or (isinstance(value, float) and math.isnan(value))
+
+
+def parse_number(value) -> float:
+    """The value as a finite float, or NaN when it is missing or not a number."""
+    if _is_missing(value):
+        return float("nan")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+    return number if math.isfinite(number) else float("nan")
+
+
+def parse_date(value) -> float:
+    """An ISO 8601 date or timestamp as (fractional) days since 1970-01-01 UTC, or NaN."""
+    if _is_missing(value):
+        return float("nan")
+    try:
+        parsed = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return float("nan")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return (parsed - _EPOCH).total_seconds() / 86400
+
+
+def category_text(value) -> str:
+    """
+    The category a value stands for: missing values are MISSING_VALUE, and integral floats lose their
+    ".0", so a code read as 3.0 (from a column with missing values) and as "3" is the same category.
+    """
+    if _is_missing(value):
+        return MISSING_VALUE
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def category_texts(values: pd.Series) -> pd.Series:
+    """category_text of every value, as label encoders are fitted and applied."""
+    return _map_values(values, category_text)
+
+
+def hash_bucket(value, buckets: int = HASH_BUCKETS) -> int:
+    # crc32 rather than hash(), which is salted per process and would not survive a reload
+    text = MISSING_VALUE if _is_missing(value) else str(value)
+    return zlib.crc32(text.encode("utf-8")) % buckets
+
+
+def _map_values(values: pd.Series, func) -> pd.Series:
+    # Applies a scalar parser once per distinct value, so batch and per-record encodings agree exactly
+    mapping = {value: func(value) for value in values.dropna().unique()}
+    return values.map(mapping).where(values.notna(), func(None))
+
+
+def _datetime_days(values: pd.Series) -> pd.Series:
+    parsed = pd.to_datetime(values, format="ISO8601", errors="coerce", utc=True)
+    return (parsed - pd.Timestamp(_EPOCH, tz="UTC")) / pd.Timedelta(days=1)
+
+
+def _probe_ratio(values: pd.Series, weights: np.ndarray, parse) -> float:
+    # Share of PARSE_PROBE_ROWS rows, drawn in proportion to their counts, that parse
+    rows = np.random.default_rng(0).choice(len(values), PARSE_PROBE_ROWS, p=weights / weights.sum())
+    return float(np.isfinite(parse(values.iloc[rows]).to_numpy(dtype=np.float64)).mean())
+
+
+def _weighted_median(values: np.ndarray, weights: np.ndarray) -> float:
+    order = np.argsort(values)
+    values, cumulative = values[order], np.cumsum(weights[order])
+    return float(values[np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def profile_cardinality(counts: pd.Series) -> Dict[str, Any]:
+    """
+    Summarises an object column from its value counts ("Unknown" counting as missing):
+    distinct present values, their share of the present rows, how many of those rows are
+    written as integers, and how many parse as numbers and as dates, with the median of
+    each parse for filling invalid values.
+    """
+    present = counts.drop(MISSING_VALUE, errors="ignore")
+    rows = int(present.sum())
+    summary = {
+        "cardinality": int(len(present)),
+        "missing": int(counts.get(MISSING_VALUE, 0)),
+        "distinct_ratio": len(present) / rows if rows else 0.0,
+    }
+    weights = present.to_numpy(dtype=np.float64)
+    values = pd.Series(present.index.astype(str))
+    integers = np.asarray(values.str.fullmatch(INTEGER_PATTERN), dtype=bool)
+    summary["integer_ratio"] = float(weights[integers].sum() / rows) if rows else 0.0
+    # Vectorised parses only decide the plan; encoding itself goes through parse_number and parse_date
+    parsers = (("numeric", lambda probe=values: pd.to_numeric(probe, errors="coerce")),
+               ("date", lambda probe=values: _datetime_days(probe)))
+    for kind, parse in parsers:
+        if len(values) > PARSE_PROBE_ROWS and _probe_ratio(values, weights, parse) < COERCE_RATIO - 0.1:
+            # Identifiers fail on a probe of a thousand rows instead of parsing every distinct value
+            summary[f"{kind}_ratio"], summary[f"{kind}_median"] = 0.0, 0.0
+            continue
+        parsed = parse().to_numpy(dtype=np.float64)
+        valid = np.isfinite(parsed)
+        summary[f"{kind}_ratio"] = float(weights[valid].sum() / rows) if rows else 0.0
+        summary[f"{kind}_median"] = _weighted_median(parsed[valid], weights[valid]) if valid.any() else 0.0
+        if summary[f"{kind}_ratio"] >= COERCE_RATIO:
+            # Numbers take precedence over dates, so numeric codes are never read as compact dates
+            break
+    return summary
+
+
+def _identifier_shape(integers: pd.Series, numbers: pd.Series) -> bool:
+    """
+    Whether integer values look assigned rather than measured: fixed-width codes (every value written
+    with the same number of digits) or a sequence (values rising strictly in row order).
+    `integers` holds the distinct values as written, `numbers` the parsed values in row order.
+    """
+    widths = integers.str.lstrip("+-").str.len()
+    if len(widths) > 1 and widths.nunique() == 1:
+        return True
+    numbers = numbers.dropna()
+    return len(numbers) > 1 and numbers.is_monotonic_increasing and numbers.is_unique
+
+
+def _categorical_spec(cardinality: int) -> Dict[str, Any]:
+    return {"kind": "hashed", "buckets": HASH_BUCKETS} if cardinality > MAX_ENCODED_CATEGORIES else {"kind": "categorical"}
+
+
+def build_feature_plan(df: pd.DataFrame, categorical_cols, category_counts: Optional[Dict[str, Any]] = None,
+                       numeric_ranges: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Decides how each training column becomes model features:
+    - dropped: constant, or an identifier: distinct values above IDENTIFIER_CARDINALITY of present values,
+      for text, or for integers named like an identifier (IDENTIFIER_NAME_PATTERN: Zip Code, Industry Code)
+      or shaped like one (fixed-width codes, sequences). Other integer columns are measurements, however
+      many distinct values they have (Committed Exposure Global)
+    - categorical: label encoded; integer codes with at most MAX_CODE_CARDINALITY values (Credit Facility Type)
+      and integer columns named like codes are categories too, never magnitudes
+    - hashed: more than MAX_ENCODED_CATEGORIES categories, hashed into HASH_BUCKETS codes
+    - numeric: used as is; object columns that are mostly numbers are parsed
+    - date: mostly ISO dates, encoded as days since 1970-01-01 (Origination Date)
+
+    `df` holds the training rows with missing values filled as "Unknown". When training on a sample,
+    `category_counts` (value counts over the whole file, None past the tracking cap) and
+    `numeric_ranges` ({column: {"min", "max"}}) describe every row instead of just the sample.
+    """
+    category_counts = category_counts or {}
+    numeric_ranges = numeric_ranges or {}
+    columns = {}
+    for col in df.columns:
+        named = bool(IDENTIFIER_NAME_PATTERN.search(str(col)))
+        if col not in categorical_cols:
+            values = pd.to_numeric(df[col], errors="coerce")
+            low, high = (numeric_ranges[col]["min"], numeric_ranges[col]["max"]) if col in numeric_ranges \
+                else (values.min(), values.max())
+            cardinality, present = int(values.nunique()), int(values.notna().sum())
+            codes = pd.api.types.is_integer_dtype(values)
+            if low == high:
+                columns[col] = {"kind": "dropped", "reason": "constant"}
+            elif codes and cardinality > IDENTIFIER_CARDINALITY * present and \
+                    (named or _identifier_shape(pd.Series(values.unique()).astype(str), values)):
+                columns[col] = {"kind": "dropped", "reason": "identifier"}
+            elif codes and (named or cardinality <= MAX_CODE_CARDINALITY):
+                columns[col] = _categorical_spec(cardinality)
+            else:
+                columns[col] = {"kind": "numeric", "invalid": int(values.isna().sum()), "fill": float(values.median())}
+            columns[col]["cardinality"] = cardinality
+            continue
+
+        counts = category_counts.get(col)
+        if counts is None:
+            counts = category_texts(df[col]).value_counts()
+        summary = profile_cardinality(counts)
+        present = int(counts.sum()) - summary["missing"]
+        codes = summary["integer_ratio"] >= COERCE_RATIO
+        dates = summary.get("date_ratio", 0.0) >= COERCE_RATIO
+        measurements = dates or (summary["numeric_ratio"] >= COERCE_RATIO and not codes)
+        if summary["distinct_ratio"] <= IDENTIFIER_CARDINALITY or measurements:
+            identifier = False
+        elif codes:
+            integers = pd.Series(counts.index.astype(str))
+            integers = integers[integers.str.fullmatch(INTEGER_PATTERN)]
+            identifier = named or _identifier_shape(integers, pd.to_numeric(df[col], errors="coerce"))
+        else:
+            identifier = True
+        if len(counts) <= 1:
+            columns[col] = {"kind": "dropped", "reason": "constant"}
+        elif identifier:
+            columns[col] = {"kind": "dropped", "reason": "identifier"}
+        elif codes and (named or summary["cardinality"] <= MAX_CODE_CARDINALITY):
+            columns[col] = _categorical_spec(summary["cardinality"])
+        elif summary["numeric_ratio"] >= COERCE_RATIO or dates:
+            kind = "numeric" if summary["numeric_ratio"] >= COERCE_RATIO else "date"
+            unparsed = int(round((1 - summary[f"{kind}_ratio"]) * present))
+            columns[col] = {"kind": kind, "invalid": unparsed + summary["missing"], "fill": summary[f"{kind}_median"]}
+        else:
+            columns[col] = _categorical_spec(summary["cardinality"])
+        columns[col]["cardinality"] = summary["cardinality"]
+
+    features = [col for col, spec in columns.items() if spec["kind"] != "dropped"]
+    if any(spec.get("invalid") for spec in columns.values() if spec["kind"] in ("numeric", "date")):
+        features.append(INVALID_COUNT_FEATURE)
+    return {"version": FEATURE_PLAN_VERSION, "input_columns": list(df.columns), "columns": columns,
+            "features": features}
+
+
+def encoded_columns(plan: Dict[str, Any]):
+    """Columns that are label encoded, and so need a fitted LabelEncoder."""
+    return [col for col, spec in plan["columns"].items() if spec["kind"] == "categorical"]
+
+
+def apply_feature_plan(df: pd.DataFrame, plan: Dict[str, Any], label_encoders) -> pd.DataFrame:
+    """
+    Builds the model's feature frame (plan["features"], in order) from raw transactions.
+    Unseen categories become -1; missing or unparseable numbers and dates become the training
+    median and are counted per row. Columns absent from `df` are treated as missing throughout.
+    """
+    features, invalid = {}, np.zeros(len(df), dtype=np.int64)
+    for col in plan["features"]:
+        if col == INVALID_COUNT_FEATURE:
+            continue
+        spec = plan["columns"][col]
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        if spec["kind"] in ("numeric", "date"):
+            if spec["kind"] == "numeric" and pd.api.types.is_numeric_dtype(values):
+                parsed = values.astype(np.float64).where(np.isfinite(values.astype(np.float64)))
+            else:
+                parsed = _map_values(values, parse_number if spec["kind"] == "numeric" else parse_date)
+            parsed = parsed.astype(np.float64)
+            invalid += parsed.isna().to_numpy()
+            features[col] = parsed.fillna(spec["fill"])
+        elif spec["kind"] == "hashed":
+            features[col] = _map_values(values, lambda value: hash_bucket(value, spec["buckets"])).astype(np.int64)
+        else:
+            encoder = label_encoders.get(col)
+            text = category_texts(values)
+            features[col] = pd.Categorical(text, categories=encoder.classes_).codes.astype(np.int64) \
+                if encoder is not None else -1
+    if INVALID_COUNT_FEATURE in plan["features"]:
+        features[INVALID_COUNT_FEATURE] = invalid
+    return pd.DataFrame(features, index=df.index)[plan["features"]]
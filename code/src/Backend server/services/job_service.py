@@ -0,0 +1,286 @@
+import json
+import uuid
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from services.db_pool import get_connection
+
+JOBS_DB = '../Database/jobs.db'
+
+# Worker pool sizing: long pipelines run here instead of inside the request
+MAX_WORKERS = 2
+MAX_QUEUED_JOBS = 50
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED, INTERRUPTED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """
+    Handed to every job handler. Handlers call `report` between (and within) stages;
+    each report is persisted and doubles as a cooperative cancellation point.
+    """
+
+    def __init__(self, job_id: str, cancel_event: threading.Event):
+        self.job_id = job_id
+        self._cancel_event = cancel_event
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def report(self, stage: str, progress: Optional[float] = None, **details):
+        _record_progress(self.job_id, stage, progress, details)
+        self.check_cancelled()
+
+
+_handlers: Dict[str, Callable[[Dict[str, Any], JobContext], Any]] = {}
+_cancel_events: Dict[str, threading.Event] = {}
+_futures: Dict[str, Any] = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="job-worker")
+
+
+def register_job(kind: str, handler: Callable[[Dict[str, Any], JobContext], Any]):
+    """Registers the callable that runs jobs of `kind`; it receives (params, context)."""
+    _handlers[kind] = handler
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def init_job_store():
+    with get_connection(JOBS_DB) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                session_id TEXT,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress REAL DEFAULT 0,
+                details TEXT,
+                stages TEXT,
+                params TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TEXT,
+                started_at TEXT,
+                finished_at TEXT
+            )
+        """)
+        conn.commit()
+
+
+def _update_job(job_id: str, **fields):
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with get_connection(JOBS_DB) as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+
+def _row_to_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    for column in ("details", "stages", "params", "result"):
+        if job.get(column):
+            job[column] = json.loads(job[column])
+    return job
+
+
+def _fetch_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with get_connection(JOBS_DB) as conn:
+        cursor = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        row = cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+    if row is None:
+        return None
+    return _row_to_job(dict(zip(columns, row)))
+
+
+def _record_progress(job_id: str, stage: str, progress: Optional[float], details: Dict[str, Any]):
+    # The stages list is read, extended and written back; under the lock so concurrent reports
+    # (an audit's two branches, say) never overwrite each other's stages
+    with _lock:
+        job = _fetch_job(job_id)
+        stages = job.get("stages") or []
+        if not stages or stages[-1]["stage"] != stage:
+            if stages:
+                stages[-1]["finished_at"] = _now()
+            stages.append({"stage": stage, "started_at": _now(), "finished_at": None})
+        fields = {"stage": stage, "stages": json.dumps(stages), "details": json.dumps(details, default=str)}
+        if progress is not None:
+            fields["progress"] = round(min(max(progress, 0.0), 1.0), 4)
+        _update_job(job_id, **fields)
+
+
+def _run_job(job_id: str, kind: str, params: Dict[str, Any]):
+    with _lock:
+        cancel_event = _cancel_events.setdefault(job_id, threading.Event())
+    context = JobContext(job_id, cancel_event)
+    try:
+        if context.cancelled:
+            raise JobCancelled(f"Job {job_id} was cancelled")
+        _update_job(job_id, status=RUNNING, started_at=_now())
+        result = _handlers[kind](params, context)
+        context.check_cancelled()
+        with _lock:
+            job = _fetch_job(job_id)
+            stages = job.get("stages") or []
+            if stages and not stages[-1]["finished_at"]:
+                stages[-1]["finished_at"] = _now()
+            _update_job(job_id, status=SUCCEEDED, progress=1.0, stages=json.dumps(stages),
+                        result=json.dumps(result, default=str), finished_at=_now())
+    except JobCancelled:
+        _update_job(job_id, status=CANCELLED, finished_at=_now())
+    except Exception as e:
+        print(f"Job {job_id} ({kind}) failed: {e}")
+        _update_job(job_id, status=FAILED, error=str(e), finished_at=_now())
+    finally:
+        with _lock:
+            _cancel_events.pop(job_id, None)
+            _futures.pop(job_id, None)
+
+
+def _enqueue(job_id: str, kind: str, params: Dict[str, Any]):
+    with _lock:
+        _cancel_events[job_id] = threading.Event()
+        _futures[job_id] = _executor.submit(_run_job, job_id, kind, params)
+
+
+def submit_job(kind: str, params: Dict[str, Any], session_id: Optional[str] = None) -> Dict[str, Any]:
+    if kind not in _handlers:
+        raise HTTPException(status_code=400, detail=f"Unknown job type: {kind}")
+    job_id = uuid.uuid4().hex
+    # The cap is checked and a slot reserved in one step, so concurrent submits cannot exceed it
+    with _lock:
+        if len(_futures) >= MAX_QUEUED_JOBS:
+            raise HTTPException(status_code=429, detail="Too many jobs pending, try again later")
+        _futures[job_id] = None
+    try:
+        with get_connection(JOBS_DB) as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, session_id, status, progress, stages, params, created_at) "
+                "VALUES (?, ?, ?, ?, 0, '[]', ?, ?)",
+                (job_id, kind, session_id, QUEUED, json.dumps(params), _now()))
+            conn.commit()
+    except Exception:
+        with _lock:
+            _futures.pop(job_id, None)
+        raise
+    _enqueue(job_id, kind, params)
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = _fetch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    job.pop("result", None)
+    return job
+
+
+def get_job_result(job_id: str) -> Dict[str, Any]:
+    job = _fetch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    return job["result"]
+
+
+def _elapsed_since(timestamp: Optional[str], until: Optional[str] = None) -> float:
+    if not timestamp:
+        return 0.0
+    end = datetime.fromisoformat(until) if until else datetime.now()
+    return max((end - datetime.fromisoformat(timestamp)).total_seconds(), 0.0)
+
+
+def progress_snapshot(job_id: str) -> Dict[str, Any]:
+    """
+    Job status enriched with live throughput: elapsed time, rows/sec for the current
+    stage (from the `rows_processed` a handler reports) and an ETA from overall progress.
+    """
+    job = get_job(job_id)
+    details = job.get("details") or {}
+    stages = job.get("stages") or []
+    elapsed = _elapsed_since(job.get("started_at"), job.get("finished_at"))
+    stage_elapsed = _elapsed_since(stages[-1]["started_at"], stages[-1]["finished_at"]) if stages else elapsed
+    progress = job.get("progress") or 0.0
+
+    job["elapsed_seconds"] = round(elapsed, 2)
+    job["rows_per_sec"] = round(details["rows_processed"] / stage_elapsed, 1) \
+        if details.get("rows_processed") and stage_elapsed > 0 else None
+    job["eta_seconds"] = round(elapsed * (1 - progress) / progress, 1) \
+        if job["status"] == RUNNING and 0 < progress < 1 else None
+    return job
+
+
+def list_jobs(session_id: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    query = "SELECT job_id FROM jobs"
+    params = []
+    if session_id:
+        query += " WHERE session_id = ?"
+        params.append(session_id)
+    query += " ORDER BY created_at DESC LIMIT ?"
+    params.append(limit)
+    with get_connection(JOBS_DB) as conn:
+        job_ids = [row[0] for row in conn.execute(query, params).fetchall()]
+    return [get_job(job_id) for job_id in job_ids]
+
+
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    job = get_job(job_id)
+    if job["status"] in FINISHED_STATUSES:
+        return job
+
+    with _lock:
+        event = _cancel_events.get(job_id)
+        future = _futures.get(job_id)
+    if event is not None:
+        event.set()
+    # A job that has not started yet is dropped outright; a running one stops at its next report
+    if future is not None and future.cancel():
+        with _lock:
+            _cancel_events.pop(job_id, None)
+            _futures.pop(job_id, None)
+        _update_job(job_id, status=CANCELLED, finished_at=_now())
+    return get_job(job_id)
+
+
+def recover_jobs():
+    """
+    Called once at startup. Jobs that were running when the server stopped are marked
+    interrupted; jobs that were still queued are submitted again.
+    """
+    init_job_store()
+    with get_connection(JOBS_DB) as conn:
+        conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+                     (INTERRUPTED, "Server restarted while the job was running", _now(), RUNNING))
+        conn.commit()
+        queued = conn.execute("SELECT job_id, kind, params FROM jobs WHERE status = ? ORDER BY created_at",
+                              (QUEUED,)).fetchall()
+
+    for job_id, kind, params in queued:
+        if kind in _handlers:
+            _enqueue(job_id, kind, json.loads(params or "{}"))
+        else:
+            _update_job(job_id, status=FAILED, error=f"Unknown job type: {kind}", finished_at=_now())
+    return {"requeued": len(queued)}
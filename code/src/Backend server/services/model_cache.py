@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import joblib
+
+# Models kept in memory at once; the least recently used one is dropped beyond this
+MAX_CACHED_MODELS = 4
+# Artifacts are written uncompressed by joblib.dump, so their NumPy arrays can be mapped
+# straight from the file instead of copied into the heap
+MMAP_MODE = "r"
+
+_cache: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_load_locks: Dict[str, threading.Lock] = {}
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "total_load_time": 0.0}
+
+
+def _signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_model(model_path: str) -> Dict[str, Any]:
+    """
+    Returns the saved model artifact at `model_path`, deserializing it only the first time
+    or after the file changed on disk (keyed by path, mtime and size).
+    The artifact is shared between requests and must be treated as read-only.
+    """
+    key = os.path.abspath(model_path)
+    signature = _signature(key)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == signature:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return cached[1]
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Concurrent requests for the same artifact wait for one load instead of each doing it
+    with load_lock:
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached and cached[0] == signature:
+                _cache.move_to_end(key)
+                _stats["hits"] += 1
+                return cached[1]
+
+        start = time.perf_counter()
+        saved_data = joblib.load(key, mmap_mode=MMAP_MODE)
+        elapsed = time.perf_counter() - start
+
+        with _cache_lock:
+            _stats["misses"] += 1
+            _stats["total_load_time"] += elapsed
+            _cache[key] = (signature, saved_data)
+            _cache.move_to_end(key)
+            while len(_cache) > MAX_CACHED_MODELS:
+                _cache.popitem(last=False)
+                _stats["evictions"] += 1
+    return saved_data
+
+
+def evict(model_path: str):
+    with _cache_lock:
+        _cache.pop(os.path.abspath(model_path), None)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def warm_cache(model_paths: Iterable[Optional[str]]) -> List[str]:
+    """Loads the given artifacts ahead of the first request; missing or unreadable ones are skipped."""
+    warmed = []
+    for path in model_paths:
+        if not path or not os.path.exists(path):
+            continue
+        try:
+            load_model(path)
+            warmed.append(path)
+        except Exception as e:
+            print(f"Could not warm model cache with {path}: {e}")
+    return warmed
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        stats = dict(_stats)
+        stats["cached_models"] = list(_cache)
+    stats["max_cached_models"] = MAX_CACHED_MODELS
+    return stats
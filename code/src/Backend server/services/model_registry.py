@@ -0,0 +1,261 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from services.anamoly_service import (train_model, prepare_features, resolve_sample_size,
+                                      ID_LIKE_CARDINALITY, MODEL_PATH, TRAINING_N_JOBS)
+from services.model_cache import load_model, evict, warm_cache
+from services.detectors import resolve_model_params, detector_name
+from services.session_service import get_session_paths, DEFAULT_SESSION
+
+# The default session's registry; every other session keeps its own under its models folder, so
+# sessions never share (or overwrite) each other's models and deleting a session removes its registry
+REGISTRY_DIR = "./models/registry"
+REGISTRY_INDEX = f"{REGISTRY_DIR}/registry.json"
+
+# Retrain when the new data drifts further than this from the baseline (see compute_drift)
+DRIFT_THRESHOLD = 0.5
+
+# Serialises every read-modify-write of the registry indexes
+_lock = threading.Lock()
+
+
+def data_fingerprint(file_path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_key(params: Dict[str, Any], sample_size: Optional[int] = None,
+               segment_by: Optional[List[str]] = None) -> str:
+    # A model fitted on a sample, or per segment, is a different model; full-data keys stay as they always were
+    keyed = params if sample_size is None else {**params, "sample_size": sample_size}
+    if segment_by:
+        keyed = {**keyed, "segment_by": list(segment_by)}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+
+def _registry_paths(session_id: Optional[str] = None) -> Tuple[str, str]:
+    """(registry folder, index file) of a session."""
+    paths = get_session_paths(session_id)
+    if paths["session_id"] == DEFAULT_SESSION:
+        return REGISTRY_DIR, REGISTRY_INDEX
+    registry_dir = f"{paths['models_dir']}/registry"
+    return registry_dir, f"{registry_dir}/registry.json"
+
+
+def _load_index(session_id: Optional[str] = None) -> Dict[str, Any]:
+    index_path = _registry_paths(session_id)[1]
+    if not os.path.exists(index_path):
+        return {"baseline": None, "models": {}}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_index(index: Dict[str, Any], session_id: Optional[str] = None):
+    # Callers hold _lock; the unique temporary file is swapped in, so readers never see a partial index
+    registry_dir, index_path = _registry_paths(session_id)
+    os.makedirs(registry_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=registry_dir, suffix=".tmp", delete=False, encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+    os.replace(f.name, index_path)
+
+
+def list_models(session_id: Optional[str] = None) -> Dict[str, Any]:
+    with _lock:
+        index = _load_index(session_id)
+    return {"baseline": index["baseline"], "models": sorted(index["models"].values(), key=lambda m: m["created_at"])}
+
+
+def get_model(model_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    with _lock:
+        model = _load_index(session_id)["models"].get(model_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+    return model
+
+
+def find_model(fingerprint: str, params: Dict[str, Any], sample_size: Optional[int] = None,
+               segment_by: Optional[List[str]] = None, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    key = params_key(params, sample_size, segment_by)
+    with _lock:
+        for model in _load_index(session_id)["models"].values():
+            if model["fingerprint"] == fingerprint and model["params_key"] == key and os.path.exists(model["path"]):
+                return model
+    return None
+
+
+def get_baseline(session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    with _lock:
+        index = _load_index(session_id)
+    model = index["models"].get(index["baseline"]) if index["baseline"] else None
+    return model if model and os.path.exists(model["path"]) else None
+
+
+def pin_baseline(model_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    with _lock:
+        index = _load_index(session_id)
+        if model_id not in index["models"]:
+            raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+        index["baseline"] = model_id
+        _save_index(index, session_id)
+    return {"message": f"Model {model_id} pinned as baseline", "baseline": model_id}
+
+
+def delete_model(model_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    with _lock:
+        index = _load_index(session_id)
+        model = index["models"].pop(model_id, None)
+        if model is None:
+            raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
+        if index["baseline"] == model_id:
+            index["baseline"] = None
+        _save_index(index, session_id)
+    evict(model["path"])
+    if os.path.exists(model["path"]):
+        os.remove(model["path"])
+    return {"message": f"Model {model_id} deleted"}
+
+
+def register_trained_model(file_path: str, params: Optional[Dict[str, Any]] = None,
+                           fingerprint: Optional[str] = None, sample_size: Optional[int] = None,
+                           n_jobs: int = TRAINING_N_JOBS, segment_by: Optional[List[str]] = None,
+                           data: Optional[pd.DataFrame] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Trains on `file_path` and records the model in the session's registry under its data fingerprint,
+    params, sample size and segments. `data` is the file already parsed by the caller, saving train_model
+    another read.
+    """
+    params = resolve_model_params(params)
+    fingerprint = fingerprint or data_fingerprint(file_path)
+    sample_size = resolve_sample_size(file_path, sample_size)
+    key = params_key(params, sample_size, segment_by)
+    model_id = f"{fingerprint[:16]}-{key[:8]}"
+    registry_dir = _registry_paths(session_id)[0]
+    model_path = f"{registry_dir}/{model_id}.pkl"
+
+    os.makedirs(registry_dir, exist_ok=True)
+    training = train_model(file_path, model_path=model_path, params=params, sample_size=sample_size, n_jobs=n_jobs,
+                           segment_by=segment_by, data=data)
+    model = {
+        "model_id": model_id,
+        "path": model_path,
+        "fingerprint": fingerprint,
+        "params": params,
+        "sample_size": sample_size,
+        "segment_by": list(segment_by) if segment_by else None,
+        "params_key": key,
+        "source_file": file_path,
+        "created_at": datetime.now().isoformat(),
+        "training_metadata": training["model_details"],
+    }
+    with _lock:
+        index = _load_index(session_id)
+        index["models"][model_id] = model
+        # The first model ever trained becomes the baseline until another one is pinned
+        if not index["baseline"]:
+            index["baseline"] = model_id
+        _save_index(index, session_id)
+    return model
+
+
+def compute_drift(file_path: str, model_path: str, data: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Scores how far a dataset has moved from a model's training data, without retraining:
+    - mean shift: largest |mean| of any feature after the model's own StandardScaler
+      (the training data has mean 0, std 1 in that space)
+    - unseen rate: largest share of categorical values the training encoders never saw
+    Identifier columns (dropped by the feature plan, or ID_LIKE_CARDINALITY for older models) are ignored by both.
+    The drift score is the larger of the two; a changed column set is reported as schema_changed.
+    `data` is the file already parsed by the caller; it is not modified.
+    """
+    saved_data = load_model(model_path)
+    df = pd.read_csv(file_path, index_col="Transaction ID") if data is None else data
+    features = list(saved_data["scaler"].feature_names_in_)
+    plan = saved_data.get("feature_plan")
+    columns = plan["input_columns"] if plan else features
+    if set(columns) != set(df.columns):
+        # A different column set cannot be scored by this model at all
+        return {"drift_score": None, "schema_changed": True,
+                "missing_columns": sorted(set(columns) - set(df.columns)),
+                "new_columns": sorted(set(df.columns) - set(columns))}
+    df = prepare_features(df, saved_data)
+
+    # Identifier columns make every new value "unseen" by construction, so they are left out
+    profiles = saved_data.get("profiles") or {}
+    training_rows = saved_data["training_metadata"]["total_transactions"]
+    id_like = {col for col, le in saved_data["encoders"].items()
+               if profiles.get(col, {}).get("id_like", len(le.classes_) > ID_LIKE_CARDINALITY * training_rows)}
+    scaled = saved_data["scaler"].transform(df)
+    column_shift = np.abs(scaled.mean(axis=0))
+    column_shift[[i for i, col in enumerate(features) if col in id_like]] = 0.0
+    unseen_rates = {col: float((df[col] == -1).mean()) for col in saved_data["encoders"] if col not in id_like}
+
+    mean_shift = float(column_shift.max()) if len(column_shift) else 0.0
+    unseen_rate = max(unseen_rates.values(), default=0.0)
+    return {
+        "drift_score": round(max(mean_shift, unseen_rate), 4),
+        "schema_changed": False,
+        "mean_shift": round(mean_shift, 4),
+        "unseen_category_rate": round(unseen_rate, 4),
+        "most_shifted_column": df.columns[int(column_shift.argmax())] if len(column_shift) else None,
+    }
+
+
+def ensure_model(file_path: str,
+                 params: Optional[Dict[str, Any]] = None,
+                 retrain: bool = False,
+                 drift_threshold: float = DRIFT_THRESHOLD,
+                 sample_size: Optional[int] = None,
+                 segment_by: Optional[List[str]] = None,
+                 data: Optional[pd.DataFrame] = None,
+                 session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns the model (from the session's registry) to score `file_path` with, training only when needed:
+    1. `retrain=True` always trains (and registers) a fresh model.
+    2. A model already trained on identical data and params is reused.
+    3. Otherwise the pinned baseline is used unless the data drifted past `drift_threshold`,
+       or a detector or segmentation was asked for that the baseline does not use.
+    4. With no baseline (or too much drift) a new model is trained and registered.
+    `data` (the parsed file, when the caller already has it) is reused for drift and training.
+    """
+    requested_detector = (params or {}).get("detector")
+    params = resolve_model_params(params)
+    fingerprint = data_fingerprint(file_path)
+    sample_size = resolve_sample_size(file_path, sample_size)
+
+    if not retrain:
+        model = find_model(fingerprint, params, sample_size, segment_by, session_id)
+        if model:
+            return {"action": "reused", "model": model, "drift": None}
+
+        baseline = get_baseline(session_id)
+        # Options left unset accept whatever the pinned baseline uses
+        if baseline and (not requested_detector or detector_name(baseline["params"]) == requested_detector) \
+                and (not segment_by or baseline.get("segment_by") == list(segment_by)):
+            drift = compute_drift(file_path, baseline["path"], data)
+            if not drift["schema_changed"] and drift["drift_score"] <= drift_threshold:
+                return {"action": "baseline", "model": baseline, "drift": drift}
+            print(f"Drift {drift['drift_score']} exceeds threshold {drift_threshold}, retraining")
+            model = register_trained_model(file_path, params, fingerprint, sample_size, segment_by=segment_by, data=data,
+                                           session_id=session_id)
+            return {"action": "retrained_on_drift", "model": model, "drift": drift}
+
+    model = register_trained_model(file_path, params, fingerprint, sample_size, segment_by=segment_by, data=data,
+                                   session_id=session_id)
+    return {"action": "trained", "model": model, "drift": None}
+
+
+def warm_model_cache():
+    """Preloads the pinned baseline and the default model so the first scoring request skips deserialization."""
+    baseline = get_baseline()
+    return warm_cache([baseline["path"] if baseline else None, MODEL_PATH])
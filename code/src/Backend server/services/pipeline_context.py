@@ -0,0 +1,58 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from services.model_cache import load_model
+from services.stage_metrics import StageRecorder
+
+
+class PipelineContext:
+    """
+    State shared by the stages of one anomaly pipeline run over a transactions file.
+
+    The file is parsed once and the model artifact fetched once; detection leaves the scaled feature
+    matrix, the predictions and the anomalous rows here (and explanation the reasons) for later stages to pick up,
+    instead of every stage going back to disk. Each stage is timed (and its memory sampled) by `stages`.
+    The raw frame is shared by all stages and must be treated as read-only.
+    """
+
+    def __init__(self, file_path: str, track_memory: bool = True):
+        self.file_path = file_path
+        self.stages = StageRecorder(track_memory)
+        self.data: Optional[pd.DataFrame] = None
+        self.model_path: Optional[str] = None
+        self.saved_data: Optional[Dict[str, Any]] = None
+        self.features: Optional[np.ndarray] = None
+        self.predictions: Optional[np.ndarray] = None
+        self.anomaly_ids: Optional[List[Any]] = None
+        self.anomalies: Optional[pd.DataFrame] = None
+        self.explanations: Optional[Dict[str, str]] = None
+
+    def stage(self, name: str):
+        return self.stages.stage(name)
+
+    def load_data(self) -> pd.DataFrame:
+        """The raw transactions, indexed by Transaction ID; read on first use only."""
+        if self.data is None:
+            with self.stage("load_data") as stage:
+                self.data = pd.read_csv(self.file_path, index_col="Transaction ID")
+                stage["rows"] = len(self.data)
+        return self.data
+
+    def load_model(self, model_path: str) -> Dict[str, Any]:
+        """The model artifact at `model_path` (through the model cache); fetched again only for another path."""
+        if self.saved_data is None or self.model_path != model_path:
+            with self.stage("load_model"):
+                self.saved_data = load_model(model_path)
+            self.model_path = model_path
+            self.features = self.predictions = self.anomaly_ids = self.anomalies = self.explanations = None
+        return self.saved_data
+
+    def anomaly_rows(self, transaction_ids) -> pd.DataFrame:
+        """Raw rows of `transaction_ids`, reusing the anomalous rows kept by detection when they are the same."""
+        if self.anomalies is not None and list(transaction_ids) == self.anomaly_ids:
+            return self.anomalies
+        return self.load_data().loc[transaction_ids]
+
+    def timings(self) -> Dict[str, Any]:
+        return {"stages": self.stages.summary(), "total_seconds": self.stages.total_seconds()}
@@ -0,0 +1,61 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from services.anamoly_service import detect_anomalies, analyze_anomalies
+from services.model_registry import ensure_model, DRIFT_THRESHOLD
+from services.pipeline_context import PipelineContext
+
+
+def run_detection_pipeline(paths: Dict[str, str],
+                           retrain: bool = False,
+                           drift_threshold: float = DRIFT_THRESHOLD,
+                           explanation_mode: Optional[str] = None,
+                           detector: Optional[str] = None,
+                           segment_by: Optional[List[str]] = None,
+                           report: Optional[Callable[..., None]] = None,
+                           context: Optional[PipelineContext] = None) -> Dict[str, Any]:
+    """
+    Model selection, detection and explanation of a session's transactions over one PipelineContext:
+    the file is parsed once and shared with drift scoring, training, detection and the report writer.
+    `report(stage, progress, **details)` is called as each step starts (a job's progress reporter).
+    The per-stage timings are returned under "pipeline_stages". A caller sharing the data with other
+    work passes its own `context`, which then also holds the detection results and explanations.
+    """
+    report = report or (lambda *args, **kwargs: None)
+    context = context or PipelineContext(paths["new_transactions"])
+    report("load_data", 0.0)
+    data = context.load_data()
+
+    report("select_model", 0.1, rows_processed=len(data))
+    # Only trains when forced, when the data is new to the registry and has drifted from the baseline
+    with context.stage("select_model") as stage:
+        try:
+            selection = ensure_model(paths["new_transactions"], params={"detector": detector} if detector else None,
+                                     retrain=retrain, drift_threshold=drift_threshold, segment_by=segment_by,
+                                     data=data, session_id=paths["session_id"])
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        stage["action"] = selection["action"]
+    model_path = selection["model"]["path"]
+    print("======================================")
+    print(f"Model {selection['model']['model_id']} ({selection['action']})")
+
+    report("detect", 0.3, model_action=selection["action"])
+    anomalies = detect_anomalies(paths["new_transactions"], model_path=model_path, output_file=paths["analysed_xlsx"],
+                                 context=context)
+    print("======================================")
+    print(anomalies)
+    print("======================================")
+
+    report("analyze", 0.5, rows_processed=anomalies.get("total_transactions", 0),
+           anomalies=len(anomalies.get("anomaly_ids", [])))
+    result = analyze_anomalies(anomalies["anomaly_ids"], paths["new_transactions"], model_path=model_path,
+                               output_csv=paths["analysed_csv"], output_xlsx=paths["analysed_xlsx"],
+                               explanation_mode=explanation_mode, context=context,
+                               progress_callback=lambda done, total, explained: report(
+                                   "analyze", 0.5 + 0.5 * done / total, batches_completed=done,
+                                   total_batches=total, explained=explained))
+    result["model_selection"] = selection
+    result["session_id"] = paths["session_id"]
+    result["pipeline_stages"] = context.timings()
+    return result
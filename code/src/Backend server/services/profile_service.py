@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from services.model_registry import data_fingerprint
+from services.sketches import HyperLogLog, QuantileDigest, TopK
+
+# Bump when the profile format changes, so cached profiles are rebuilt
+PROFILE_VERSION = 1
+# Rows read per chunk; with the fixed-size sketches this bounds memory for any file size
+PROFILE_CHUNK_ROWS = 50_000
+# Present values that stand for a missing one (blank or whitespace-only values are counted as empty)
+NULL_TOKENS = frozenset({"NA", "N/A", "n/a", "NULL", "null", "Null", "NaN", "nan", "None", "none", "#N/A"})
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TOP_K = 10
+VALUE_TYPES = ("integer", "float", "boolean", "date", "string")
+
+INTEGER_PATTERN = r"[+-]?\d+"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+class ColumnProfiler:
+    """Accumulates one column's profile from per-chunk value counts, in memory bounded by the sketches."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = self.nulls = self.empties = 0
+        self.types = dict.fromkeys(VALUE_TYPES, 0)
+        self.numeric_sum = 0.0
+        self.text_min: Optional[str] = None
+        self.text_max: Optional[str] = None
+        self.distinct = HyperLogLog()
+        self.digest = QuantileDigest()
+        self.top = TopK()
+
+    def update(self, values: pd.Series):
+        self.rows += len(values)
+        # Every statistic is computed over the chunk's distinct values, weighted by their counts
+        counts = values.fillna("").value_counts(sort=False)
+        text = counts.index.str.strip()
+        empty = np.asarray(text == "")
+        null = np.asarray(text.isin(NULL_TOKENS))
+        weights = counts.to_numpy()
+        self.empties += int(weights[empty].sum())
+        self.nulls += int(weights[null].sum())
+
+        present = ~(empty | null)
+        counts, text, weights = counts[present], text[present], weights[present]
+        if not len(counts):
+            return
+        numbers = np.asarray(pd.to_numeric(text, errors="coerce"), dtype=np.float64)
+        numeric = np.isfinite(numbers)
+        integer = numeric & np.asarray(text.str.fullmatch(INTEGER_PATTERN), dtype=bool)
+        boolean = ~numeric & np.asarray(text.str.lower().isin(["true", "false"]))
+        rest = ~(numeric | boolean)
+        date = np.zeros(len(text), dtype=bool)
+        if rest.any():
+            date[rest] = np.asarray(text[rest].str.fullmatch(DATE_PATTERN), dtype=bool)
+        for value_type, mask in (("integer", integer), ("float", numeric & ~integer), ("boolean", boolean),
+                                 ("date", date), ("string", rest & ~date)):
+            self.types[value_type] += int(weights[mask].sum())
+
+        if numeric.any():
+            self.numeric_sum += float(np.dot(numbers[numeric], weights[numeric]))
+            self.digest.update(numbers[numeric], weights[numeric])
+        chunk_min, chunk_max = text.min(), text.max()
+        self.text_min = chunk_min if self.text_min is None else min(self.text_min, chunk_min)
+        self.text_max = chunk_max if self.text_max is None else max(self.text_max, chunk_max)
+        self.distinct.update(counts.index.to_series())
+        self.top.update(counts)
+
+    def result(self) -> Dict[str, Any]:
+        present = self.rows - self.nulls - self.empties
+        numeric_count = self.types["integer"] + self.types["float"]
+        # Mostly numeric columns report numeric bounds; others the text bounds (ISO dates sort as text)
+        is_numeric = present > 0 and numeric_count >= present / 2
+        return {
+            "column": self.name,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "empties": self.empties,
+            "present": present,
+            "types": self.types,
+            "min": self.digest.min if is_numeric else self.text_min,
+            "max": self.digest.max if is_numeric else self.text_max,
+            "mean": self.numeric_sum / numeric_count if numeric_count else None,
+            # Exact while the heavy-hitter summary still holds every value, a HyperLogLog estimate beyond
+            "distinct": len(self.top.counts) if self.top.exact else self.distinct.count(),
+            "distinct_exact": self.top.exact,
+            "quantiles": {f"p{round(q * 100)}": self.digest.quantile(q) for q in QUANTILES} if numeric_count else None,
+            "top_values": [{"value": value, "count": count} for value, count in self.top.top(TOP_K)],
+            "top_values_error": self.top.error,
+        }
+
+
+def profile_file(file_path: str, chunk_rows: int = PROFILE_CHUNK_ROWS,
+                 progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Profiles every column of a CSV in one pass over `chunk_rows`-row chunks: null and empty counts,
+    type mix, min/max and mean, plus approximate distinct counts, quantiles and top values.
+    Values are read as text, so the profile describes the file as uploaded.
+    """
+    start = time.perf_counter()
+    profilers: Dict[str, ColumnProfiler] = {}
+    rows = 0
+    for chunk in pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+        for column in chunk.columns:
+            profilers.setdefault(column, ColumnProfiler(column)).update(chunk[column])
+        rows += len(chunk)
+        if progress_callback:
+            progress_callback(rows)
+    return {
+        "rows": rows,
+        "columns": [profiler.result() for profiler in profilers.values()],
+        "profile_seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def _cache_path(file_path: str) -> str:
+    return f"{file_path}.profile.json"
+
+
+def _load_cached(file_path: str, signature) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(_cache_path(file_path)):
+        return None
+    try:
+        with open(_cache_path(file_path), "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if cached.get("version") != PROFILE_VERSION:
+        return None
+    if cached.get("signature") == signature:
+        return cached
+    # Touched or re-uploaded: still the same dataset if the content is unchanged
+    if cached.get("fingerprint") == data_fingerprint(file_path):
+        cached["signature"] = signature
+        _save(file_path, cached)
+        return cached
+    return None
+
+
+def _save(file_path: str, profile: Dict[str, Any]):
+    tmp_path = f"{_cache_path(file_path)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, default=str)
+    os.replace(tmp_path, _cache_path(file_path))
+
+
+def get_profile(file_path: str, refresh: bool = False,
+                progress_callback: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    The profile of the dataset at `file_path`, cached beside it and rebuilt only when its content
+    changes (or on `refresh`). Concurrent requests for the same file wait for one profiling pass.
+    """
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    with _locks_lock:
+        lock = _locks.setdefault(os.path.abspath(file_path), threading.Lock())
+    with lock:
+        stat = os.stat(file_path)
+        signature = [stat.st_mtime_ns, stat.st_size]
+        cached = None if refresh else _load_cached(file_path, signature)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        profile = {
+            "version": PROFILE_VERSION,
+            "fingerprint": data_fingerprint(file_path),
+            "signature": signature,
+            "created_at": datetime.now().isoformat(),
+            **profile_file(file_path, progress_callback=progress_callback),
+        }
+        _save(file_path, profile)
+        return {**profile, "cached": False}
@@ -0,0 +1,109 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+# Anomalous rows are filled yellow in the Excel report, transactions failing validation rules red,
+# and in the combined audit transactions that are both orange
+HIGHLIGHT_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+FAILURE_FILL = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
+BOTH_FILL = PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid")
+# Header and index cells are styled as pandas' to_excel styles them
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style="thin"), right=Side(style="thin"),
+                       top=Side(style="thin"), bottom=Side(style="thin"))
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+INDEX_ALIGNMENT = Alignment(vertical="top")
+# Rows per sheet in the XLSX format, header included
+MAX_EXCEL_ROWS = 1_048_576
+
+
+def _styled_cell(ws, value, font=None, border=None, alignment=None, fill=None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if border:
+        cell.border = border
+    if alignment:
+        cell.alignment = alignment
+    if fill:
+        cell.fill = fill
+    return cell
+
+
+def _write_filled_xlsx(df: pd.DataFrame, fills: Iterable[Optional[PatternFill]], output_file: str):
+    """Streams `df` (with its index) to `output_file`, filling each row with its entry of `fills` (None for none)."""
+    if len(df) + 1 > MAX_EXCEL_ROWS:
+        raise ValueError(f"{len(df)} rows do not fit in one Excel sheet (at most {MAX_EXCEL_ROWS - 1})")
+    # Missing values become empty cells, as in to_excel
+    values = df.astype(object).where(df.notna(), None)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([_styled_cell(ws, name, HEADER_FONT, HEADER_BORDER, HEADER_ALIGNMENT)
+               for name in [df.index.name or ""] + [str(col) for col in df.columns]])
+    for fill, (txn_id, *row) in zip(fills, values.itertuples(name=None)):
+        index_cell = _styled_cell(ws, txn_id, HEADER_FONT, HEADER_BORDER, INDEX_ALIGNMENT)
+        if fill is not None:
+            ws.append([index_cell] + [_styled_cell(ws, value, fill=fill) for value in row])
+        else:
+            ws.append([index_cell] + row)
+    wb.save(output_file)
+
+
+def _id_mask(df: pd.DataFrame, transaction_ids: Iterable[Any]) -> np.ndarray:
+    return df.index.astype(str).isin({str(txn_id) for txn_id in transaction_ids})
+
+
+def write_highlighted_xlsx(df: pd.DataFrame, anomaly_ids: Iterable[Any], output_file: str):
+    """
+    Writes `df` (with its index) to `output_file`, filling the rows of `anomaly_ids` yellow.
+
+    Uses openpyxl's write-only workbook, which streams rows to the file instead of keeping a cell
+    object per value: plain rows go out as tuples and only the anomalous rows (and the index column)
+    get styled cells. Membership is one vectorised isin against a set of the IDs.
+    """
+    _write_filled_xlsx(df, np.where(_id_mask(df, anomaly_ids), HIGHLIGHT_FILL, None), output_file)
+
+
+def write_audit_xlsx(df: pd.DataFrame, anomaly_ids: Iterable[Any], failed_ids: Iterable[Any], output_file: str):
+    """
+    Writes the combined audit of `df` to `output_file`: anomalous rows yellow, rows failing
+    validation rules red and rows that are both orange, streamed like write_highlighted_xlsx.
+    """
+    anomalous, failed = _id_mask(df, anomaly_ids), _id_mask(df, failed_ids)
+    fills = np.select([anomalous & failed, failed, anomalous], [BOTH_FILL, FAILURE_FILL, HIGHLIGHT_FILL], None)
+    _write_filled_xlsx(df, fills, output_file)
+
+
+def export_report(df: pd.DataFrame, anomaly_ids: Iterable[Any], output_csv: str, output_xlsx: str):
+    """Writes the analysed transactions as CSV and as highlighted XLSX, the two files side by side in threads."""
+    anomaly_ids = list(anomaly_ids)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(df.to_csv, output_csv, index=True),
+                   pool.submit(write_highlighted_xlsx, df, anomaly_ids, output_xlsx)]
+        for future in futures:
+            future.result()
+
+
+def write_failures_xlsx(transaction_failures: Dict[str, List[Dict[str, str]]], original_file: str, output_file: str):
+    """
+    Copies the `original_file` CSV into a sheet, filling the rows of failed transactions red and
+    writing their failed rules into the last column, streamed like write_highlighted_xlsx.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    with open(original_file, "r", encoding="utf-8", newline="") as f:
+        for line, row in enumerate(csv.reader(f)):
+            failures = transaction_failures.get(row[0]) if line and row else None
+            if failures:
+                row[-1] = " && ".join(f"Failed rule: {rule['rule_name']} ({rule['rule_id']})" for rule in failures)
+                ws.append([_styled_cell(ws, value, fill=FAILURE_FILL) for value in row])
+            else:
+                ws.append(row)
+    wb.save(output_file)
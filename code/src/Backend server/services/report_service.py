@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, JSONResponse, Response
+from services.job_service import submit_job, get_job, FAILED, FINISHED_STATUSES
+from services.report_export import write_highlighted_xlsx, write_failures_xlsx, write_audit_xlsx
+
+# Downloadable Excel reports:
+# - "lazy": a run only records what its report is built from; the report is built by a background
+#   job on the first download and kept under the content hash of those inputs
+# - "eager": the report is written with the results, as it always was
+REPORT_GENERATION = os.getenv("REPORT_GENERATION", "lazy")
+# Seconds a client is asked to wait before trying again while a report is built
+REPORT_RETRY_AFTER = 2
+
+_lock = threading.Lock()
+# Build job of each report file, so concurrent downloads share one build
+_builds: Dict[str, str] = {}
+
+
+def _manifest_path(output_file: str) -> str:
+    return f"{output_file}.manifest.json"
+
+
+def _built_path(output_file: str, digest: str) -> str:
+    root, ext = os.path.splitext(output_file)
+    return f"{root}.{digest[:16]}{ext}"
+
+
+def _file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _signature(file_path: str) -> List[int]:
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _remove_built(output_file: str, keep_output: bool = False):
+    """Removes every built copy of `output_file`, and unless `keep_output` the file itself if it was written eagerly."""
+    folder, name = os.path.split(output_file)
+    root, ext = os.path.splitext(name)
+    pattern = re.compile(rf"{re.escape(root)}\.[0-9a-f]{{16}}{re.escape(ext)}")
+    for entry in os.listdir(folder or "."):
+        if pattern.fullmatch(entry) or (entry == name and not keep_output):
+            os.remove(os.path.join(folder, entry))
+
+
+def defer_report(output_file: str, kind: str, params: Dict[str, Any], sources: List[str]) -> str:
+    """
+    Records that `output_file` is built by REPORT_BUILDERS[kind] from `params` and the `sources` files,
+    replacing any earlier version of it. Returns the content hash that becomes the report's ETag.
+    The sources are read again when the report is built, so their digests are kept to tell if they changed since.
+    """
+    manifest = {"kind": kind, "params": params,
+                "sources": {path: _file_digest(path) for path in sources}}
+    manifest["digest"] = hashlib.sha256(json.dumps(manifest, sort_keys=True, default=str).encode()).hexdigest()
+    manifest["signatures"] = {path: _signature(path) for path in sources}
+    manifest["created_at"] = datetime.now().isoformat()
+    _remove_built(output_file)
+    tmp_path = f"{_manifest_path(output_file)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, default=str)
+    os.replace(tmp_path, _manifest_path(output_file))
+    return manifest["digest"]
+
+
+def discard_report(output_file: str):
+    """Forgets a deferred report, for when `output_file` has just been written directly."""
+    if os.path.exists(_manifest_path(output_file)):
+        os.remove(_manifest_path(output_file))
+        _remove_built(output_file, keep_output=True)
+
+
+def _load_manifest(output_file: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(_manifest_path(output_file)):
+        return None
+    with open(_manifest_path(output_file), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _sources_changed(manifest: Dict[str, Any]) -> bool:
+    """Whether a source file was replaced since the run; only files whose mtime or size moved are hashed again."""
+    signatures = manifest.get("signatures", {})
+    for path, digest in manifest["sources"].items():
+        if not os.path.exists(path):
+            return True
+        if _signature(path) != signatures.get(path) and _file_digest(path) != digest:
+            return True
+    return False
+
+
+def _build_anomaly_report(params: Dict[str, Any], output_file: str):
+    df = pd.read_csv(params["source"], index_col="Transaction ID")
+    write_highlighted_xlsx(df, params["anomaly_ids"], output_file)
+
+
+def _build_validation_report(params: Dict[str, Any], output_file: str):
+    write_failures_xlsx(params["transaction_failures"], params["original_file"], output_file)
+
+
+def _build_audit_report(params: Dict[str, Any], output_file: str):
+    df = pd.read_csv(params["source"], index_col="Transaction ID")
+    write_audit_xlsx(df, params["anomaly_ids"], params["failed_ids"], output_file)
+
+
+REPORT_BUILDERS = {"anomaly_report": _build_anomaly_report, "validation_report": _build_validation_report,
+                   "audit_report": _build_audit_report}
+
+
+def build_report(params, context):
+    """Job handler: builds the report a manifest describes, unless a newer run has replaced the manifest."""
+    output_file = params["output_file"]
+    manifest = _load_manifest(output_file)
+    if manifest is None or manifest["digest"] != params["digest"]:
+        return {"status": "superseded", "output_file": output_file}
+    if _sources_changed(manifest):
+        return {"status": "stale", "output_file": output_file}
+    context.report("build", 0.0, kind=manifest["kind"])
+    built = _built_path(output_file, manifest["digest"])
+    # Written aside and swapped in, so a download never sees a half-written file
+    tmp_path = f"{built}.tmp"
+    try:
+        REPORT_BUILDERS[manifest["kind"]](manifest["params"], tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, built)
+    return {"status": "built", "output_file": built}
+
+
+def _start_build(output_file: str, digest: str, session_id: Optional[str]) -> Dict[str, Any]:
+    built = _built_path(output_file, digest)
+    with _lock:
+        job = None
+        if built in _builds:
+            try:
+                job = get_job(_builds[built])
+            except HTTPException:
+                job = None
+        if job is not None and job["status"] == FAILED:
+            # Reported once; the next download tries again
+            del _builds[built]
+            return job
+        if job is None or job["status"] in FINISHED_STATUSES:
+            job = submit_job("build_report", {"output_file": output_file, "digest": digest}, session_id=session_id)
+            _builds[built] = job["job_id"]
+    return job
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def serve_report(output_file: str, filename: str, if_none_match: Optional[str] = None,
+                 session_id: Optional[str] = None):
+    """
+    Download response for a report: the file (200, with its content hash as ETag), 304 when the
+    client's If-None-Match already names that hash, or 202 while a background job builds it.
+    409 when the data the report was produced from has been replaced since (the run has to be repeated).
+    Reports written eagerly are served as they are.
+    """
+    manifest = _load_manifest(output_file)
+    if manifest is None:
+        if os.path.exists(output_file):
+            return FileResponse(output_file, filename=filename)
+        raise HTTPException(status_code=404, detail="File not found")
+    if _sources_changed(manifest):
+        raise HTTPException(status_code=409, detail="The data changed since these results were produced; "
+                                                    "run it again to download an up-to-date report")
+
+    etag = f'"{manifest["digest"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    built = _built_path(output_file, manifest["digest"])
+    if os.path.exists(built):
+        return FileResponse(built, filename=filename, headers=headers)
+
+    job = _start_build(output_file, manifest["digest"], session_id)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Report could not be built: {job.get('error')}")
+    return JSONResponse(status_code=202, headers={"Retry-After": str(REPORT_RETRY_AFTER)},
+                        content={"status": "building", "job_id": job["job_id"], "retry_after": REPORT_RETRY_AFTER})
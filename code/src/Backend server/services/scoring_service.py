@@ -0,0 +1,296 @@
+import os
+import math
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sklearn.ensemble import IsolationForest
+from starlette.concurrency import run_in_threadpool
+from services.model_cache import load_model
+from services.feature_pipeline import parse_number, parse_date, hash_bucket, category_text, INVALID_COUNT_FEATURE
+from services.segmentation import record_segment_key, route
+from services.model_registry import get_model, get_baseline
+from services.session_service import get_session_paths
+
+# Online scoring limits: records per request, and records scored together by the micro-batcher
+MAX_RECORDS_PER_REQUEST = 1000
+MAX_BATCH_RECORDS = 512
+
+
+def _average_path_length(n_samples):
+    """Expected isolation depth of a point among n samples (same definition as sklearn's IsolationForest)."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n_samples)
+    lengths[n_samples == 2] = 1.0
+    many = n_samples > 2
+    lengths[many] = 2.0 * (np.log(n_samples[many] - 1.0) + np.euler_gamma) - 2.0 * (n_samples[many] - 1.0) / n_samples[many]
+    return lengths
+
+
+class CompiledForest:
+    """
+    An IsolationForest flattened into NumPy arrays. sklearn's decision_function validates input and
+    walks the trees one by one, which costs several milliseconds even for a single row. Here every
+    tree's nodes live in shared arrays and all (tree, record) pairs descend one level per step, so a
+    call costs a handful of NumPy operations. Scores match IsolationForest.decision_function.
+    """
+
+    def __init__(self, forest: IsolationForest):
+        self.offset = float(forest.offset_)
+        roots, left, right, feature, threshold, leaf_depth = [], [], [], [], [], []
+        node_offset, max_depth = 0, 0
+        for estimator, features in zip(forest.estimators_, forest.estimators_features_):
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            # Parents are always numbered before their children, so depths fill in one pass
+            depth = np.zeros(tree.node_count)
+            for node in np.flatnonzero(~is_leaf):
+                depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+            roots.append(node_offset)
+            left.append(np.where(is_leaf, -1, tree.children_left + node_offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + node_offset))
+            feature.append(np.where(is_leaf, 0, np.asarray(features)[np.maximum(tree.feature, 0)]))
+            threshold.append(tree.threshold)
+            leaf_depth.append(depth + _average_path_length(tree.n_node_samples))
+            node_offset += tree.node_count
+            max_depth = max(max_depth, int(depth.max()))
+
+        self.roots = np.array(roots)
+        self.left, self.right = np.concatenate(left), np.concatenate(right)
+        self.feature, self.threshold = np.concatenate(feature), np.concatenate(threshold)
+        self.leaf_depth = np.concatenate(leaf_depth)
+        self.max_depth = max_depth
+        self.denominator = len(forest.estimators_) * float(_average_path_length([forest.max_samples_])[0])
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        """Scores already scaled features."""
+        # Same float32 cast as sklearn's tree traversal
+        X = np.asarray(X).astype(np.float32)
+        records = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            left = self.left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[records, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+        depths = self.leaf_depth[nodes].sum(axis=0)
+        return -(2.0 ** (-depths / self.denominator)) - self.offset
+
+
+def _compile(detector):
+    # The NumPy detectors (see services.detectors) are already vectorised and are called as they are
+    return CompiledForest(detector) if isinstance(detector, IsolationForest) else detector
+
+
+class CompiledScorer:
+    """
+    A saved model (detector, scaler, encoders and feature plan) prepared for per-request scoring:
+    records are encoded with dict lookups, the scaler is inlined and Isolation Forests are compiled
+    (see CompiledForest). Segmented models route each record to its segment's detector.
+    """
+
+    def __init__(self, saved_data: Dict[str, Any]):
+        scaler, encoders = saved_data["scaler"], saved_data["encoders"]
+        self.features = list(scaler.feature_names_in_)
+        plan = saved_data.get("feature_plan")
+        # One (kind, argument, strict) per feature; models without a feature plan only have categorical and numeric
+        self.encodings = []
+        for col in self.features:
+            if not plan:
+                spec = {"kind": "categorical" if col in encoders else "numeric", "invalid": 0, "fill": None}
+            else:
+                spec = {"kind": "invalid_count"} if col == INVALID_COUNT_FEATURE else plan["columns"][col]
+            if spec["kind"] == "categorical":
+                self.encodings.append(("categorical", {value: code for code, value in enumerate(encoders[col].classes_)},
+                                       False))
+            elif spec["kind"] == "hashed":
+                self.encodings.append(("hashed", spec["buckets"], False))
+            elif spec["kind"] in ("numeric", "date"):
+                # Fields that were always valid in training are rejected when invalid, others are filled as in detection
+                self.encodings.append((spec["kind"], spec["fill"], not spec["invalid"]))
+            else:
+                self.encodings.append(("invalid_count", None, False))
+        self.mean = np.zeros(len(self.features)) if scaler.mean_ is None else np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.ones(len(self.features)) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+        self.model = _compile(saved_data["model"])
+        segments = saved_data.get("segments")
+        self.segment_by = segments["by"] if segments else None
+        self.segment_models = {key: _compile(model) for key, model in segments["models"].items()} if segments else {}
+
+    def encode(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Encodes raw transactions like detect_anomalies does; raises 422 for an unusable number or date
+        in a field that was always valid in the training data.
+        """
+        X = np.empty((len(records), len(self.features)), dtype=np.float64)
+        for i, record in enumerate(records):
+            invalid, count_column = 0, None
+            for j, (col, (kind, argument, strict)) in enumerate(zip(self.features, self.encodings)):
+                value = record.get(col)
+                if kind == "categorical":
+                    # Missing values become "Unknown" and integral floats lose their ".0", as in apply_feature_plan
+                    X[i, j] = argument.get(category_text(value), -1)
+                elif kind == "hashed":
+                    X[i, j] = hash_bucket(value, argument)
+                elif kind == "invalid_count":
+                    count_column = j
+                else:
+                    number = parse_number(value) if kind == "numeric" else parse_date(value)
+                    if math.isnan(number):
+                        if strict:
+                            raise HTTPException(status_code=422,
+                                                detail=f"Record {i}: '{col}' must be a valid {kind}, got {value!r}")
+                        invalid, number = invalid + 1, argument
+                    X[i, j] = number
+            if count_column is not None:
+                X[i, count_column] = invalid
+        return X
+
+    def segment_keys(self, records: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not self.segment_by:
+            return None
+        return np.array([record_segment_key(record, self.segment_by) for record in records], dtype=object)
+
+    def decision_function(self, X: np.ndarray, keys: Optional[np.ndarray] = None) -> np.ndarray:
+        return route(self.segment_models, self.model, (X - self.mean) / self.scale, keys, "decision_function")
+
+
+_scorers: Dict[str, Any] = {}
+_scorers_lock = threading.Lock()
+
+
+def get_scorer(model_path: str) -> CompiledScorer:
+    """Compiles each cached artifact once; a reloaded artifact (new object from load_model) is recompiled."""
+    saved_data = load_model(model_path)
+    key = os.path.abspath(model_path)
+    with _scorers_lock:
+        cached = _scorers.get(key)
+        if cached and cached[0] is saved_data:
+            return cached[1]
+    scorer = CompiledScorer(saved_data)
+    with _scorers_lock:
+        _scorers[key] = (saved_data, scorer)
+    return scorer
+
+
+def resolve_model(model_id: Optional[str] = None, session_id: Optional[str] = None) -> Dict[str, str]:
+    """
+    Scores with the requested model of the session's registry, else its pinned baseline, else the
+    session's own model (trained before the registry).
+    """
+    if model_id:
+        return {"model_id": model_id, "path": get_model(model_id, session_id)["path"]}
+    baseline = get_baseline(session_id)
+    if baseline:
+        return {"model_id": baseline["model_id"], "path": baseline["path"]}
+    model_path = get_session_paths(session_id)["model"]
+    if os.path.exists(model_path):
+        return {"model_id": None, "path": model_path}
+    raise HTTPException(status_code=404, detail="No trained model available, run anomaly detection first")
+
+
+def _results(records: List[Dict[str, Any]], scores: np.ndarray) -> List[Dict[str, Any]]:
+    return [{"transaction_id": record.get("Transaction ID"), "score": round(float(score), 6),
+             "is_anomaly": bool(score < 0)}
+            for record, score in zip(records, scores)]
+
+
+def score_records(records: List[Dict[str, Any]], model_path: str) -> List[Dict[str, Any]]:
+    """Scores transactions with the model at `model_path`; negative scores are anomalies, as in predict()."""
+    scorer = get_scorer(model_path)
+    return _results(records, scorer.decision_function(scorer.encode(records), scorer.segment_keys(records)))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent scoring requests. While one batch is being scored, new requests queue up;
+    the next batch takes everything queued (up to MAX_BATCH_RECORDS) and scores it in one pass.
+    An idle server therefore adds no wait, and a busy one spreads the per-call cost over many requests.
+    """
+
+    def __init__(self, max_batch_records: int = MAX_BATCH_RECORDS):
+        self.max_batch_records = max_batch_records
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+        self._stats = {"requests": 0, "records": 0, "batches": 0, "largest_batch": 0}
+
+    async def score(self, records: List[Dict[str, Any]], model_path: str) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((records, model_path, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Let requests that are already being handled join this batch
+            await asyncio.sleep(0)
+            size = len(batch[0][0])
+            while size < self.max_batch_records and not self._queue.empty():
+                item = self._queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+            try:
+                outcomes = await run_in_threadpool(self._score_batch, batch)
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            for (_, _, future), outcome in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+            self._stats["requests"] += len(batch)
+            self._stats["records"] += size
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], size)
+
+    @staticmethod
+    def _score_batch(batch) -> List[Any]:
+        outcomes: List[Any] = [None] * len(batch)
+        by_model: Dict[str, List[int]] = {}
+        for index, (_, model_path, _) in enumerate(batch):
+            by_model.setdefault(model_path, []).append(index)
+
+        for model_path, indices in by_model.items():
+            try:
+                scorer = get_scorer(model_path)
+            except Exception as e:
+                for index in indices:
+                    outcomes[index] = e
+                continue
+            # A bad record only fails its own request
+            encoded = []
+            for index in indices:
+                try:
+                    encoded.append((index, scorer.encode(batch[index][0]), scorer.segment_keys(batch[index][0])))
+                except Exception as e:
+                    outcomes[index] = e
+            if not encoded:
+                continue
+            keys = np.concatenate([k for _, _, k in encoded]) if scorer.segment_by else None
+            scores = scorer.decision_function(np.vstack([X for _, X, _ in encoded]), keys)
+            start = 0
+            for index, X, _ in encoded:
+                outcomes[index] = _results(batch[index][0], scores[start:start + len(X)])
+                start += len(X)
+        return outcomes
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["avg_batch_records"] = round(stats["records"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["max_batch_records"] = self.max_batch_records
+        return stats
+
+
+batcher = MicroBatcher()
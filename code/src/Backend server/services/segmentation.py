@@ -0,0 +1,95 @@
+import os
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from services.detectors import make_detector
+
+# Segmented models: one detector per segment (a distinct combination of the segment_by columns) with at
+# least MIN_SEGMENT_ROWS training rows. Rows of smaller or unseen segments are scored by the global model.
+MIN_SEGMENT_ROWS = 500
+# Segment detectors are fitted in a process pool of this many workers (None: one per core)
+SEGMENT_WORKERS = None
+# Workers are started fresh rather than forked: the server forks from a process running threads
+# (uvicorn, the job pool, stage samplers) whose held locks a forked child would inherit and deadlock on
+SEGMENT_START_METHOD = "spawn"
+SEGMENT_SEPARATOR = " | "
+
+
+def segment_value(value) -> str:
+    # "2", 2 and 2.0 are the same segment whether they come from a CSV column or a JSON record
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "Unknown"
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def record_segment_key(record: Dict[str, Any], segment_by: List[str]) -> str:
+    return SEGMENT_SEPARATOR.join(segment_value(record.get(col)) for col in segment_by)
+
+
+def segment_keys(df: pd.DataFrame, segment_by: List[str]) -> np.ndarray:
+    """The segment of every row of raw transactions; raises ValueError for columns not in the data."""
+    missing = [col for col in segment_by if col not in df.columns]
+    if missing:
+        raise ValueError(f"Cannot segment by {', '.join(missing)}: no such column")
+    parts = []
+    for col in segment_by:
+        values = df[col].astype(object)
+        mapping = {value: segment_value(value) for value in values.dropna().unique()}
+        parts.append(values.map(mapping).where(values.notna(), "Unknown").to_numpy(dtype=object))
+    keys = parts[0]
+    for part in parts[1:]:
+        keys = keys + SEGMENT_SEPARATOR + part
+    return keys
+
+
+def group_rows(keys: np.ndarray) -> Dict[str, np.ndarray]:
+    """Row indices of each segment, found with one sort instead of a comparison per segment."""
+    codes, uniques = pd.factorize(pd.Series(keys, dtype=object))
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+    return dict(zip(uniques, np.split(order, bounds)))
+
+
+def _fit_segment(params: Dict[str, Any], X: np.ndarray):
+    # Runs in a worker process (so it stays a picklable module-level function); the pool already spreads
+    # segments over the cores
+    return make_detector(params, n_jobs=1).fit(X)
+
+
+def fit_segment_models(X: np.ndarray, keys: np.ndarray, params: Dict[str, Any],
+                       min_segment_rows: int = MIN_SEGMENT_ROWS,
+                       max_workers: Optional[int] = SEGMENT_WORKERS) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Fits one detector per segment with at least `min_segment_rows` rows, in parallel across processes.
+    Returns ({segment: fitted detector}, {segment: training rows}) where the second covers every segment.
+    """
+    groups = group_rows(keys)
+    sizes = {key: len(rows) for key, rows in groups.items()}
+    large = {key: X[rows] for key, rows in groups.items() if len(rows) >= min_segment_rows}
+    workers = min(len(large), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return {key: _fit_segment(params, rows) for key, rows in large.items()}, sizes
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(SEGMENT_START_METHOD)) as pool:
+        futures = {key: pool.submit(_fit_segment, params, rows) for key, rows in large.items()}
+        return {key: future.result() for key, future in futures.items()}, sizes
+
+
+def route(models: Dict[str, Any], fallback, X: np.ndarray, keys: Optional[np.ndarray], method: str = "predict"):
+    """Calls `method` of each segment's model on that segment's rows, and of the fallback model on the rest."""
+    if keys is None or not models:
+        return getattr(fallback, method)(X)
+    result = np.empty(len(X), dtype=np.float64)
+    remaining = np.ones(len(X), dtype=bool)
+    for key, rows in group_rows(keys).items():
+        if key in models:
+            result[rows] = getattr(models[key], method)(X[rows])
+            remaining[rows] = False
+    if remaining.any():
+        result[remaining] = getattr(fallback, method)(X[remaining])
+    return result
@@ -0,0 +1,79 @@
+import os
+import re
+import shutil
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from services.db_pool import close_pool
+
+DEFAULT_SESSION = "default"
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Base folders (relative to the backend working directory)
+TEMP_DIR = "../Temp_files"
+DATABASE_DIR = "../Database"
+MODELS_DIR = "./models"
+
+
+def get_session_paths(session_id: Optional[str] = None, create: bool = False) -> Dict[str, str]:
+    """
+    Resolves every per-audit location (dataset, database, model, outputs) for a session.
+
+    The default session keeps the legacy shared paths, so callers that never pass a
+    session ID behave exactly as before. Any other session gets its own folders, which
+    are only created with `create` (by the endpoints that write: upload, pipeline, audit),
+    so reads never leave empty folders behind.
+    """
+    if not session_id or session_id == DEFAULT_SESSION:
+        return {
+            "session_id": DEFAULT_SESSION,
+            "temp_dir": TEMP_DIR,
+            "output_dir": DATABASE_DIR,
+            "models_dir": MODELS_DIR,
+            "new_transactions": f"{TEMP_DIR}/new_tran.csv",
+            "analysed_csv": f"{TEMP_DIR}/analysed_transaction.csv",
+            "analysed_xlsx": f"{TEMP_DIR}/analysed_transaction.xlsx",
+            "audit_csv": f"{TEMP_DIR}/audit_result.csv",
+            "audit_xlsx": f"{TEMP_DIR}/audit_result.xlsx",
+            "audit_db": f"{TEMP_DIR}/audit_transactions.db",
+            "transaction_db": f"{DATABASE_DIR}/transaction.db",
+            "model": f"{MODELS_DIR}/anomoly_detection_model.pkl",
+        }
+
+    if not SESSION_ID_PATTERN.match(session_id):
+        raise HTTPException(status_code=400, detail=f"Invalid session ID: {session_id}")
+
+    temp_dir = f"{TEMP_DIR}/sessions/{session_id}"
+    output_dir = f"{DATABASE_DIR}/sessions/{session_id}"
+    models_dir = f"{MODELS_DIR}/sessions/{session_id}"
+    if create:
+        for folder in (temp_dir, output_dir, models_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    return {
+        "session_id": session_id,
+        "temp_dir": temp_dir,
+        "output_dir": output_dir,
+        "models_dir": models_dir,
+        "new_transactions": f"{temp_dir}/new_tran.csv",
+        "analysed_csv": f"{temp_dir}/analysed_transaction.csv",
+        "analysed_xlsx": f"{temp_dir}/analysed_transaction.xlsx",
+        "audit_csv": f"{temp_dir}/audit_result.csv",
+        "audit_xlsx": f"{temp_dir}/audit_result.xlsx",
+        "audit_db": f"{temp_dir}/audit_transactions.db",
+        "transaction_db": f"{output_dir}/transaction.db",
+        "model": f"{models_dir}/anomoly_detection_model.pkl",
+    }
+
+
+def delete_session(session_id: str) -> str:
+    if not session_id or session_id == DEFAULT_SESSION:
+        raise HTTPException(status_code=400, detail="The default session cannot be deleted")
+
+    paths = get_session_paths(session_id)
+    close_pool(paths["transaction_db"])
+    # Folders that were never created (nothing was written for the session) are left alone
+    for folder in (paths["temp_dir"], paths["output_dir"], paths["models_dir"]):
+        if os.path.isdir(folder):
+            shutil.rmtree(folder, ignore_errors=True)
+    return f"Session {session_id} deleted successfully."
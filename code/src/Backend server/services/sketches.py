@@ -0,0 +1,139 @@
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Fixed-size summaries for profiling data in one pass: memory depends on these settings only,
+# never on how many rows (or distinct values) are fed in.
+# HyperLogLog uses 2**HLL_PRECISION one-byte registers; relative error is about 1.04 / sqrt(2**HLL_PRECISION)
+HLL_PRECISION = 12
+# The quantile sketch keeps about DIGEST_COMPRESSION / 2 centroids
+DIGEST_COMPRESSION = 200
+# Counters kept by the heavy-hitter summary; any value more frequent than 1 / (TOP_K_CAPACITY + 1) is kept
+TOP_K_CAPACITY = 1024
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bit length of each uint64, computed on its 32-bit halves so float64 stays exact."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide="ignore"):
+        return np.where(high > 0, 33 + np.floor(np.log2(high)),
+                        np.where(low > 0, 1 + np.floor(np.log2(low)), 0)).astype(np.int64)
+
+
+class HyperLogLog:
+    """
+    Approximate distinct count. Values are hashed with pandas' (stable, seeded) object hashing, so
+    sketches of the same data agree across processes; each update is vectorised over its values.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: pd.Series):
+        if len(values):
+            self.update_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64))
+
+    def update_hashes(self, hashes: np.ndarray):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        # Position of the first set bit in the remaining 64 - p bits
+        rank = np.minimum(64 - _bit_length(hashes << np.uint64(p)), 64 - p) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while most registers are still empty
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileDigest:
+    """
+    Approximate quantiles in the style of a merging t-digest: values (with weights) are sorted in
+    with the existing centroids and regrouped so each centroid spans one unit of the k1 scale
+    function, which keeps centroids small in the tails and large around the median.
+    """
+
+    def __init__(self, compression: int = DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def total(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=np.float64)
+        finite = np.isfinite(values) & (weights > 0)
+        values, weights = values[finite], weights[finite]
+        if not len(values):
+            return
+        self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, weights]))
+
+    def merge(self, other: "QuantileDigest"):
+        if len(other.means):
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        q = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        bucket = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not len(self.means):
+            return None
+        total = self.total
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * total, np.r_[0.0, centers, total], np.r_[self.min, self.means, self.max]))
+
+
+class TopK:
+    """
+    Most frequent values, by the mergeable Misra-Gries summary over value counts: at most `capacity`
+    counters are kept, and whenever there are more, the (capacity + 1)-th largest count is taken off
+    every counter. Reported counts are low by at most `error`; with nothing ever taken off they are exact.
+    """
+
+    def __init__(self, capacity: int = TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.error = 0
+
+    @property
+    def exact(self) -> bool:
+        return self.error == 0
+
+    def update(self, counts: pd.Series):
+        merged = self.counts.add(counts, fill_value=0) if len(self.counts) else counts
+        if len(merged) > self.capacity:
+            threshold = merged.nlargest(self.capacity + 1).iloc[-1]
+            merged = merged[merged > threshold] - threshold
+            self.error += int(threshold)
+        self.counts = merged.astype("int64")
+
+    def top(self, k: int) -> List[Tuple[Any, int]]:
+        # Ties are broken by value, so the same data always gives the same list
+        ordered = self.counts.reset_index().set_axis(["value", "count"], axis=1)
+        ordered = ordered.sort_values(["count", "value"], ascending=[False, True]).head(k)
+        return [(value, int(count)) for value, count in ordered.itertuples(index=False)]
@@ -4,11 +4,13 @@ import csv
 import sqlite3
 import logging
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Any, Optional
 import argparse
 from datetime import datetime
-import openpyxl
-from openpyxl.styles import PatternFill
+from services.db_pool import get_connection
+from services.report_export import write_failures_xlsx
+from services.report_service import defer_report, discard_report, REPORT_GENERATION
 
 class SQLiteValidator:
 
@@ -47,13 +49,18 @@ class SQLiteValidator:
         
         self.logger = logging.getLogger(__name__)
     
-    def _connect_database(self) -> sqlite3.Connection:
-
+    @contextmanager
+    def _connect_database(self) -> Iterator[sqlite3.Connection]:
+        # Pooled connection, returned to the pool on exit. The connection is opened when the block
+        # is entered, so that is where connection errors are logged; query errors are the caller's
+        entered = False
         try:
-            conn = sqlite3.connect(self.db_path)
-            return conn
+            with get_connection(self.db_path) as conn:
+                entered = True
+                yield conn
         except sqlite3.Error as e:
-            self.logger.error(f"Database connection error: {e}")
+            if not entered:
+                self.logger.error(f"Database connection error: {e}")
             raise
     
     def execute_validation_query(self, 
@@ -62,33 +69,31 @@ class SQLiteValidator:
                              rule_name: str) -> List[Dict[str, Any]]:
 
         try:
-            # Establish database connection
-            conn = self._connect_database()
-            cursor = conn.cursor()
-            
-            # Execute the query
-            self.logger.info(f"Executing rule: {rule_id} - {rule_name}")
-            print(f"Executing query: {query}")
-            cursor.execute(query)
-            
-            
-            # Collect failures
-            failures = []
-            for row in cursor.fetchall():                
-                # Check if the row contains a valid transaction ID
-                if row and len(row) > 0:
-                    # Try to use the first column as transaction ID
-                    transaction_id = str(row[0])
-                    
-                    failures.append({
-                        "transaction_id": transaction_id,
-                        "rule_id": rule_id,
-                        "rule_name": rule_name
-                    })
-            
-            # Close connection
-            cursor.close()
-            conn.close()
+            # Check out a pooled database connection
+            with self._connect_database() as conn:
+                cursor = conn.cursor()
+                
+                # Execute the query
+                self.logger.info(f"Executing rule: {rule_id} - {rule_name}")
+                print(f"Executing query: {query}")
+                cursor.execute(query)
+                
+                
+                # Collect failures
+                failures = []
+                for row in cursor.fetchall():                
+                    # Check if the row contains a valid transaction ID
+                    if row and len(row) > 0:
+                        # Try to use the first column as transaction ID
+                        transaction_id = str(row[0])
+                        
+                        failures.append({
+                            "transaction_id": transaction_id,
+                            "rule_id": rule_id,
+                            "rule_name": rule_name
+                        })
+                
+                cursor.close()
             
             self.logger.info(f"Rule {rule_id} found {len(failures)} violations")
             return failures
@@ -125,100 +130,133 @@ class SQLiteValidator:
             raise
 
 
-    def validate_data(self, 
-                  rules_file: str, 
-                  output_file: str = "validation_results.csv", 
-                  excel_output_file: str = "validation_results.xlsx", 
-                  original_file: str = "../Temp_files/new_tran.csv",
-                  identifier:str = "fed_default") -> Dict[str, Any]:
-
-        try:
-            start_time = datetime.now()
-            
-            # Load validation rules
-            rules = self.load_validation_rules(rules_file)
+    def evaluate_rules(self,
+                       rules_file: str,
+                       progress_callback: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Runs the active rules of `rules_file` against the transactions table and groups the failures
+        by transaction, without exporting anything. Rules failing for most transactions are set
+        aside under "universal_failure_rules" instead of being reported per transaction.
+        """
+        # Load validation rules
+        rules = self.load_validation_rules(rules_file)
 
-            # Calculate total number of transactions dynamically
-            conn = self._connect_database()
+        # Calculate total number of transactions dynamically
+        with self._connect_database() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM transactions")
             total_transactions = cursor.fetchone()[0]
             cursor.close()
-            conn.close()
+        
+        cutoff = 0.49 * total_transactions
+        # Collect all failures
+        all_failures = []
+        
+        # Track rules with universal failures
+        universal_failure_rules = []
+        
+        # Detailed rule performance tracking
+        rule_performance = []
+        
+        # Execute each rule sequentially
+        for rule_index, (rule_id, rule_data) in enumerate(rules.items()):
+            # Report (rules completed, total rules, transactions) so background jobs can show progress
+            if progress_callback:
+                progress_callback(rule_index, len(rules), total_transactions)
+
+            query = rule_data.get('sql_query', '')
+            rule_name = rule_data.get('rule_name', rule_id)
+            rule_description = rule_data.get('description', 'No description')
             
-            cutoff = 0.49 * total_transactions
-            # Collect all failures
-            all_failures = []
+            if not query:
+                self.logger.warning(f"No SQL query for rule {rule_id}")
+                continue
             
-            # Track rules with universal failures
-            universal_failure_rules = []
+            # Execute individual rule
+            start_rule_time = datetime.now()
+            rule_failures = self.execute_validation_query(
+                query, 
+                rule_id, 
+                rule_name
+            )
+            end_rule_time = datetime.now()
             
-            # Detailed rule performance tracking
-            rule_performance = []
+            # Track rule performance
+            rule_performance.append({
+                "rule_id": rule_id,
+                "rule_name": rule_name,
+                "rule_description": rule_description,
+                "failures": len(rule_failures),
+                "failure_rate": round(len(rule_failures) / total_transactions * 100, 2),
+                "execution_time": (end_rule_time - start_rule_time).total_seconds()
+            })
             
-            # Execute each rule sequentially
-            for rule_id, rule_data in rules.items():
-                query = rule_data.get('sql_query', '')
-                rule_name = rule_data.get('rule_name', rule_id)
-                rule_description = rule_data.get('description', 'No description')
-                
-                if not query:
-                    self.logger.warning(f"No SQL query for rule {rule_id}")
-                    continue
-                
-                # Execute individual rule
-                start_rule_time = datetime.now()
-                rule_failures = self.execute_validation_query(
-                    query, 
-                    rule_id, 
-                    rule_name
-                )
-                end_rule_time = datetime.now()
-                
-                # Track rule performance
-                rule_performance.append({
+            # Check if the rule fails for all transactions
+            if len(rule_failures) >= cutoff:
+                universal_failure_rules.append({
                     "rule_id": rule_id,
                     "rule_name": rule_name,
                     "rule_description": rule_description,
-                    "failures": len(rule_failures),
-                    "failure_rate": round(len(rule_failures) / total_transactions * 100, 2),
-                    "execution_time": (end_rule_time - start_rule_time).total_seconds()
+                    "sql_query": query
                 })
-                
-                # Check if the rule fails for all transactions
-                if len(rule_failures) >= cutoff:
-                    universal_failure_rules.append({
-                        "rule_id": rule_id,
-                        "rule_name": rule_name,
-                        "rule_description": rule_description,
-                        "sql_query": query
-                    })
-                    continue
-                
-                all_failures.extend(rule_failures)
+                continue
             
+            all_failures.extend(rule_failures)
+        
+        if progress_callback:
+            progress_callback(len(rules), len(rules), total_transactions)
+
+        return {
+            "total_rules": len(rules),
+            "total_transactions": total_transactions,
             # Group failures by transaction
-            transaction_failures = self._group_failures(all_failures)
+            "transaction_failures": self._group_failures(all_failures),
+            "total_failures": len(all_failures),
+            "rule_performance": rule_performance,
+            "universal_failure_rules": universal_failure_rules
+        }
+
+    def validate_data(self, 
+                  rules_file: str, 
+                  output_file: str = "validation_results.csv", 
+                  excel_output_file: str = "validation_results.xlsx", 
+                  original_file: str = "../Temp_files/new_tran.csv",
+                  identifier:str = "fed_default",
+                  progress_callback: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
+
+        try:
+            start_time = datetime.now()
+            
+            evaluation = self.evaluate_rules(rules_file, progress_callback)
+            transaction_failures = evaluation["transaction_failures"]
+            total_transactions = evaluation["total_transactions"]
             
             # Export results
             self._export_to_csv(transaction_failures, output_file)
-            self._export_to_xlsx(transaction_failures, original_file, excel_output_file)
+            if REPORT_GENERATION == "eager":
+                self._export_to_xlsx(transaction_failures, original_file, excel_output_file)
+                discard_report(excel_output_file)
+            else:
+                # The highlighted workbook is built when first downloaded (see services.report_service)
+                defer_report(excel_output_file, "validation_report",
+                             {"transaction_failures": transaction_failures, "original_file": original_file},
+                             sources=[original_file])
             
             end_time = datetime.now()
             
             # Return validation summary with enhanced metadata
             return {
                 "timestamp": start_time.isoformat(),
-                "total_rules": len(rules),
+                "total_rules": evaluation["total_rules"],
                 "total_transactions": total_transactions,
                 "failed_transactions": len(transaction_failures),
-                "total_failures": len(all_failures),
+                "total_failures": evaluation["total_failures"],
                 "failure_rate": round(len(transaction_failures) / total_transactions * 100, 2),
                 "output_file": output_file,
                 "excel_output_file": excel_output_file,
                 "execution_time": (end_time - start_time).total_seconds(),
-                "rule_performance": rule_performance,
-                "universal_failure_rules": universal_failure_rules, 
+                "rule_performance": evaluation["rule_performance"],
+                "universal_failure_rules": evaluation["universal_failure_rules"], 
                 "identifier" : identifier
             }
         
@@ -268,26 +306,8 @@ class SQLiteValidator:
                         output_file: str):
 
         try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-
-            # Load original data
-            with open(original_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    ws.append(row)
-
-            # Apply color coding and add explanations
-            red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-            for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-                transaction_id = row[0].value
-                if transaction_id in transaction_failures:
-                    for cell in row:
-                        cell.fill = red_fill
-                    verbose_rules = " && ".join([f"Failed rule: {rule['rule_name']} ({rule['rule_id']})" for rule in transaction_failures[transaction_id]])
-                    row[-1].value = verbose_rules
-
-            wb.save(output_file)
+            # Streamed through a write-only workbook; failed transactions are filled red
+            write_failures_xlsx(transaction_failures, original_file, output_file)
             self.logger.info(f"Exported {len(transaction_failures)} transaction failures to {output_file}")
         
         except Exception as e:
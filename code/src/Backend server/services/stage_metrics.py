@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import psutil
+except ImportError:  # optional: resident memory is read from /proc where available
+    psutil = None
+
+# How often resident memory is sampled while a stage runs
+MEMORY_SAMPLE_INTERVAL = 0.02
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB, or None when the platform offers no cheap way to read it."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class StageRecorder:
+    """
+    Records wall time and resident memory (at start, peak and end) for each named stage of a long operation.
+
+    Memory is sampled from the process RSS by a background thread, which costs next to nothing
+    (tracemalloc slowed pandas-heavy stages down ~20x). RSS is process-wide, so figures include
+    whatever else the server is doing at the same time.
+    """
+
+    def __init__(self, track_memory: bool = True):
+        self.track_memory = track_memory and current_rss_mb() is not None
+        self.stages: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        record: Dict[str, Any] = {"stage": name}
+        sampler, stop = None, threading.Event()
+        if self.track_memory:
+            record["rss_start_mb"] = peak = current_rss_mb()
+            samples = [peak]
+
+            def sample():
+                while not stop.wait(MEMORY_SAMPLE_INTERVAL):
+                    samples.append(current_rss_mb())
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - start, 4)
+            if sampler is not None:
+                stop.set()
+                sampler.join()
+                end = current_rss_mb()
+                record["rss_peak_mb"] = round(max(max(samples), end), 1)
+                record["rss_end_mb"] = round(end, 1)
+                record["rss_start_mb"] = round(record["rss_start_mb"], 1)
+            self.stages.append(record)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        return list(self.stages)
+
+    def total_seconds(self) -> float:
+        return round(sum(stage["seconds"] for stage in self.stages), 4)
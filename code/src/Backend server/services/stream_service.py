@@ -0,0 +1,214 @@
+import io
+import csv
+import json
+import math
+import zlib
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from services.db_pool import get_connection
+
+# Optional accelerators: Arrow IPC and zstd are only offered when installed
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+BATCH_SIZE = 5000
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Picks 'arrow', 'ndjson' or 'json' from the request's Accept header."""
+    accept = (accept or "").lower()
+    if ARROW_STREAM in accept:
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow responses require pyarrow on the server")
+        return "arrow"
+    if NDJSON in accept or "application/jsonl" in accept:
+        return "ndjson"
+    return "json"
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Picks zstd (when available) or gzip from the Accept-Encoding header, honouring q=0."""
+    accepted = set()
+    for token in (accept_encoding or "").lower().split(","):
+        parts = [part.strip() for part in token.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(parts[0])
+
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def table_schema(db_path: str, table_name: str) -> List[Tuple[str, str]]:
+    with get_connection(db_path) as conn:
+        rows = conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Table {table_name} not found")
+    return [(row[1], row[2] or "") for row in rows]
+
+
+def iter_query_batches(db_path: str, query: str, params: Sequence = (), batch_size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    """Yields query results in bounded batches; the pooled connection is held only while streaming."""
+    with get_connection(db_path) as conn:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        cursor.close()
+
+
+def iter_csv_batches(file_path: str, batch_size: int = BATCH_SIZE) -> Tuple[List[str], Iterator[List[tuple]]]:
+    """Returns the CSV header and a generator over bounded batches of its rows."""
+    with open(file_path, "r", newline="", encoding="utf-8") as f:
+        columns = next(csv.reader(f), [])
+
+    def batches():
+        with open(file_path, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            batch = []
+            for row in reader:
+                batch.append(tuple(row))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    return columns, batches()
+
+
+def _json_chunks(columns: List[str], batches: Iterable[List[tuple]], key: str) -> Iterator[bytes]:
+    yield f'{{"{key}": ['.encode()
+    first = True
+    for rows in batches:
+        body = ",".join(json.dumps(dict(zip(columns, row)), default=str) for row in rows)
+        if not first:
+            body = "," + body
+        first = False
+        yield body.encode()
+    yield b"]}"
+
+
+def _ndjson_chunks(columns: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows).encode()
+
+
+def _arrow_type(declared_type: str):
+    declared_type = declared_type.upper()
+    if "INT" in declared_type:
+        return pa.int64()
+    if any(name in declared_type for name in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_array(values: list, arrow_type):
+    if arrow_type == pa.string():
+        return pa.array([None if value is None else str(value) for value in values], type=arrow_type)
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        # SQLite is dynamically typed; values that do not fit the declared column type go out as null
+        if pa.types.is_integer(arrow_type):
+            # Reals in an INTEGER column are truncated, as a cast with safe=False would; NaN, inf and
+            # reals beyond int64 do not fit, so no row can make the stream fail half way
+            return pa.array([int(value) if isinstance(value, float) and math.isfinite(value) and abs(value) < 2 ** 63
+                             else value if isinstance(value, int) else None for value in values], type=arrow_type)
+        return pa.array([value if isinstance(value, (int, float)) else None for value in values], type=arrow_type)
+
+
+def _arrow_chunks(columns: List[str], declared_types: List[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    arrow_types = [_arrow_type(declared_type) for declared_type in declared_types]
+    schema = pa.schema([pa.field(column, arrow_type) for column, arrow_type in zip(columns, arrow_types)])
+    sink = io.BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()
+    for rows in batches:
+        arrays = [_arrow_array([row[i] for row in rows], arrow_types[i]) for i in range(len(columns))]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+def _compress(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    if encoding is None:
+        yield from chunks
+        return
+
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_rows(columns: List[str],
+                declared_types: List[str],
+                batches: Iterable[List[tuple]],
+                media_format: str,
+                encoding: Optional[str] = None,
+                json_key: str = "rows") -> StreamingResponse:
+    """
+    Streams row batches as a JSON document, NDJSON or an Arrow IPC stream,
+    optionally gzip/zstd compressed, without materialising the result.
+    """
+    if media_format == "arrow":
+        chunks, media_type = _arrow_chunks(columns, declared_types, batches), ARROW_STREAM
+    elif media_format == "ndjson":
+        chunks, media_type = _ndjson_chunks(columns, batches), NDJSON
+    else:
+        chunks, media_type = _json_chunks(columns, batches, json_key), "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(_compress(chunks, encoding), media_type=media_type, headers=headers)
+
+
+def stream_table(db_path: str,
+                 table_name: str,
+                 media_format: str,
+                 encoding: Optional[str] = None,
+                 json_key: str = "transactions") -> StreamingResponse:
+    schema = table_schema(db_path, table_name)
+    columns = [column for column, _ in schema]
+    batches = iter_query_batches(db_path, f'SELECT * FROM "{table_name}"')
+    return stream_rows(columns, [declared for _, declared in schema], batches, media_format, encoding, json_key)
@@ -10,7 +10,8 @@ import speech_recognition as sr
 import numpy as np
 import audioop
 import pandas as pd
-import requests
+from utils.backend_client import request, run_job, BackendError
+from utils.cl_utils import send_progress_message
 
 @cl.set_chat_profiles
 async def chat_profile():
@@ -54,6 +55,7 @@ async def on_chat_start():
 async def on_message(message: cl.Message):
     user_chat_profile = cl.user_session.get("chat_profile")
     user_id = cl.user_session.get("user_id")
+    session_id = cl.user_session.get("id")
     content = message.content
     if message.command == "Rules":
         identifier = content
@@ -105,15 +107,12 @@ async def on_message(message: cl.Message):
                 dst.write(src.read())
             await cl.Message(content=f"PDF for rules '{res['output']}' uploaded successfully.").send()
             
-            # Call the new endpoint to generate rules
-            response = requests.post(
-                "http://localhost:5000/generate/rules",
-                json={"file_path": dest_path, "output_file": rules_path}
-            )
-            if response.status_code == 200:
+            # Generate the rules as a backend job; awaiting it keeps other sessions responsive
+            try:
+                await run_job("/jobs/generate/rules", json={"file_path": dest_path, "output_file": rules_path})
                 await cl.Message(content="Rules generated successfully.").send()
-            else:
-                await cl.Message(content=f"Failed to generate rules: {response.json().get('detail')}").send()
+            except BackendError as e:
+                await cl.Message(content=f"Failed to generate rules: {e}").send()
         else:
             await cl.Message(content="No PDF uploaded or invalid file type.").send()
             return
@@ -138,24 +137,27 @@ async def on_message(message: cl.Message):
             # Parse the CSV with pandas
             df = pd.read_csv(csv_file.path)
             
-            # Save the parsed CSV to the data folder
-            df.to_csv('../Temp_files/new_tran.csv', index=False)
-
-            delete_response = requests.delete("http://localhost:5000/dbdelete")
-            print(delete_response.text)
-
-            response_db = requests.post("http://localhost:5000/uploadTransactionCSV/0")
+            # Save the parsed CSV to this chat session's data folder
+            session_dir = f'../Temp_files/sessions/{session_id}'
+            os.makedirs(session_dir, exist_ok=True)
+            df.to_csv(f'{session_dir}/new_tran.csv', index=False)
+
+            # Merge the upload into the session's table; rows missing from the new file are removed
+            response_db = await request("POST", "/uploadTransactionCSV/0",
+                                        params={"session_id": session_id, "mode": "upsert", "delete_missing": True})
             print(response_db.text)
             await cl.Message(content="Sending the transactions in Anomaly Identifier Pipeline").send()
-            response = requests.get("http://localhost:5000/anamoly_detection_pipeline")
-            if response.status_code == 200:
-
+            try:
+                progress = await send_progress_message("Detecting anomalies")
+                results = await run_job("/jobs/anamoly_detection_pipeline", params={"session_id": session_id},
+                                        on_progress=progress)
                 anomaly_card = cl.CustomElement(
                     name="AnomalyDetectionResultsCard",
-                    props={"results": response.text}
+                    props={"results": json.dumps(results)}
                 )
                 await cl.Message(content="Anomaly Detection completed successfully.", elements=[anomaly_card]).send()
-            else:
+            except BackendError as e:
+                print(f"Anomaly detection job failed: {e}")
                 await cl.Message(content="Anomaly Detection failed").send()
             
         except Exception as e:
@@ -188,16 +190,17 @@ async def on_message(message: cl.Message):
             await cl.Message(
                 content=f"Starting data valiation using rule set: {identifier}",
             ).send()
-            response = requests.get(
-                f"http://localhost:5000/rules/validate/{identifier}",
-            )
-            if response.status_code == 200:
+            try:
+                progress = await send_progress_message(f"Validating transactions against {identifier}")
+                results = await run_job(f"/jobs/rules/validate/{identifier}", params={"session_id": session_id},
+                                        on_progress=progress)
                 validation_card = cl.CustomElement(
                     name="ValidationResultsCard",
-                    props={"results": response.text}
+                    props={"results": json.dumps(results)}
                 )
                 await cl.Message(content="Validation Completed", elements=[validation_card]).send()
-            else:
+            except BackendError as e:
+                print(f"Validation job failed: {e}")
                 await cl.Message(content="Validation failed").send()
 
     else:
@@ -4,6 +4,24 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
 
+// Reports are built on their first download: the server answers 202 until the file is ready
+const fetchReport = async (url, maxAttempts = 150) => {
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+        const response = await fetch(url, { method: 'GET' });
+        if (response.status === 409) {
+            // The data was replaced after the run; the old results are not offered as a report
+            const { detail } = await response.json();
+            throw new Error(detail);
+        }
+        if (response.status !== 202) {
+            return response;
+        }
+        const { retry_after: retryAfter = 2 } = await response.json();
+        await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+    }
+    throw new Error('The report is still being generated, please try again later');
+};
+
 const AnomalyDetectionResultsCard = () => {
     const parsedResults = typeof props.results === 'string' ? JSON.parse(props.results) : props.results;
     console.log(parsedResults)
@@ -11,9 +29,8 @@ const AnomalyDetectionResultsCard = () => {
 
     const handleDownload = async () => {
         try {
-            const response = await fetch(`http://localhost:5000/download/anamoly_result`, {
-                method: 'GET'
-            });
+            const sessionQuery = parsedResults.session_id ? `?session_id=${parsedResults.session_id}` : '';
+            const response = await fetchReport(`http://localhost:5000/download/anamoly_result${sessionQuery}`);
 
             if (!response.ok) {
                 throw new Error('Network response was not ok');
@@ -31,7 +48,7 @@ const AnomalyDetectionResultsCard = () => {
             window.URL.revokeObjectURL(url);
         } catch (error) {
             console.error('Download failed', error);
-            alert('Failed to download the file');
+            alert(`Failed to download the file: ${error.message}`);
         }
     };
 
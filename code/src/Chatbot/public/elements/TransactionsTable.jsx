@@ -26,6 +26,9 @@ import {
   Download
 } from "lucide-react";
 
+// Columns the search box matches (any of them), as the client-side search did before paging
+const SEARCH_COLUMNS = ["Transaction ID", "executerId", "date"];
+
 export default function TransactionsTable(props) {
 
   const [allTransactions, setAllTransactions] = useState([]);
@@ -36,21 +39,51 @@ export default function TransactionsTable(props) {
   const [filterExecuter, setFilterExecuter] = useState("all");
   const [showAudit, setShowAudit] = useState(false);
   const [auditId, setAuditId] = useState(null);
+  // Keyset pagination: pageCursors[i] is the server cursor that starts page i + 1
+  const [pageCursors, setPageCursors] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalEstimate, setTotalEstimate] = useState(0);
+
+  const cursor = pageCursors[currentPage - 1];
 
+  // One effect per (search, cursor): a response for an earlier search or page is dropped, never shown
   useEffect(() => {
+    let current = true;
     const fetchTransactions = async () => {
       try {
-        const response = await fetch("http://localhost:5000/dbgetTransaction");
+        const params = new URLSearchParams({ limit: itemsPerPage });
+        if (cursor) params.append("cursor", cursor);
+        if (searchTerm.trim() !== "") params.append("filter", `${SEARCH_COLUMNS.join("|")}~${searchTerm.trim()}`);
+        if (props.sessionId) params.append("session_id", props.sessionId);
+
+        const response = await fetch(`http://localhost:5000/dbgetTransaction?${params.toString()}`);
         const data = await response.json();
+        if (!current) return;
         setAllTransactions(data.transactions || []);
         setFilteredTransactions(data.transactions || []);
+        setNextCursor(data.next_cursor || null);
+        setTotalEstimate(data.total_estimate ?? (data.transactions || []).length);
       } catch (error) {
         console.error("Error fetching transactions:", error);
       }
     };
 
     fetchTransactions();
-  }, []);
+    return () => {
+      current = false;
+    };
+  }, [searchTerm, cursor, itemsPerPage, props.sessionId]);
+
+  // A new search or page size starts again from the first page
+  const resetPages = () => {
+    setPageCursors([null]);
+    setCurrentPage(1);
+  };
+
+  const handleSearchChange = (value) => {
+    setSearchTerm(value);
+    resetPages();
+  };
 
   const executerIds = [...new Set(allTransactions.map(tx => tx.executerId))];
   
@@ -70,53 +103,36 @@ export default function TransactionsTable(props) {
       result = result.filter(tx => tx.executerId === filterExecuter);
     }
     
-    // Apply search
-    if (searchTerm.trim() !== "") {
-      const term = searchTerm.toLowerCase();
-      result = result.filter(tx => 
-        tx.id.toLowerCase().includes(term) || 
-        tx.executerId.toLowerCase().includes(term) ||
-        tx.date.includes(term)
-      );
-    }
-    
-    // Update state and reset to first page when filters change
+    // The search itself is applied by the server; this filter applies to the page it returned
     setFilteredTransactions(result);
-    const maxPage = Math.max(1, Math.ceil(result.length / itemsPerPage));
-    if (currentPage > maxPage){
-      setCurrentPage(1);
-    }else{
-      setCurrentPage(currentPage);
-    }
-  }, [searchTerm, filterExecuter, allTransactions, itemsPerPage]);
+  }, [filterExecuter, allTransactions]);
   
-  // Manual page navigation
+  // Manual page navigation: forward needs the server's next cursor, backward reuses known cursors
   const goToPage = (pageNumber) => {
-    const maxPage = Math.max(1, Math.ceil(filteredTransactions.length / itemsPerPage));
-    const newPage = Math.min(Math.max(1, pageNumber), maxPage);
-    setCurrentPage(newPage);
+    if (pageNumber < 1) return;
+    if (pageNumber > currentPage) {
+      if (!nextCursor) return;
+      setPageCursors(prev => [...prev.slice(0, currentPage), nextCursor]);
+      setCurrentPage(currentPage + 1);
+      return;
+    }
+    setCurrentPage(pageNumber);
   };
   
   // Handle items per page change
   const handleItemsPerPageChange = (value) => {
-    const newItemsPerPage = Number(value);
-    setItemsPerPage(newItemsPerPage);
-    
-    // Adjust current page to keep items in view
-    const maxPage = Math.ceil(filteredTransactions.length / newItemsPerPage);
-    if (currentPage > maxPage) {
-      setCurrentPage(maxPage || 1);
-    }
+    setItemsPerPage(Number(value));
+    resetPages();
   };
   
   // Calculate pagination values
-  const totalItems = filteredTransactions.length;
-  const totalPages = Math.max(1, Math.ceil(totalItems / itemsPerPage));
+  const totalItems = Math.max(totalEstimate || 0, filteredTransactions.length);
+  const totalPages = Math.max(currentPage + (nextCursor ? 1 : 0), Math.ceil(totalItems / itemsPerPage), 1);
   const startIndex = (currentPage - 1) * itemsPerPage;
-  const endIndex = Math.min(startIndex + itemsPerPage, totalItems);
+  const endIndex = startIndex + filteredTransactions.length;
   
-  // Get current page data
-  const paginatedTransactions = filteredTransactions.slice(startIndex, endIndex);
+  // The server already returned exactly one page
+  const paginatedTransactions = filteredTransactions;
   
   const handleAudit = (id) => {
     setShowAudit(true);
@@ -167,7 +183,7 @@ export default function TransactionsTable(props) {
               placeholder="Search transactions..."
               className="pl-8"
               value={searchTerm}
-              onChange={(e) => setSearchTerm(e.target.value)}
+              onChange={(e) => handleSearchChange(e.target.value)}
             />
           </div>
           <div className="flex gap-2">
@@ -288,7 +304,7 @@ export default function TransactionsTable(props) {
               variant="outline"
               size="icon"
               onClick={() => goToPage(currentPage + 1)}
-              disabled={currentPage >= totalPages}
+              disabled={!nextCursor}
             >
               <ChevronRight className="h-4 w-4" />
             </Button>
@@ -0,0 +1,152 @@
+import os
+import json
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+import httpx
+from httpx_sse import aconnect_sse, SSEError
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:5000")
+
+# One pooled client is shared by every chat session in this process
+TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE", "PUT"}
+
+POLL_INTERVAL = 2.0
+FINISHED_STATUSES = {"succeeded", "failed", "cancelled", "interrupted"}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class BackendError(Exception):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(base_url=BACKEND_URL, timeout=TIMEOUT, limits=LIMITS)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def request(method: str, path: str, retries: int = MAX_RETRIES, **kwargs) -> httpx.Response:
+    """
+    Sends a request through the shared client without blocking the event loop.
+
+    Connection failures are retried for every method (nothing reached the server);
+    read timeouts and 502/503/504 responses are only retried for idempotent methods.
+    Raises BackendError once the retries are exhausted.
+    """
+    method = method.upper()
+    for attempt in range(retries + 1):
+        try:
+            response = await get_client().request(method, path, **kwargs)
+            if response.status_code not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS or attempt == retries:
+                return response
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            if attempt == retries:
+                raise BackendError(f"Backend unreachable: {e}") from e
+        except httpx.TimeoutException as e:
+            if method not in IDEMPOTENT_METHODS or attempt == retries:
+                raise BackendError(f"Backend request timed out: {e}") from e
+        await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+
+async def _notify(on_progress, job: Dict[str, Any]):
+    outcome = on_progress(job)
+    if inspect.isawaitable(outcome):
+        await outcome
+
+
+async def _follow_job_events(job: Dict[str, Any], on_progress, deadline: Optional[float]) -> Dict[str, Any]:
+    """
+    Follows /jobs/{id}/events (server-sent events) and forwards each update to on_progress.
+    Returns the latest job state; if the stream drops, the caller falls back to polling.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        async with aconnect_sse(get_client(), "GET", f"/jobs/{job['job_id']}/events") as event_source:
+            async for event in event_source.aiter_sse():
+                job = json.loads(event.data)
+                await _notify(on_progress, job)
+                if event.event == "done" or (deadline and loop.time() > deadline):
+                    break
+    except (httpx.HTTPError, SSEError, ValueError) as e:
+        print(f"Progress stream for job {job['job_id']} unavailable, polling instead: {e}")
+    return job
+
+
+def format_job_progress(job: dict) -> str:
+    """
+    Renders a backend job snapshot (as sent by /jobs/{id}/events) as one status line,
+    e.g. "validate · 42% · 120/286 rules · 5300 rows/sec · ETA 0:12".
+    """
+    details = job.get("details") or {}
+    parts = [job.get("stage") or job.get("status", "queued"), f"{int((job.get('progress') or 0) * 100)}%"]
+    if details.get("total_rules"):
+        parts.append(f"{details.get('rules_completed', 0)}/{details['total_rules']} rules")
+    if job.get("rows_per_sec"):
+        parts.append(f"{job['rows_per_sec']:,.0f} rows/sec")
+    if job.get("eta_seconds") is not None:
+        minutes, seconds = divmod(int(job["eta_seconds"]), 60)
+        parts.append(f"ETA {minutes}:{seconds:02d}")
+    return " · ".join(parts)
+
+
+def _error_detail(response: httpx.Response) -> str:
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
+
+
+async def run_job(path: str,
+                  params: Optional[Dict[str, Any]] = None,
+                  json: Optional[Dict[str, Any]] = None,
+                  on_progress: Optional[Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]] = None,
+                  poll_interval: float = POLL_INTERVAL,
+                  timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Submits a backend job (e.g. "/jobs/anamoly_detection_pipeline") and awaits its result,
+    sleeping between status polls so other chat sessions keep being served.
+    """
+    response = await request("POST", path, params=params, json=json)
+    if response.status_code != 200:
+        raise BackendError(_error_detail(response), response.status_code)
+    job = response.json()
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    if on_progress:
+        job = await _follow_job_events(job, on_progress, deadline)
+    while job["status"] not in FINISHED_STATUSES:
+        if deadline and loop.time() > deadline:
+            await request("DELETE", f"/jobs/{job['job_id']}")
+            raise BackendError(f"Job {job['job_id']} timed out")
+        await asyncio.sleep(poll_interval)
+        response = await request("GET", f"/jobs/{job['job_id']}")
+        if response.status_code != 200:
+            raise BackendError(_error_detail(response), response.status_code)
+        job = response.json()
+        if on_progress:
+            await _notify(on_progress, job)
+
+    if job["status"] != "succeeded":
+        raise BackendError(job.get("error") or f"Job {job['status']}")
+    response = await request("GET", f"/jobs/{job['job_id']}/result")
+    if response.status_code != 200:
+        raise BackendError(_error_detail(response), response.status_code)
+    return response.json()
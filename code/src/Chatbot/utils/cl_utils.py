@@ -1,6 +1,7 @@
 import asyncio
 from typing import List, Optional
 import chainlit as cl
+from .backend_client import format_job_progress
 
 async def send_message(content:str, actions:Optional[List[cl.Action]] = None):
     if actions:
@@ -41,3 +42,24 @@ async def send_animated_message(
     except asyncio.CancelledError:
         msg.content = base_msg
         await msg.update()
+
+
+PROGRESS_FRAMES = ["⏳", "⌛"]
+
+
+async def send_progress_message(base_msg: str, frames: List[str] = PROGRESS_FRAMES):
+    """
+    Sends a message and returns an async callback that rewrites it with each job update,
+    cycling through `frames` like send_animated_message. Pass it as run_job's on_progress.
+    """
+    msg = cl.Message(content=base_msg)
+    await msg.send()
+    updates = 0
+
+    async def update(job: dict):
+        nonlocal updates
+        msg.content = f"{frames[updates % len(frames)]} {base_msg}\n{format_job_progress(job)}"
+        updates += 1
+        await msg.update()
+
+    return update
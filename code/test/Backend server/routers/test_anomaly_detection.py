@@ -51,3 +51,21 @@ def test_anamoly_detection_pipeline(mock_analyze_anomalies, mock_detect_anomalie
         [{"id": 1, "value": "anomaly"}], "../Temp_files/new_tran.csv")
     assert response.status_code == 200
     assert response.json() == {"analysis": "detailed analysis"}
+
+
+def test_anamoly_detection_and_analysis_uses_the_registry_model():
+    from fastapi import FastAPI
+    from Backend_server.routers import anamoly_detection
+    app = FastAPI()
+    app.include_router(router)
+    model = {"model_id": "m1", "path": "models/registry/m1.pkl"}
+    with patch.object(anamoly_detection, "resolve_model", return_value=model) as resolve, \
+            patch.object(anamoly_detection, "detect_anomalies", return_value={"anomaly_ids": ["TXN1"]}) as detect, \
+            patch.object(anamoly_detection, "analyze_anomalies", return_value={"status": "success"}) as analyze:
+        response = TestClient(app).get("/anamoly_detection_and_analysis", params={"model_id": "m1"})
+
+    assert response.status_code == 200
+    resolve.assert_called_once_with("m1", "default")
+    assert detect.call_args.kwargs["model_path"] == "models/registry/m1.pkl"
+    assert analyze.call_args.args[0] == ["TXN1"]
+    assert analyze.call_args.kwargs["model_path"] == "models/registry/m1.pkl"
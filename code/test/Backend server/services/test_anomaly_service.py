@@ -1,6 +1,12 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
-from Backend_server.services.anamoly_service import train_model, detect_anomalies, analyze_anomalies
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from Backend_server.services.anamoly_service import (train_model, detect_anomalies, analyze_anomalies, encode_categoricals,
+                                                      build_column_profiles, explain_anomalies, stream_training_sample)
 
 
 class TestAnomalyService(unittest.TestCase):
@@ -34,6 +40,100 @@ class TestAnomalyService(unittest.TestCase):
         result = analyze_anomalies(["1"], "dummy_path.csv")
         self.assertIn("Reason for anomaly", result)
 
+    def test_encode_categoricals_matches_label_encoder(self):
+        le = LabelEncoder().fit(["DE", "UK", "US"])
+        df = pd.DataFrame({"Country": ["US", "FR", "DE", "UK"], "Exchange": ["NYSE", "LSE", "NYSE", "TSE"],
+                           "Amount": [1.0, 2.0, 3.0, 4.0]})
+        encoded = encode_categoricals(df, {"Country": le})
+        self.assertEqual(encoded["Country"].tolist(), [le.transform(["US"])[0], -1, 0, 1])
+        self.assertEqual(encoded["Exchange"].tolist(), [-1, -1, -1, -1])
+        self.assertEqual(encoded["Amount"].tolist(), [1.0, 2.0, 3.0, 4.0])
+
+    def test_build_column_profiles(self):
+        df = pd.DataFrame({"Country": ["US"] * 98 + ["UK", "XX"], "ID": [f"C{i}" for i in range(100)],
+                           "Amount": [float(i) for i in range(100)]})
+        profiles = build_column_profiles(df, {"Country", "ID"})
+        self.assertEqual(profiles["Country"]["top_categories"]["US"], 0.98)
+        self.assertFalse(profiles["Country"]["id_like"])
+        self.assertTrue(profiles["ID"]["id_like"])
+        self.assertEqual(profiles["Amount"]["type"], "numeric")
+        self.assertAlmostEqual(profiles["Amount"]["mean"], 49.5)
+        self.assertAlmostEqual(profiles["Amount"]["quantiles"]["0.5"], 49.5)
+
+    def test_explain_anomalies(self):
+        training = pd.DataFrame({"Country": ["US"] * 99 + ["UK"], "ID": [f"C{i}" for i in range(100)],
+                                 "Amount": [float(i % 10) for i in range(100)]})
+        profiles = build_column_profiles(training, {"Country", "ID"})
+        anomalous = pd.DataFrame({"Country": ["FR", "US"], "ID": ["C900", "C901"], "Amount": [4.0, 500.0]},
+                                 index=pd.Index(["TXN1", "TXN2"], name="Transaction ID"))
+        report, details = explain_anomalies(anomalous, profiles)
+        self.assertEqual(list(details["TXN1"]), ["Country"])
+        self.assertEqual(details["TXN1"]["Country"], "Unusual category: FR")
+        self.assertEqual(list(details["TXN2"]), ["Amount"])
+        self.assertTrue(details["TXN2"]["Amount"].startswith("Outlier value: 500.0"))
+        self.assertTrue(report[0].startswith("🔹 *Transaction ID: TXN1*"))
+        self.assertIn("*Amount*: 500.0 is far from the usual range", report[1])
+
+    @patch("Backend_server.services.anamoly_service.gemini_model.generate_content")
+    def test_template_mode_never_calls_gemini(self, mock_generate_content):
+        with tempfile.TemporaryDirectory() as tmp:
+            rng = np.random.default_rng(0)
+            data_path, model_path = os.path.join(tmp, "new_tran.csv"), os.path.join(tmp, "model.pkl")
+            pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(200)],
+                          "Country": rng.choice(["US", "UK"], 200),
+                          "Amount": np.r_[rng.normal(1000, 10, 199), 5000.0]}).to_csv(data_path, index=False)
+            train_model(data_path, model_path=model_path)
+            result = analyze_anomalies(["TXN199"], data_path, model_path=model_path,
+                                       output_csv=os.path.join(tmp, "out.csv"), output_xlsx=os.path.join(tmp, "out.xlsx"),
+                                       explanation_mode="template")
+            self.assertEqual(result["explanation_mode"], "template")
+            self.assertIn("Amount of 5000.0", result["raw_analysis"])
+            mock_generate_content.assert_not_called()
+            reasons = pd.read_csv(os.path.join(tmp, "out.csv"), index_col="Transaction ID")["Reason"]
+            self.assertTrue(reasons["TXN199"].startswith("Flagged by the anomaly model"))
+
+    def write_large_file(self, tmp, rows=5000):
+        rng = np.random.default_rng(1)
+        path = os.path.join(tmp, "large.csv")
+        country = rng.choice(["US", "UK", "DE"], rows).astype(object)
+        country[7] = None
+        pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(rows)], "Country": country,
+                      "Amount": rng.normal(1000, 100, rows)}).to_csv(path, index=False)
+        return path
+
+    def test_stream_training_sample(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write_large_file(tmp)
+            full = pd.read_csv(path, index_col="Transaction ID")
+            sample, stats = stream_training_sample(path, sample_size=500, chunk_size=700, random_state=0)
+
+            self.assertEqual(len(sample), 500)
+            self.assertTrue(sample.index.is_unique)
+            self.assertTrue(set(sample.index) <= set(full.index))
+            # Rows come from the whole file, not just the first chunk
+            self.assertGreater(max(int(txn[3:]) for txn in sample.index), 4000)
+            self.assertEqual(sample.loc[sample.index[0], "Amount"], full.loc[sample.index[0], "Amount"])
+
+            self.assertEqual(stats["rows"], 5000)
+            self.assertEqual(stats["categorical_columns"], ["Country"])
+            self.assertAlmostEqual(stats["moments"]["Amount"]["mean"], full["Amount"].mean())
+            self.assertAlmostEqual(stats["moments"]["Amount"]["m2"] / 4999, full["Amount"].var(), places=6)
+            self.assertEqual(stats["category_counts"]["Country"]["Unknown"], 1)
+
+    def test_train_model_on_sample(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self.write_large_file(tmp)
+            model_path = os.path.join(tmp, "model.pkl")
+            details = train_model(path, model_path=model_path, sample_size=1000, n_jobs=2)["model_details"]
+
+            self.assertEqual(details["training_rows"], 1000)
+            self.assertEqual(details["total_transactions"], 5000)
+            self.assertEqual([stage["stage"] for stage in details["stages"]],
+                             ["stream_sample", "plan", "profile", "encode", "scale", "fit", "save"])
+            self.assertTrue(all(stage["seconds"] >= 0 for stage in details["stages"]))
+            detected = detect_anomalies(path, model_path=model_path, output_file=os.path.join(tmp, "out.xlsx"))
+            self.assertEqual(detected["total_transactions"], 5000)
+
 
 if __name__ == "__main__":
     unittest.main()
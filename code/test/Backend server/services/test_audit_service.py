@@ -0,0 +1,103 @@
+import os
+import json
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from openpyxl import load_workbook
+from Backend_server.services import audit_service
+from Backend_server.services.audit_service import merge_audit, run_audit
+from Backend_server.services.report_export import write_audit_xlsx
+from Backend_server.services.report_service import build_report
+
+
+class TestAuditService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        folder = self.tmp.name
+        self.paths = {"session_id": "t1", "new_transactions": f"{folder}/new_tran.csv",
+                      "transaction_db": f"{folder}/transaction.db", "audit_db": f"{folder}/audit_transactions.db",
+                      "audit_csv": f"{folder}/audit_result.csv", "audit_xlsx": f"{folder}/audit_result.xlsx"}
+        # Few enough failures that the rule is not set aside as failing (almost) everywhere
+        pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(1, 9)],
+                      "Amount": [10.0, -5.0, 9000.0, -7000.0, 20.0, 30.0, 40.0, 50.0]}).to_csv(
+            self.paths["new_transactions"], index=False)
+        with open(f"{folder}/fed_default.json", "w", encoding="utf-8") as f:
+            json.dump({"R1": {"rule_name": "Positive amount", "status": "active",
+                              "sql_query": 'SELECT "Transaction ID" FROM transactions WHERE Amount < 0'}}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_merge_and_report_colours(self):
+        data = pd.read_csv(self.paths["new_transactions"], index_col="Transaction ID")
+        failures = {"TXN2": [{"rule_id": "R1", "rule_name": "Positive amount"}],
+                    "TXN4": [{"rule_id": "R1", "rule_name": "Positive amount"},
+                             {"rule_id": "R2", "rule_name": "Small amount"}]}
+        audit = merge_audit(data, ["TXN3", "TXN4"], {"TXN3": "Outlier", "TXN4": "Outlier"}, failures)
+        self.assertEqual(list(audit["Anomaly"][:4]), [False, False, True, True])
+        self.assertEqual(list(audit["Anomaly Reason"][:4]), ["", "", "Outlier", "Outlier"])
+        self.assertEqual(audit.loc["TXN4", "Failed Rules"], "Positive amount (R1) && Small amount (R2)")
+        self.assertNotIn("Anomaly", data.columns)
+
+        output = os.path.join(self.tmp.name, "audit.xlsx")
+        write_audit_xlsx(audit, ["TXN3", "TXN4"], list(failures), output)
+        ws = load_workbook(output).active
+        self.assertEqual([ws[f"B{row}"].fill.fgColor.rgb if ws[f"B{row}"].fill.fill_type else None
+                          for row in range(2, 6)], [None, "00FF0000", "00FFFF00", "00FFA500"])
+
+    def test_audit_leaves_the_transactions_table_alone(self):
+        conn = sqlite3.connect(self.paths["transaction_db"])
+        conn.execute('CREATE TABLE transactions ("Transaction ID" TEXT, Amount REAL)')
+        conn.execute("INSERT INTO transactions VALUES ('UPSERTED', -1.0)")
+        conn.commit()
+        conn.close()
+
+        def detection(paths, context, **kwargs):
+            context.anomaly_ids, context.explanations = [], {}
+            return {"model_selection": {"action": "reused"}, "explanation_mode": "template"}
+
+        with patch.object(audit_service, "RULES_DIR", self.tmp.name), \
+                patch.object(audit_service, "run_detection_pipeline", side_effect=detection):
+            result = run_audit(self.paths, "fed_default")
+        # Only the audited rows are validated; the session's table keeps its upserts and edits
+        self.assertEqual([txn["transaction_id"] for txn in result["transactions"]], ["TXN2", "TXN4"])
+        conn = sqlite3.connect(self.paths["transaction_db"])
+        self.assertEqual(conn.execute("SELECT * FROM transactions").fetchall(), [("UPSERTED", -1.0)])
+        conn.close()
+        self.assertFalse(os.path.exists(self.paths["audit_db"]))
+
+    def test_audit_loads_the_data_once(self):
+        def detection(paths, context, **kwargs):
+            data = context.load_data()
+            context.anomaly_ids = list(data.index[data["Amount"].abs() > 1000])
+            context.explanations = {txn_id: "Outlier" for txn_id in context.anomaly_ids}
+            return {"model_selection": {"action": "reused"}, "explanation_mode": "template"}
+
+        with patch.object(audit_service, "RULES_DIR", self.tmp.name), \
+                patch.object(audit_service, "run_detection_pipeline", side_effect=detection), \
+                patch("pandas.read_csv", wraps=pd.read_csv) as read_csv:
+            result = run_audit(self.paths, "fed_default")
+        read_csv.assert_called_once()
+
+        self.assertEqual((result["anomalous_transactions"], result["failed_transactions"],
+                          result["anomalous_and_failed"], result["flagged_transactions"]), (2, 2, 1, 3))
+        self.assertEqual([txn["transaction_id"] for txn in result["transactions"]], ["TXN2", "TXN3", "TXN4"])
+        self.assertEqual(result["transactions"][2]["failed_rules"], "Positive amount (R1)")
+        audit = pd.read_csv(self.paths["audit_csv"], index_col="Transaction ID")
+        self.assertEqual(list(audit.index[audit["Anomaly"]]), ["TXN3", "TXN4"])
+
+        manifest = json.load(open(f"{self.paths['audit_xlsx']}.manifest.json"))
+        built = build_report({"output_file": self.paths["audit_xlsx"], "digest": manifest["digest"]}, MagicMock())
+        ws = load_workbook(built["output_file"]).active
+        self.assertEqual(ws["B5"].fill.fgColor.rgb, "00FFA500")
+
+        with self.assertRaises(Exception) as raised:
+            run_audit(self.paths, "missing")
+        self.assertEqual(raised.exception.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
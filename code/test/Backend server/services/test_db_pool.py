@@ -0,0 +1,65 @@
+import os
+import tempfile
+import threading
+import unittest
+from Backend_server.services.db_pool import SQLiteConnectionPool, get_pool, close_pool
+
+
+class TestSQLiteConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pool.db")
+
+    def tearDown(self):
+        close_pool(self.db_path)
+        self.tmp.cleanup()
+
+    def test_connections_are_reused_and_tuned(self):
+        pool = SQLiteConnectionPool(self.db_path)
+        with pool.connection() as conn:
+            first = conn
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        with pool.connection() as conn:
+            second = conn
+        self.assertIs(first, second)
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(pool.stats()["checkouts"], 2)
+        self.assertEqual(pool.stats()["open_connections"], 1)
+        pool.close()
+
+    def test_uncommitted_work_is_rolled_back_on_release(self):
+        pool = SQLiteConnectionPool(self.db_path)
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.commit()
+            conn.execute("INSERT INTO t VALUES (1)")
+        with pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone()[0], 0)
+        pool.close()
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = SQLiteConnectionPool(self.db_path, max_connections=1, checkout_timeout=0.05)
+        with pool.connection():
+            errors = []
+
+            def worker():
+                try:
+                    with pool.connection():
+                        pass
+                except TimeoutError as e:
+                    errors.append(e)
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        pool.close()
+
+    def test_get_pool_is_shared_per_file(self):
+        self.assertIs(get_pool(self.db_path), get_pool(self.db_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,54 +1,135 @@
+import os
+import sqlite3
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 from Backend_server.services.db_services import (
-    initialize_db, get_rules, add_rules, edit_rules, delete_rules, get_transactions
+    initialize_db, get_rules, add_rules, edit_rules, delete_rules, get_transactions,
+    upsert_transactions_from_csv, get_transactions_page
 )
 
 
 class TestDBServices(unittest.TestCase):
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_initialize_db(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_initialize_db(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         mock_cursor = mock_conn.cursor.return_value
         initialize_db()
         mock_cursor.execute.assert_called_once()
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_get_rules(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_get_rules(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         mock_cursor = mock_conn.cursor.return_value
         mock_cursor.fetchall.return_value = [
             ("Rule 1", "Description 1", "Active")]
         result = get_rules()
         self.assertEqual(result, [("Rule 1", "Description 1", "Active")])
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_add_rules(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_add_rules(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         result = add_rules("Rule 1", "Description 1", "Active")
         self.assertIn("New rule added successfully", result)
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_edit_rules(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_edit_rules(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         result = edit_rules(1, "name", "Updated Rule")
         self.assertIn("updated successfully", result)
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_delete_rules(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_delete_rules(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         result = delete_rules(1)
         self.assertIn("deleted successfully", result)
 
-    @patch("Backend_server.services.db_services.sqlite3.connect")
-    def test_get_transactions(self, mock_connect):
-        mock_conn = mock_connect.return_value
+    @patch("Backend_server.services.db_services.get_connection")
+    def test_get_transactions(self, mock_get_connection):
+        mock_conn = mock_get_connection.return_value.__enter__.return_value
         mock_cursor = mock_conn.cursor.return_value
         mock_cursor.fetchall.return_value = [("Transaction 1", 100)]
         result = get_transactions()
         self.assertEqual(result, [("Transaction 1", 100)])
 
+    def test_upsert_transactions_from_csv(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "transaction.db")
+            csv_path = os.path.join(tmp, "new_tran.csv")
+            with open(csv_path, "w") as f:
+                f.write("Transaction ID,Amount\nT1,10\nT2,20\n")
+            result = upsert_transactions_from_csv(0, db_path=db_path, new_transactions_file=csv_path)
+            self.assertEqual(result["inserted"], 2)
+
+            with open(csv_path, "w") as f:
+                f.write("Transaction ID,Amount\nT2,25\nT3,30\n")
+            result = upsert_transactions_from_csv(0, db_path=db_path, new_transactions_file=csv_path,
+                                                  delete_missing=True)
+            self.assertEqual((result["inserted"], result["updated"], result["unchanged"], result["deleted"]),
+                             (1, 1, 0, 1))
+
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute('SELECT "Transaction ID", Amount FROM transactions ORDER BY 1').fetchall()
+            conn.close()
+            self.assertEqual(rows, [("T2", 25), ("T3", 30)])
+
+    def test_upsert_skips_rows_without_an_id(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "transaction.db")
+            csv_path = os.path.join(tmp, "new_tran.csv")
+            with open(csv_path, "w") as f:
+                f.write("Transaction ID,Amount\nT1,10\nT2,20\n,5\n")
+            result = upsert_transactions_from_csv(0, db_path=db_path, new_transactions_file=csv_path)
+            self.assertEqual((result["inserted"], result["skipped"]), (2, 1))
+
+            # A blank ID in the delta must not stop the rows missing from it being deleted
+            with open(csv_path, "w") as f:
+                f.write("Transaction ID,Amount\nT2,20\n,7\n  ,8\n")
+            result = upsert_transactions_from_csv(0, db_path=db_path, new_transactions_file=csv_path,
+                                                  delete_missing=True)
+            self.assertEqual((result["unchanged"], result["deleted"], result["skipped"]), (1, 1, 2))
+
+            conn = sqlite3.connect(db_path)
+            rows = conn.execute('SELECT "Transaction ID", Amount FROM transactions').fetchall()
+            conn.close()
+            self.assertEqual(rows, [("T2", 20)])
+
+    def test_get_transactions_page(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "transaction.db")
+            conn = sqlite3.connect(db_path)
+            conn.execute('CREATE TABLE transactions ("Transaction ID" TEXT, Country TEXT, Amount REAL)')
+            conn.executemany("INSERT INTO transactions VALUES (?, ?, ?)",
+                             [(f"T{i:02d}", "US" if i % 2 else "CA", i * 10.0) for i in range(25)])
+            conn.commit()
+            conn.close()
+
+            seen, cursor = [], None
+            while True:
+                page = get_transactions_page(db_path=db_path, limit=10, cursor=cursor, columns=["Amount"])
+                seen.extend(row["Transaction ID"] for row in page["transactions"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    break
+            self.assertEqual(seen, [f"T{i:02d}" for i in range(25)])
+            self.assertEqual(page["columns"], ["Transaction ID", "Amount"])
+            self.assertEqual(page["total_estimate"], 25)
+
+            page = get_transactions_page(db_path=db_path, limit=3, filters=["Country=US"],
+                                         sort_by="Amount", sort_dir="desc")
+            self.assertEqual([row["Amount"] for row in page["transactions"]], [230.0, 210.0, 190.0])
+            self.assertEqual(page["total_estimate"], 12)
+
+            # A search over several columns matches any of them; columns the table lacks are skipped
+            page = get_transactions_page(db_path=db_path, limit=30, filters=["Transaction ID|Country|date~C"])
+            self.assertEqual(page["total_estimate"], 13)
+            with self.assertRaises(ValueError):
+                get_transactions_page(db_path=db_path, filters=["date|executerId~C"])
+
+            with self.assertRaises(ValueError):
+                get_transactions_page(db_path=db_path, columns=["Missing"])
+
 
 if __name__ == "__main__":
     unittest.main()
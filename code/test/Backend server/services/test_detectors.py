@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from Backend_server.services.anamoly_service import train_model, detect_anomalies
+from Backend_server.services.detectors import (HBOSDetector, RobustZDetector, ThresholdDetector, resolve_model_params,
+                                               make_detector, DEFAULT_MODEL_PARAMS)
+from Backend_server.services.model_cache import clear_cache
+from Backend_server.services.scoring_service import score_records
+
+
+def make_data(rows=20000, seed=1):
+    # The first 20 rows are each far out in one column
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, 5))
+    X[np.arange(20), np.arange(20) % 5] += 10.0
+    return X
+
+
+class TestDetectors(unittest.TestCase):
+
+    def tearDown(self):
+        clear_cache()
+
+    def test_detectors_flag_injected_outliers(self):
+        X = make_data()
+        for detector in (HBOSDetector(contamination=0.01), RobustZDetector(contamination=0.01)):
+            predictions = detector.fit(X).predict(X)
+            flagged = set(np.flatnonzero(predictions == -1))
+            self.assertTrue(set(range(20)) <= flagged, type(detector).__name__)
+            self.assertAlmostEqual(len(flagged), 200, delta=1)
+            # Same sign convention as IsolationForest: negative decisions are anomalies
+            np.testing.assert_array_equal(detector.decision_function(X) < 0, predictions == -1)
+
+    def test_hbos_out_of_range_values(self):
+        X = make_data()
+        detector = HBOSDetector().fit(X)
+        unseen = np.array([[0.0, 0.0, 100.0, 0.0, 0.0], [0.0, 0.0, np.nan, 0.0, 0.0]])
+        self.assertTrue((detector.predict(unseen) == -1).all())
+        self.assertEqual(detector.score_samples(X.max(axis=0, keepdims=True)).shape, (1,))
+
+    def test_incomplete_detector_cannot_be_instantiated(self):
+        class FitOnly(ThresholdDetector):
+            def _fit(self, X):
+                return X.sum(axis=1)
+
+        with self.assertRaises(TypeError):
+            FitOnly()
+
+    def test_params(self):
+        self.assertEqual(resolve_model_params(None), DEFAULT_MODEL_PARAMS)
+        self.assertEqual(resolve_model_params({"detector": "isolation_forest"}), DEFAULT_MODEL_PARAMS)
+        self.assertEqual(resolve_model_params({"detector": "hbos", "n_bins": 10}),
+                         {"contamination": 0.02, "n_bins": 10, "detector": "hbos"})
+        for params in ({"detector": "hbos", "n_estimators": 10}, {"detector": "lof"}):
+            with self.assertRaises(ValueError):
+                resolve_model_params(params)
+        with self.assertRaises(ValueError):
+            make_detector(resolve_model_params({"detector": "robust_z", "contamination": 0.9}))
+
+    def test_train_and_score_with_hbos(self):
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(500)],
+                           "Country": rng.choice(["US", "UK", "DE"], 500),
+                           "Amount": np.r_[rng.normal(1000, 50, 495), [9000.0, 8000.0, 7000.0, -5000.0, 6000.0]]})
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path, model_path = os.path.join(tmp, "transactions.csv"), os.path.join(tmp, "model.pkl")
+            df.to_csv(data_path, index=False)
+            details = train_model(data_path, model_path=model_path, params={"detector": "hbos"})["model_details"]
+            self.assertEqual(details["detector"], "hbos")
+
+            result = detect_anomalies(data_path, model_path=model_path, output_file=os.path.join(tmp, "out.xlsx"))
+            self.assertEqual(result["model_details"]["model_type"], "HBOS")
+            self.assertTrue({"TXN495", "TXN496", "TXN497", "TXN498", "TXN499"} <= set(result["anomaly_ids"]))
+            scores = score_records(df.to_dict("records"), model_path)
+            self.assertEqual({r["transaction_id"] for r in scores if r["is_anomaly"]}, set(result["anomaly_ids"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import re
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from Backend_server.services import explanation_service
+from Backend_server.services.db_pool import close_pool
+from Backend_server.services.explanation_service import (explain_with_llm, parse_explanations, RateLimiter,
+                                                          template_explanation)
+
+
+class FakeGemini:
+    model_name = "fake-model"
+
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        ids = re.findall(r"Transaction ID: (\S+?)\*", prompt)
+        with self._lock:
+            self.prompts.append(ids)
+        if self.fail_for & set(ids):
+            raise RuntimeError("500 Internal error")
+        return MagicMock(text="```json\n{" + ", ".join(f'"{i}": "Reason for {i}"' for i in ids) + "}\n```")
+
+
+def make_inputs(count):
+    ids = [f"TXN{i}" for i in range(count)]
+    lines = [f"🔹 *Transaction ID: {txn_id}*\n" for txn_id in ids]
+    data = {txn_id: {"Amount": f"Outlier value: {i}"} for i, txn_id in enumerate(ids)}
+    return ids, lines, data
+
+
+class TestExplanationService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "explanations.db")
+        self.patchers = [
+            patch.object(explanation_service, "EXPLANATION_CACHE_DB", self.db_path),
+            patch.object(explanation_service, "EXPLANATION_BATCH_SIZE", 2),
+            patch.object(explanation_service, "RETRY_DELAY", 0),
+            patch.object(explanation_service, "_rate_limiter", RateLimiter(0)),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        close_pool(self.db_path)
+        self.tmp.cleanup()
+
+    def test_transactions_are_explained_in_batches(self):
+        model = FakeGemini()
+        progress = []
+        result = explain_with_llm(*make_inputs(5), model, progress_callback=lambda *args: progress.append(args))
+        self.assertEqual(len(result["explanations"]), 5)
+        self.assertEqual(result["explanations"]["TXN3"], "Reason for TXN3")
+        self.assertEqual(sorted(len(ids) for ids in model.prompts), [1, 2, 2])
+        self.assertEqual(progress[-1], (3, 3, 5))
+
+    def test_rerun_is_served_from_cache(self):
+        explain_with_llm(*make_inputs(4), FakeGemini())
+        model = FakeGemini()
+        result = explain_with_llm(*make_inputs(5), model)
+        self.assertEqual(result["cached"], 4)
+        self.assertEqual(model.prompts, [["TXN4"]])
+
+    def test_failed_batch_does_not_fail_the_run(self):
+        model = FakeGemini(fail_for={"TXN0"})
+        result = explain_with_llm(*make_inputs(4), model)
+        self.assertEqual(result["failed_transactions"], ["TXN0", "TXN1"])
+        self.assertEqual(result["failed_batches"], 1)
+        self.assertEqual(set(result["explanations"]), {"TXN2", "TXN3"})
+        # The failing batch was retried before being given up on
+        self.assertEqual(sum(ids == ["TXN0", "TXN1"] for ids in model.prompts), explanation_service.MAX_RETRIES)
+
+    def test_parse_explanations(self):
+        self.assertEqual(parse_explanations('```json\n{"TXN1": "odd"}\n```'), {"TXN1": "odd"})
+        self.assertIsNone(parse_explanations("no json here"))
+        self.assertIsNone(parse_explanations("{not json}"))
+
+    def test_template_explanation(self):
+        reason = template_explanation({
+            "Amount": "Outlier value: 1600.0 (Normal: Mean 1000.00, Std 200.00)",
+            "Country": "Unusual category: XX",
+        })
+        self.assertEqual(reason, "Flagged by the anomaly model: Amount of 1600.0 is 3.0 standard deviations above "
+                                 "its usual average of 1000.00; Country 'XX' is rare or unseen in historical transactions.")
+        self.assertIn("unusual combination of values", template_explanation({}))
+        self.assertIn("Fee: something else", template_explanation({"Fee": "something else"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
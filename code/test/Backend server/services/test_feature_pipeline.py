@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from Backend_server.services.anamoly_service import train_model, detect_anomalies
+from Backend_server.services.feature_pipeline import (build_feature_plan, apply_feature_plan, encoded_columns,
+                                                      parse_date, hash_bucket, category_texts,
+                                                      INVALID_COUNT_FEATURE, HASH_BUCKETS)
+from Backend_server.services.model_cache import load_model, clear_cache
+
+
+def make_frame(rows=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    amounts = rng.normal(1000, 100, rows).round(2).astype(str).astype(object)
+    amounts[:20] = "INVALID"
+    dates = pd.Series(pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, rows), unit="D"))
+    dates = dates.dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    dates[20:25] = "Unknown"
+    return pd.DataFrame({
+        "Customer ID": [f"CUST{i:06d}" for i in range(rows)],
+        "Obligor Name": [f"Company {i}" for i in rng.integers(0, 300, rows)],
+        "Country": rng.choice(["US", "UK", "DE"], rows),
+        "Origination Date": dates,
+        "Committed Exposure Global": amounts,
+        "Region": "EMEA",
+        "Fee": rng.normal(10, 1, rows),
+    }, index=pd.Index([f"TXN{i}" for i in range(rows)], name="Transaction ID")).astype(
+        {"Customer ID": object, "Obligor Name": object, "Country": object, "Region": object})
+
+
+class TestFeaturePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.df = make_frame()
+        self.categorical_cols = {"Customer ID", "Obligor Name", "Country", "Origination Date",
+                                 "Committed Exposure Global", "Region"}
+        self.plan = build_feature_plan(self.df, self.categorical_cols)
+
+    def tearDown(self):
+        clear_cache()
+
+    def test_plan_kinds(self):
+        kinds = {col: spec["kind"] for col, spec in self.plan["columns"].items()}
+        self.assertEqual(kinds, {"Customer ID": "dropped", "Obligor Name": "hashed", "Country": "categorical",
+                                 "Origination Date": "date", "Committed Exposure Global": "numeric",
+                                 "Region": "dropped", "Fee": "numeric"})
+        self.assertEqual(self.plan["columns"]["Customer ID"]["reason"], "identifier")
+        self.assertEqual(self.plan["columns"]["Region"]["reason"], "constant")
+        self.assertEqual(self.plan["columns"]["Committed Exposure Global"]["invalid"], 20)
+        self.assertEqual(self.plan["columns"]["Origination Date"]["invalid"], 5)
+        self.assertEqual(self.plan["features"], ["Obligor Name", "Country", "Origination Date",
+                                                 "Committed Exposure Global", "Fee", INVALID_COUNT_FEATURE])
+
+    def test_apply_plan(self):
+        encoders = {col: LabelEncoder().fit(self.df[col].astype(str)) for col in encoded_columns(self.plan)}
+        new = self.df.head(30).copy()
+        new.loc["TXN0", "Country"] = "FR"
+        new = new.drop(columns=["Fee"])
+        features = apply_feature_plan(new, self.plan, encoders)
+
+        self.assertEqual(list(features.columns), self.plan["features"])
+        self.assertEqual(features.loc["TXN0", "Country"], -1)
+        self.assertEqual(features.loc["TXN29", "Origination Date"], parse_date(new.loc["TXN29", "Origination Date"]))
+        self.assertEqual(features.loc["TXN0", "Committed Exposure Global"],
+                         self.plan["columns"]["Committed Exposure Global"]["fill"])
+        # A missing column is missing in every row: Fee plus the invalid amount or date
+        self.assertEqual(features.loc["TXN0", INVALID_COUNT_FEATURE], 2)
+        self.assertEqual(features.loc["TXN25", INVALID_COUNT_FEATURE], 1)
+        self.assertTrue(features["Obligor Name"].between(0, HASH_BUCKETS - 1).all())
+        self.assertEqual(features.loc["TXN1", "Obligor Name"], hash_bucket(new.loc["TXN1", "Obligor Name"]))
+
+    def test_integer_identifiers_and_codes(self):
+        rng = np.random.default_rng(1)
+        facility_types = rng.integers(0, 20, 1000).astype(str).astype(object)
+        facility_types[:10] = "INVALID"
+        exposures = rng.integers(10_000, 50_000_000, 1000).astype(str).astype(object)
+        exposures[:10] = "INVALID"
+        df = pd.DataFrame({
+            "Zip Code": rng.permutation(np.arange(10000, 11000)).astype(str).astype(object),
+            "Account Number": rng.permutation(1000),
+            "Branch": rng.permutation(np.arange(100000, 101000)),
+            "Row": np.arange(1, 1001),
+            "Credit Facility Type": facility_types,
+            "Credit Facility Purpose": rng.integers(0, 31, 1000),
+            "Committed Exposure Global": exposures,
+            "Loan Amount": rng.integers(1, 5_000_000, 1000),
+        })
+        plan = build_feature_plan(df, {"Zip Code", "Credit Facility Type", "Committed Exposure Global"})
+        kinds = {col: spec.get("reason", spec["kind"]) for col, spec in plan["columns"].items()}
+        # Identifiers by name, fixed width (Branch) or sequence (Row); mostly unique integer amounts stay numeric
+        self.assertEqual(kinds, {"Zip Code": "identifier", "Account Number": "identifier", "Branch": "identifier",
+                                 "Row": "identifier", "Credit Facility Type": "categorical",
+                                 "Credit Facility Purpose": "categorical", "Committed Exposure Global": "numeric",
+                                 "Loan Amount": "numeric"})
+        self.assertEqual(plan["columns"]["Committed Exposure Global"]["invalid"], 10)
+
+        # A code read as a float (its column had missing values) is the same category as its text
+        encoders = {col: LabelEncoder().fit(category_texts(df[col])) for col in encoded_columns(plan)}
+        new = pd.DataFrame({"Credit Facility Type": ["7", None], "Credit Facility Purpose": [7.0, np.nan]})
+        features = apply_feature_plan(new, plan, encoders)
+        self.assertEqual(features["Credit Facility Type"][0], list(encoders["Credit Facility Type"].classes_).index("7"))
+        self.assertEqual(features["Credit Facility Purpose"][0],
+                         list(encoders["Credit Facility Purpose"].classes_).index("7"))
+        self.assertEqual(list(features.loc[1, ["Credit Facility Type", "Credit Facility Purpose"]]), [-1, -1])
+
+    def test_plan_is_saved_with_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path = os.path.join(tmp, "transactions.csv")
+            model_path = os.path.join(tmp, "model.pkl")
+            self.df.to_csv(data_path)
+            details = train_model(data_path, model_path=model_path)["model_details"]
+
+            saved = load_model(model_path)
+            self.assertEqual(saved["feature_plan"]["features"], details["features"])
+            self.assertEqual(list(saved["scaler"].feature_names_in_), details["features"])
+            self.assertEqual(details["dropped_columns"], {"Customer ID": "identifier", "Region": "constant"})
+            self.assertEqual(set(saved["encoders"]), {"Country"})
+            # Mostly numeric object columns are profiled as numbers
+            self.assertEqual(saved["profiles"]["Committed Exposure Global"]["type"], "numeric")
+            result = detect_anomalies(data_path, model_path=model_path, output_file=os.path.join(tmp, "out.xlsx"))
+            self.assertEqual(result["total_transactions"], 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
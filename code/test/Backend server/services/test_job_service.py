@@ -0,0 +1,143 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from fastapi import HTTPException
+from Backend_server.services import job_service
+from Backend_server.services.db_pool import close_pool
+
+
+def wait_for(job_id, statuses=("succeeded", "failed", "cancelled"), timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_service.get_job(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+class TestJobService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.db")
+        self.patcher = patch.object(job_service, "JOBS_DB", self.db_path)
+        self.patcher.start()
+        job_service.init_job_store()
+
+    def tearDown(self):
+        self.patcher.stop()
+        close_pool(self.db_path)
+        self.tmp.cleanup()
+
+    def test_job_reports_stages_and_result(self):
+        def handler(params, context):
+            context.report("first", 0.25)
+            context.report("second", 0.75, rows=params["rows"])
+            return {"rows": params["rows"]}
+
+        job_service.register_job("test_success", handler)
+        job = job_service.submit_job("test_success", {"rows": 10}, session_id="s1")
+        job = wait_for(job["job_id"])
+
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["progress"], 1.0)
+        self.assertEqual([stage["stage"] for stage in job["stages"]], ["first", "second"])
+        self.assertEqual(job["details"], {"rows": 10})
+        self.assertEqual(job_service.get_job_result(job["job_id"]), {"rows": 10})
+
+    def test_progress_snapshot_reports_throughput_and_eta(self):
+        release = threading.Event()
+
+        def handler(params, context):
+            context.report("validate", 0.5, rules_completed=5, total_rules=10, rows_processed=5000)
+            release.wait(2)
+            return {}
+
+        job_service.register_job("test_snapshot", handler)
+        job = job_service.submit_job("test_snapshot", {})
+        deadline = time.time() + 2
+        while job_service.get_job(job["job_id"])["stage"] != "validate" and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+        snapshot = job_service.progress_snapshot(job["job_id"])
+        release.set()
+        self.assertEqual(snapshot["details"]["rules_completed"], 5)
+        self.assertGreater(snapshot["rows_per_sec"], 0)
+        self.assertGreater(snapshot["eta_seconds"], 0)
+        wait_for(job["job_id"])
+
+    def test_failed_job_records_error(self):
+        def handler(params, context):
+            raise ValueError("boom")
+
+        job_service.register_job("test_failure", handler)
+        job = wait_for(job_service.submit_job("test_failure", {})["job_id"])
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "boom")
+        with self.assertRaises(HTTPException) as context:
+            job_service.get_job_result(job["job_id"])
+        self.assertEqual(context.exception.status_code, 500)
+
+    def test_running_job_can_be_cancelled(self):
+        started = threading.Event()
+
+        def handler(params, context):
+            started.set()
+            while True:
+                context.report("loop")
+                time.sleep(0.01)
+
+        job_service.register_job("test_cancel", handler)
+        job = job_service.submit_job("test_cancel", {})
+        started.wait(2)
+        job_service.cancel_job(job["job_id"])
+        self.assertEqual(wait_for(job["job_id"])["status"], "cancelled")
+
+    def test_unknown_job_type_rejected(self):
+        with self.assertRaises(HTTPException) as context:
+            job_service.submit_job("does_not_exist", {})
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_concurrent_submits_respect_queue_cap(self):
+        release = threading.Event()
+        job_service.register_job("test_cap", lambda params, context: release.wait(2))
+        accepted, rejected = [], []
+
+        def submit():
+            try:
+                accepted.append(job_service.submit_job("test_cap", {})["job_id"])
+            except HTTPException as error:
+                rejected.append(error.status_code)
+
+        with patch.object(job_service, "MAX_QUEUED_JOBS", 3):
+            threads = [threading.Thread(target=submit) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        release.set()
+        self.assertEqual(len(accepted), 3)
+        self.assertEqual(rejected, [429] * 7)
+        for job_id in accepted:
+            wait_for(job_id)
+
+    def test_recover_jobs_after_restart(self):
+        job_service.register_job("test_recover", lambda params, context: {"ok": True})
+        with job_service.get_connection(self.db_path) as conn:
+            conn.execute("INSERT INTO jobs (job_id, kind, status, params, created_at) VALUES "
+                         "('was_running', 'test_recover', 'running', '{}', '1'), "
+                         "('was_queued', 'test_recover', 'queued', '{}', '2')")
+            conn.commit()
+
+        self.assertEqual(job_service.recover_jobs(), {"requeued": 1})
+        self.assertEqual(job_service.get_job("was_running")["status"], "interrupted")
+        self.assertEqual(wait_for("was_queued")["status"], "succeeded")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import joblib
+import numpy as np
+from Backend_server.services import model_cache
+from Backend_server.services.model_cache import load_model, evict, clear_cache, warm_cache, cache_stats
+
+
+class TestModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp.name, "model.pkl")
+        joblib.dump({"weights": np.arange(10.0), "version": 1}, self.model_path)
+        clear_cache()
+
+    def tearDown(self):
+        clear_cache()
+        self.tmp.cleanup()
+
+    def test_second_load_is_served_from_cache(self):
+        first = load_model(self.model_path)
+        second = load_model(self.model_path)
+        self.assertIs(first, second)
+        self.assertIsInstance(first["weights"], np.memmap)
+        self.assertGreaterEqual(cache_stats()["hits"], 1)
+
+    def test_rewritten_artifact_is_reloaded(self):
+        first = load_model(self.model_path)
+        tmp_path = self.model_path + ".tmp"
+        joblib.dump({"weights": np.arange(20.0), "version": 2}, tmp_path)
+        os.replace(tmp_path, self.model_path)
+        second = load_model(self.model_path)
+        self.assertEqual(second["version"], 2)
+        # The replaced artifact stays readable for requests still holding it
+        self.assertEqual(first["weights"].sum(), 45.0)
+
+    def test_least_recently_used_model_is_evicted(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp.name, f"model_{i}.pkl")
+            joblib.dump({"version": i}, path)
+            paths.append(path)
+        with patch.object(model_cache, "MAX_CACHED_MODELS", 2):
+            for path in paths:
+                load_model(path)
+        cached = cache_stats()["cached_models"]
+        self.assertEqual(cached, [os.path.abspath(p) for p in paths[1:]])
+
+    def test_evict_and_warm(self):
+        load_model(self.model_path)
+        evict(self.model_path)
+        self.assertEqual(cache_stats()["cached_models"], [])
+        warmed = warm_cache([self.model_path, os.path.join(self.tmp.name, "missing.pkl"), None])
+        self.assertEqual(warmed, [self.model_path])
+        self.assertEqual(cache_stats()["cached_models"], [os.path.abspath(self.model_path)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import importlib
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from Backend_server.services import model_registry
+from Backend_server.services.model_registry import ensure_model, pin_baseline, list_models, compute_drift
+
+
+def write_transactions(path, rows=200, amount_scale=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({
+        "Transaction ID": [f"TXN{seed}{i:05d}" for i in range(rows)],
+        "Country": rng.choice(["US", "UK", "DE"], rows),
+        "Amount": rng.normal(1000, 100, rows) * amount_scale,
+    }).to_csv(path, index=False)
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        registry_dir = os.path.join(self.tmp.name, "registry")
+        self.patchers = [
+            patch.object(model_registry, "REGISTRY_DIR", registry_dir),
+            patch.object(model_registry, "REGISTRY_INDEX", os.path.join(registry_dir, "registry.json")),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.data_path = os.path.join(self.tmp.name, "new_tran.csv")
+        write_transactions(self.data_path)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmp.cleanup()
+
+    def test_first_model_is_trained_and_pinned(self):
+        selection = ensure_model(self.data_path)
+        self.assertEqual(selection["action"], "trained")
+        self.assertTrue(os.path.exists(selection["model"]["path"]))
+        self.assertEqual(list_models()["baseline"], selection["model"]["model_id"])
+
+    @patch("Backend_server.services.model_registry.train_model", wraps=model_registry.train_model)
+    def test_identical_data_reuses_model(self, mock_train):
+        first = ensure_model(self.data_path)
+        second = ensure_model(self.data_path)
+        self.assertEqual(second["action"], "reused")
+        self.assertEqual(first["model"]["model_id"], second["model"]["model_id"])
+        self.assertEqual(mock_train.call_count, 1)
+
+    def test_similar_data_uses_baseline_without_training(self):
+        baseline = ensure_model(self.data_path)
+        other_path = os.path.join(self.tmp.name, "other.csv")
+        write_transactions(other_path, seed=1)
+        selection = ensure_model(other_path)
+        self.assertEqual(selection["action"], "baseline")
+        self.assertEqual(selection["model"]["model_id"], baseline["model"]["model_id"])
+        self.assertLess(selection["drift"]["drift_score"], model_registry.DRIFT_THRESHOLD)
+
+    def test_drifted_data_triggers_retraining(self):
+        baseline = ensure_model(self.data_path)
+        drifted_path = os.path.join(self.tmp.name, "drifted.csv")
+        write_transactions(drifted_path, amount_scale=3.0, seed=2)
+        drift = compute_drift(drifted_path, baseline["model"]["path"])
+        self.assertEqual(drift["most_shifted_column"], "Amount")
+
+        selection = ensure_model(drifted_path)
+        self.assertEqual(selection["action"], "retrained_on_drift")
+        self.assertNotEqual(selection["model"]["model_id"], baseline["model"]["model_id"])
+        # The baseline only moves when pinned explicitly
+        self.assertEqual(list_models()["baseline"], baseline["model"]["model_id"])
+        pin_baseline(selection["model"]["model_id"])
+        self.assertEqual(list_models()["baseline"], selection["model"]["model_id"])
+
+    def test_params_are_part_of_the_key(self):
+        first = ensure_model(self.data_path)
+        second = ensure_model(self.data_path, params={"n_estimators": 50}, retrain=True)
+        self.assertNotEqual(first["model"]["model_id"], second["model"]["model_id"])
+        self.assertEqual(len(list_models()["models"]), 2)
+
+    def test_sessions_have_their_own_registry(self):
+        # The session module the registry itself resolves session folders with
+        sessions = importlib.import_module(model_registry.get_session_paths.__module__)
+        models_dir = os.path.join(self.tmp.name, "models")
+        with patch.object(sessions, "MODELS_DIR", models_dir), \
+                patch.object(sessions, "TEMP_DIR", os.path.join(self.tmp.name, "temp")), \
+                patch.object(sessions, "DATABASE_DIR", os.path.join(self.tmp.name, "database")):
+            first = ensure_model(self.data_path, session_id="s1")
+            second = ensure_model(self.data_path, session_id="s2")
+            self.assertEqual((first["action"], second["action"]), ("trained", "trained"))
+            self.assertTrue(first["model"]["path"].startswith(os.path.join(models_dir, "sessions", "s1", "registry")))
+            self.assertNotEqual(first["model"]["path"], second["model"]["path"])
+            self.assertEqual(list_models()["models"], [])
+            self.assertEqual(list_models("s1")["baseline"], first["model"]["model_id"])
+
+            # Deleting a session takes its registry with it
+            sessions.delete_session("s1")
+            self.assertFalse(os.path.exists(first["model"]["path"]))
+            self.assertEqual(list_models("s1")["models"], [])
+            self.assertEqual(len(list_models("s2")["models"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from Backend_server.services.anamoly_service import train_model, detect_anomalies, analyze_anomalies
+from Backend_server.services.model_cache import clear_cache
+from Backend_server.services.pipeline_context import PipelineContext
+
+
+class TestPipelineContext(unittest.TestCase):
+
+    def tearDown(self):
+        clear_cache()
+
+    def test_stages_share_one_parse_of_the_file(self):
+        rng = np.random.default_rng(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path, model_path = os.path.join(tmp, "new_tran.csv"), os.path.join(tmp, "model.pkl")
+            pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(300)],
+                          "Country": rng.choice(["US", "UK"], 300),
+                          "Amount": np.r_[rng.normal(1000, 10, 298), [5000.0, -3000.0]]}).to_csv(data_path, index=False)
+            train_model(data_path, model_path=model_path)
+            outputs = {"output_csv": os.path.join(tmp, "out.csv"), "output_xlsx": os.path.join(tmp, "out.xlsx")}
+            expected = detect_anomalies(data_path, model_path=model_path)
+            analyze_anomalies(expected["anomaly_ids"], data_path, model_path=model_path,
+                              explanation_mode="template", **outputs)
+            expected_csv = pd.read_csv(outputs["output_csv"])
+
+            context = PipelineContext(data_path)
+            with patch("pandas.read_csv", wraps=pd.read_csv) as read_csv:
+                detected = detect_anomalies(data_path, model_path=model_path, context=context)
+                analyze_anomalies(detected["anomaly_ids"], data_path, model_path=model_path,
+                                  explanation_mode="template", context=context, **outputs)
+            read_csv.assert_called_once()
+
+            self.assertEqual(detected["anomaly_ids"], expected["anomaly_ids"])
+            self.assertTrue({"TXN298", "TXN299"} <= set(context.anomaly_ids))
+            self.assertEqual(list(context.anomalies.index), context.anomaly_ids)
+            self.assertEqual(len(context.predictions), 300)
+            pd.testing.assert_frame_equal(pd.read_csv(outputs["output_csv"]), expected_csv)
+            # The shared frame is left as it was read
+            self.assertNotIn("Reason", context.data.columns)
+            self.assertEqual([stage["stage"] for stage in context.timings()["stages"]],
+                             ["load_model", "load_data", "features", "predict", "compare", "explain", "write_outputs"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from Backend_server.services import profile_service
+from Backend_server.services.profile_service import profile_file, get_profile
+
+
+class TestProfileService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "new_tran.csv")
+        pd.DataFrame({
+            "Transaction ID": [f"TXN{i}" for i in range(1, 9)],
+            "Amount": ["10", "20.5", "", "NULL", "abc", "30", "40", "1000"],
+            "Country": ["US", "UK", "US", "US", " ", "DE", "US", "UK"],
+            "Date": ["2024-01-05", "2023-12-31", "2024-02-01", "N/A", "2024-01-05", "bad", "2024-01-05", ""],
+            "Active": ["true", "False", "TRUE", "true", "", "", "false", "true"],
+        }).to_csv(self.path, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_profile_matches_the_data_across_chunks(self):
+        profile = profile_file(self.path, chunk_rows=3)
+        columns = {column["column"]: column for column in profile["columns"]}
+        self.assertEqual(profile["rows"], 8)
+
+        amount = columns["Amount"]
+        self.assertEqual((amount["nulls"], amount["empties"], amount["present"]), (1, 1, 6))
+        self.assertEqual(amount["types"], {"integer": 4, "float": 1, "boolean": 0, "date": 0, "string": 1})
+        self.assertEqual((amount["min"], amount["max"]), (10.0, 1000.0))
+        self.assertAlmostEqual(amount["mean"], 1100.5 / 5)
+        self.assertEqual(amount["quantiles"]["p50"], 30.0)
+
+        country = columns["Country"]
+        self.assertEqual((country["empties"], country["distinct"], country["distinct_exact"]), (1, 3, True))
+        self.assertEqual(country["top_values"][:2], [{"value": "US", "count": 4}, {"value": "UK", "count": 2}])
+        self.assertIsNone(country["quantiles"])
+
+        date = columns["Date"]
+        self.assertEqual((date["types"]["date"], date["types"]["string"], date["nulls"]), (5, 1, 1))
+        self.assertEqual((date["min"], date["max"]), ("2023-12-31", "bad"))
+        self.assertEqual(columns["Active"]["types"]["boolean"], 6)
+        self.assertEqual(columns["Transaction ID"]["distinct"], 8)
+
+    def test_profile_is_cached_per_dataset_content(self):
+        with patch.object(profile_service, "profile_file", wraps=profile_file) as profile:
+            first = get_profile(self.path)
+            second = get_profile(self.path)
+            # Same content written again: recognised by its fingerprint
+            with open(self.path, "rb") as f:
+                content = f.read()
+            with open(self.path, "wb") as f:
+                f.write(content)
+            os.utime(self.path, ns=(1, 1))
+            third = get_profile(self.path)
+            self.assertEqual(profile.call_count, 1)
+
+            with open(self.path, "ab") as f:
+                f.write(b"TXN9,5,US,2024-03-01,true\n")
+            fourth = get_profile(self.path)
+            self.assertEqual(profile.call_count, 2)
+        self.assertEqual((first["cached"], second["cached"], third["cached"], fourth["cached"]),
+                         (False, True, True, False))
+        self.assertEqual(second["columns"], first["columns"])
+        self.assertEqual(fourth["rows"], 9)
+        self.assertTrue(get_profile(self.path, refresh=True)["cached"] is False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from Backend_server.services.report_export import export_report, write_highlighted_xlsx, MAX_EXCEL_ROWS
+
+
+class TestReportExport(unittest.TestCase):
+
+    def make_report(self):
+        return pd.DataFrame({"Country": ["US", None, "DE", "UK"], "Amount": [1.5, 2.0, np.nan, 4.0],
+                             "Count": [1, 2, 3, 4], "Reason": ["", "Outlier", "", "Outlier"]},
+                            index=pd.Index(["TXN1", "TXN2", "TXN3", "TXN4"], name="Transaction ID"))
+
+    def test_export_highlights_only_anomalous_rows(self):
+        df = self.make_report()
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path, xlsx_path = os.path.join(tmp, "out.csv"), os.path.join(tmp, "out.xlsx")
+            export_report(df, ["TXN2", "TXN4"], csv_path, xlsx_path)
+
+            self.assertEqual(open(csv_path).read(), df.to_csv(index=True))
+            # Empty reasons read back as missing, as they do from to_excel
+            pd.testing.assert_frame_equal(pd.read_excel(xlsx_path, index_col="Transaction ID"),
+                                          df.replace("", np.nan), check_dtype=False)
+
+            ws = load_workbook(xlsx_path).active
+            self.assertEqual([cell.value for cell in ws[1]], ["Transaction ID", "Country", "Amount", "Count", "Reason"])
+            self.assertTrue(ws["A1"].font.bold)
+            self.assertIsNone(ws["C4"].value)
+            highlighted = [row[0].value for row in ws.iter_rows(min_row=2)
+                           if all(cell.fill.fgColor.rgb == "00FFFF00" for cell in row[1:])]
+            self.assertEqual(highlighted, ["TXN2", "TXN4"])
+            self.assertEqual(ws["B2"].fill.fill_type, None)
+
+    def test_numeric_ids_match_their_string_form(self):
+        df = self.make_report()
+        df.index = pd.Index([101, 102, 103, 104], name="Transaction ID")
+        with tempfile.TemporaryDirectory() as tmp:
+            xlsx_path = os.path.join(tmp, "out.xlsx")
+            write_highlighted_xlsx(df, ["103"], xlsx_path)
+            ws = load_workbook(xlsx_path).active
+            self.assertEqual(ws["B4"].fill.fgColor.rgb, "00FFFF00")
+            self.assertEqual(ws["B3"].fill.fill_type, None)
+
+    def test_too_many_rows_for_one_sheet(self):
+        df = pd.DataFrame({"Amount": np.zeros(MAX_EXCEL_ROWS)})
+        with self.assertRaises(ValueError):
+            write_highlighted_xlsx(df, [], os.path.join(tempfile.gettempdir(), "never_written.xlsx"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from fastapi import HTTPException
+from openpyxl import load_workbook
+from Backend_server.services import report_service
+from Backend_server.services.report_service import defer_report, discard_report, build_report, serve_report
+
+
+class TestReportService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "analysed_transaction.csv")
+        self.output = os.path.join(self.tmp.name, "analysed_transaction.xlsx")
+        pd.DataFrame({"Transaction ID": ["TXN1", "TXN2"], "Amount": [1.0, 900.0],
+                      "Reason": ["", "Outlier"]}).to_csv(self.source, index=False)
+        report_service._builds.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def defer(self, anomaly_ids=("TXN2",)):
+        return defer_report(self.output, "anomaly_report", {"source": self.source, "anomaly_ids": list(anomaly_ids)},
+                            sources=[self.source])
+
+    def test_report_is_built_on_first_download_and_served_with_etag(self):
+        digest = self.defer()
+        self.assertFalse(os.path.exists(self.output))
+        self.assertEqual(self.defer(), digest)
+
+        with patch.object(report_service, "submit_job", return_value={"job_id": "job1", "status": "queued"}) as submit, \
+                patch.object(report_service, "get_job", return_value={"job_id": "job1", "status": "running"}):
+            first = serve_report(self.output, "report.xlsx")
+            second = serve_report(self.output, "report.xlsx")
+        self.assertEqual((first.status_code, second.status_code), (202, 202))
+        submit.assert_called_once_with("build_report", {"output_file": self.output, "digest": digest}, session_id=None)
+
+        result = build_report({"output_file": self.output, "digest": digest}, MagicMock())
+        self.assertEqual(result["status"], "built")
+        ws = load_workbook(result["output_file"]).active
+        self.assertEqual(ws["B3"].fill.fgColor.rgb, "00FFFF00")
+        self.assertEqual(ws["B2"].fill.fill_type, None)
+
+        response = serve_report(self.output, "report.xlsx")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], f'"{digest}"')
+        self.assertEqual(serve_report(self.output, "report.xlsx", if_none_match=f'W/"{digest}"').status_code, 304)
+
+    def test_new_results_replace_the_built_report(self):
+        digest = self.defer()
+        build_report({"output_file": self.output, "digest": digest}, MagicMock())
+        new_digest = self.defer(["TXN1"])
+        self.assertNotEqual(new_digest, digest)
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.endswith(".xlsx")], [])
+        # A build queued for the old results does nothing
+        self.assertEqual(build_report({"output_file": self.output, "digest": digest}, MagicMock())["status"],
+                         "superseded")
+        with patch.object(report_service, "submit_job", return_value={"job_id": "job2", "status": "queued"}):
+            self.assertEqual(serve_report(self.output, "report.xlsx", if_none_match=f'"{digest}"').status_code, 202)
+
+    def test_validation_report_and_eager_reports(self):
+        original = os.path.join(self.tmp.name, "new_tran.csv")
+        pd.DataFrame({"Transaction ID": ["TXN1", "TXN2"], "Amount": [1, 2], "Notes": ["a", "b"]}).to_csv(original,
+                                                                                                       index=False)
+        output = os.path.join(self.tmp.name, "fed_default.xlsx")
+        failures = {"TXN2": [{"rule_id": "R1", "rule_name": "Positive amount"}]}
+        digest = defer_report(output, "validation_report", {"transaction_failures": failures, "original_file": original},
+                              sources=[original])
+        built = build_report({"output_file": output, "digest": digest}, MagicMock())["output_file"]
+        ws = load_workbook(built).active
+        self.assertEqual(ws["C3"].value, "Failed rule: Positive amount (R1)")
+        self.assertEqual(ws["A3"].fill.fgColor.rgb, "00FF0000")
+        self.assertEqual(ws["C2"].value, "a")
+
+        # A report written directly replaces the deferred one and is served as it is
+        os.replace(built, output)
+        discard_report(output)
+        self.assertEqual(os.listdir(self.tmp.name).count("fed_default.xlsx.manifest.json"), 0)
+        self.assertEqual(serve_report(output, "report.xlsx").status_code, 200)
+
+    def test_report_of_replaced_data_is_not_served(self):
+        original = os.path.join(self.tmp.name, "new_tran.csv")
+        pd.DataFrame({"Transaction ID": ["TXN1", "TXN2"], "Notes": ["a", "b"]}).to_csv(original, index=False)
+        output = os.path.join(self.tmp.name, "fed_default.xlsx")
+        digest = defer_report(output, "validation_report",
+                              {"transaction_failures": {"TXN2": [{"rule_id": "R1", "rule_name": "Rule"}]},
+                               "original_file": original}, sources=[original])
+
+        # Written again with the same content: still the data of the run
+        content = open(original, "rb").read()
+        with open(original, "wb") as f:
+            f.write(content)
+        os.utime(original, ns=(1, 1))
+        self.assertEqual(build_report({"output_file": output, "digest": digest}, MagicMock())["status"], "built")
+
+        # A new upload before the download
+        pd.DataFrame({"Transaction ID": ["TXN7", "TXN2"], "Notes": ["x", "y"]}).to_csv(original, index=False)
+        with self.assertRaises(HTTPException) as raised:
+            serve_report(output, "report.xlsx", if_none_match=f'"{digest}"')
+        self.assertEqual(raised.exception.status_code, 409)
+        self.assertEqual(build_report({"output_file": output, "digest": digest}, MagicMock())["status"], "stale")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import joblib
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from Backend_server.services.anamoly_service import train_model, encode_categoricals
+from Backend_server.services.model_cache import clear_cache
+from Backend_server.services.scoring_service import get_scorer, score_records, MicroBatcher
+
+
+class TestScoringService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        cls.df = pd.DataFrame({
+            "Transaction ID": [f"TXN{i}" for i in range(300)],
+            "Country": rng.choice(["US", "UK", "DE", None], 300),
+            "Amount": np.r_[rng.normal(1000, 50, 295), [9000.0, -5000.0, 7000.0, 8000.0, 6000.0]],
+            "Fee": rng.normal(10, 1, 300),
+        })
+        data_path = os.path.join(cls.tmp.name, "transactions.csv")
+        cls.model_path = os.path.join(cls.tmp.name, "model.pkl")
+        cls.df.to_csv(data_path, index=False)
+        train_model(data_path, model_path=cls.model_path)
+        cls.records = pd.read_csv(data_path).to_dict("records")
+
+    @classmethod
+    def tearDownClass(cls):
+        clear_cache()
+        cls.tmp.cleanup()
+
+    def test_scores_match_isolation_forest(self):
+        saved = joblib.load(self.model_path)
+        frame = pd.DataFrame(self.records).set_index("Transaction ID").fillna("Unknown")
+        encoded = encode_categoricals(frame[list(saved["scaler"].feature_names_in_)], saved["encoders"])
+        expected = saved["model"].decision_function(saved["scaler"].transform(encoded))
+
+        results = score_records(self.records, self.model_path)
+        np.testing.assert_allclose([r["score"] for r in results], expected, atol=1e-6)
+        self.assertEqual([r["is_anomaly"] for r in results], list(saved["model"].predict(saved["scaler"].transform(encoded)) == -1))
+        self.assertEqual(results[0]["transaction_id"], "TXN0")
+
+    def test_unknown_categories_and_bad_numbers(self):
+        result = score_records([{"Transaction ID": "NEW1", "Country": "FR", "Amount": 1000, "Fee": "10.5"}],
+                               self.model_path)
+        self.assertEqual(len(result), 1)
+        with self.assertRaises(HTTPException) as ctx:
+            score_records([{"Country": "US", "Amount": "lots", "Fee": 10}], self.model_path)
+        self.assertEqual(ctx.exception.status_code, 422)
+
+    def test_scorer_is_compiled_once(self):
+        self.assertIs(get_scorer(self.model_path), get_scorer(self.model_path))
+
+    def test_concurrent_requests_are_batched(self):
+        batcher = MicroBatcher()
+        bad = {"Country": "US", "Amount": None, "Fee": 10}
+
+        async def run():
+            requests = [batcher.score([record], self.model_path) for record in self.records[:50]]
+            requests.append(batcher.score([bad], self.model_path))
+            return await asyncio.gather(*requests, return_exceptions=True)
+
+        outcomes = asyncio.run(run())
+        expected = score_records(self.records[:50], self.model_path)
+        self.assertEqual([outcome[0] for outcome in outcomes[:50]], expected)
+        # The invalid record only fails its own request
+        self.assertIsInstance(outcomes[-1], HTTPException)
+        stats = batcher.stats()
+        self.assertEqual(stats["requests"], 51)
+        self.assertLess(stats["batches"], 51)
+
+
+if __name__ == "__main__":
+    unittest.main()
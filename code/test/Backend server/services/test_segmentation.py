@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from Backend_server.services.anamoly_service import train_model, detect_anomalies
+from Backend_server.services.detectors import resolve_model_params
+from Backend_server.services.model_cache import clear_cache
+from Backend_server.services.model_registry import params_key
+from Backend_server.services.scoring_service import score_records
+from Backend_server.services.segmentation import segment_keys, record_segment_key, fit_segment_models, route
+
+
+def make_transactions(rows=3000, seed=0):
+    # Each country has its own amount scale; the first rows carry another country's amount
+    rng = np.random.default_rng(seed)
+    country = rng.choice(["US", "DE"], rows).astype(object)
+    scale = np.where(country == "US", 1000.0, 100000.0)
+    amount = rng.normal(scale, scale * 0.05)
+    country[:5], amount[:5] = "DE", 1000.0
+    country[5:10], amount[5:10] = "US", 100000.0
+    country[10:20] = "FR"
+    return pd.DataFrame({"Transaction ID": [f"TXN{i}" for i in range(rows)], "Country": country,
+                         "Amount": amount, "Fee": rng.normal(10, 1, rows)})
+
+
+class TestSegmentation(unittest.TestCase):
+
+    def tearDown(self):
+        clear_cache()
+
+    def test_segment_keys(self):
+        df = pd.DataFrame({"Country": ["US", None, "DE"], "Type": [2.0, 3.0, np.nan]})
+        self.assertEqual(list(segment_keys(df, ["Country", "Type"])), ["US | 2", "Unknown | 3", "DE | Unknown"])
+        self.assertEqual(record_segment_key({"Country": "US", "Type": 2}, ["Country", "Type"]), "US | 2")
+        with self.assertRaises(ValueError):
+            segment_keys(df, ["Region"])
+
+    def test_parallel_fit_matches_inline_fit(self):
+        rng = np.random.default_rng(0)
+        X = rng.standard_normal((3000, 4))
+        keys = np.array(["a", "b", "c"], dtype=object)[rng.integers(0, 3, 3000)]
+        keys[:50] = "small"
+        params = resolve_model_params({"n_estimators": 20})
+        inline, sizes = fit_segment_models(X, keys, params, min_segment_rows=100, max_workers=1)
+        pooled, _ = fit_segment_models(X, keys, params, min_segment_rows=100, max_workers=2)
+
+        self.assertEqual(set(inline), {"a", "b", "c"})
+        self.assertEqual(sizes["small"], 50)
+        for key in inline:
+            np.testing.assert_allclose(inline[key].decision_function(X), pooled[key].decision_function(X))
+        routed = route(inline, inline["a"], X, keys, "decision_function")
+        np.testing.assert_allclose(routed[keys == "b"], inline["b"].decision_function(X[keys == "b"]))
+        np.testing.assert_allclose(routed[keys == "small"], inline["a"].decision_function(X[keys == "small"]))
+
+    def test_segmented_model_flags_rows_unusual_for_their_segment(self):
+        df = make_transactions()
+        planted = {f"TXN{i}" for i in range(10)}
+        with tempfile.TemporaryDirectory() as tmp:
+            data_path, model_path = os.path.join(tmp, "transactions.csv"), os.path.join(tmp, "model.pkl")
+            df.to_csv(data_path, index=False)
+            details = train_model(data_path, model_path=model_path, segment_by=["Country"])["model_details"]
+            self.assertEqual(set(details["segments"]), {"US", "DE"})
+            # FR is too small for its own model and falls back to the global one
+            self.assertEqual(details["fallback_rows"], 10)
+
+            result = detect_anomalies(data_path, model_path=model_path, output_file=os.path.join(tmp, "out.xlsx"))
+            self.assertTrue(planted <= set(result["anomaly_ids"]))
+            scores = score_records(df.to_dict("records"), model_path)
+            self.assertEqual({r["transaction_id"] for r in scores if r["is_anomaly"]}, set(result["anomaly_ids"]))
+
+    def test_segmentation_is_part_of_the_registry_key(self):
+        params = resolve_model_params(None)
+        self.assertEqual(params_key(params), params_key(params, segment_by=None))
+        self.assertNotEqual(params_key(params), params_key(params, segment_by=["Country"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
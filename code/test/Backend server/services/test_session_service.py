@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+from fastapi import HTTPException
+from Backend_server.services.session_service import get_session_paths, delete_session
+
+
+class TestSessionService(unittest.TestCase):
+
+    def test_default_session_uses_legacy_paths(self):
+        paths = get_session_paths()
+        self.assertEqual(paths["session_id"], "default")
+        self.assertEqual(paths["new_transactions"], "../Temp_files/new_tran.csv")
+        self.assertEqual(paths["transaction_db"], "../Database/transaction.db")
+        self.assertEqual(paths["model"], "./models/anomoly_detection_model.pkl")
+
+    @patch("Backend_server.services.session_service.os.makedirs")
+    def test_named_session_is_namespaced(self, mock_makedirs):
+        paths = get_session_paths("audit_1")
+        self.assertEqual(paths["new_transactions"], "../Temp_files/sessions/audit_1/new_tran.csv")
+        self.assertEqual(paths["transaction_db"], "../Database/sessions/audit_1/transaction.db")
+        self.assertEqual(paths["model"], "./models/sessions/audit_1/anomoly_detection_model.pkl")
+        # Only writers create the session's folders
+        mock_makedirs.assert_not_called()
+        get_session_paths("audit_1", create=True)
+        self.assertEqual(mock_makedirs.call_count, 3)
+
+    def test_invalid_session_id_rejected(self):
+        with self.assertRaises(HTTPException):
+            get_session_paths("../etc")
+
+    @patch("Backend_server.services.session_service.os.path.isdir", side_effect=lambda folder: "Database" not in folder)
+    @patch("Backend_server.services.session_service.shutil.rmtree")
+    @patch("Backend_server.services.session_service.os.makedirs")
+    def test_delete_session(self, mock_makedirs, mock_rmtree, mock_isdir):
+        result = delete_session("audit_1")
+        self.assertIn("deleted successfully", result)
+        mock_makedirs.assert_not_called()
+        self.assertEqual(mock_rmtree.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
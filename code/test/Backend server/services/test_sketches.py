@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import pandas as pd
+from Backend_server.services.sketches import HyperLogLog, QuantileDigest, TopK
+
+
+class TestSketches(unittest.TestCase):
+
+    def test_distinct_count_estimate(self):
+        sketch = HyperLogLog()
+        for start in range(0, 50_000, 10_000):
+            # Every value is seen twice, in different updates
+            sketch.update(pd.Series([f"TXN{i}" for i in range(start, start + 10_000)]))
+            sketch.update(pd.Series([f"TXN{i}" for i in range(start, start + 10_000)][::-1]))
+        self.assertAlmostEqual(sketch.count(), 50_000, delta=50_000 * 0.05)
+        small = HyperLogLog()
+        small.update(pd.Series(["a", "b", "c", "a"]))
+        self.assertEqual(small.count(), 3)
+
+    def test_quantiles_stay_close_with_bounded_centroids(self):
+        values = np.random.default_rng(0).lognormal(10, 1, 200_000)
+        digest = QuantileDigest()
+        for chunk in np.array_split(values, 20):
+            digest.update(chunk)
+        self.assertLessEqual(len(digest.means), digest.compression // 2 + 1)
+        self.assertEqual(digest.total, len(values))
+        for q in (0.01, 0.5, 0.99):
+            true = np.quantile(values, q)
+            self.assertLess(abs(np.mean(values <= digest.quantile(q)) - q), 0.005)
+            self.assertAlmostEqual(digest.quantile(q) / true, 1, delta=0.05)
+        self.assertEqual((digest.quantile(0), digest.quantile(1)), (values.min(), values.max()))
+
+        # Weighted values count as repeats
+        weighted = QuantileDigest()
+        weighted.update([1.0, 2.0, 3.0], [1, 1, 98])
+        self.assertAlmostEqual(weighted.quantile(0.5), 3.0, delta=0.05)
+
+    def test_top_values_survive_a_long_tail(self):
+        top = TopK(capacity=50)
+        for start in range(0, 10_000, 1_000):
+            tail = pd.Series(1, index=[f"id{i}" for i in range(start, start + 1_000)])
+            top.update(pd.concat([tail, pd.Series({"DE": 400, "US": 300})]))
+        self.assertFalse(top.exact)
+        (first, first_count), (second, second_count) = top.top(2)
+        self.assertEqual((first, second), ("DE", "US"))
+        self.assertLessEqual(first_count, 4_000)
+        self.assertGreaterEqual(first_count, 4_000 - top.error)
+        self.assertLessEqual(len(top.counts), 50)
+
+        exact = TopK()
+        exact.update(pd.Series({"b": 2, "a": 2, "c": 5}))
+        self.assertEqual(exact.top(3), [("c", 5), ("a", 2), ("b", 2)])
+        self.assertTrue(exact.exact)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import gzip
+import json
+import unittest
+from fastapi import HTTPException
+from Backend_server.services import stream_service
+from Backend_server.services.stream_service import negotiate_format, negotiate_encoding, stream_rows
+
+
+class TestStreamService(unittest.TestCase):
+
+    def setUp(self):
+        self.columns = ["Transaction ID", "Amount"]
+        self.declared_types = ["TEXT", "REAL"]
+        self.batches = [[("TXN1", 10.5), ("TXN2", 20.0)], [("TXN3", None)]]
+
+    def body(self, media_format, encoding=None):
+        chunks = stream_service._compress(
+            {
+                "arrow": lambda: stream_service._arrow_chunks(self.columns, self.declared_types, iter(self.batches)),
+                "ndjson": lambda: stream_service._ndjson_chunks(self.columns, iter(self.batches)),
+                "json": lambda: stream_service._json_chunks(self.columns, iter(self.batches), "rows"),
+            }[media_format](),
+            encoding,
+        )
+        return b"".join(chunks)
+
+    def test_negotiate_format(self):
+        self.assertEqual(negotiate_format("application/x-ndjson"), "ndjson")
+        self.assertEqual(negotiate_format("application/json"), "json")
+        self.assertEqual(negotiate_format(None), "json")
+        if stream_service.pa is not None:
+            self.assertEqual(negotiate_format("application/vnd.apache.arrow.stream"), "arrow")
+
+    def test_arrow_without_pyarrow_is_not_acceptable(self):
+        original = stream_service.pa
+        stream_service.pa = None
+        try:
+            with self.assertRaises(HTTPException) as context:
+                negotiate_format("application/vnd.apache.arrow.stream")
+            self.assertEqual(context.exception.status_code, 406)
+        finally:
+            stream_service.pa = original
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(negotiate_encoding(None))
+        if stream_service.zstandard is not None:
+            self.assertEqual(negotiate_encoding("gzip, zstd"), "zstd")
+
+    def test_json_and_ndjson_bodies(self):
+        document = json.loads(self.body("json"))
+        self.assertEqual(len(document["rows"]), 3)
+        self.assertEqual(document["rows"][0], {"Transaction ID": "TXN1", "Amount": 10.5})
+
+        lines = self.body("ndjson").decode().splitlines()
+        self.assertEqual([json.loads(line)["Transaction ID"] for line in lines], ["TXN1", "TXN2", "TXN3"])
+
+    def test_gzip_round_trip(self):
+        lines = gzip.decompress(self.body("ndjson", "gzip")).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_arrow_round_trip(self):
+        if stream_service.pa is None:
+            self.skipTest("pyarrow not installed")
+        table = stream_service.pa.ipc.open_stream(self.body("arrow")).read_all()
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column("Amount").to_pylist(), [10.5, 20.0, None])
+
+    def test_arrow_values_that_do_not_fit_never_raise(self):
+        if stream_service.pa is None:
+            self.skipTest("pyarrow not installed")
+        self.declared_types = ["TEXT", "INTEGER"]
+        self.batches = [[("TXN1", 10), ("TXN2", 2.5)], [("TXN3", "n/a"), ("TXN4", float("nan")), ("TXN5", 1e30)]]
+        table = stream_service.pa.ipc.open_stream(self.body("arrow")).read_all()
+        self.assertEqual(table.column("Amount").to_pylist(), [10, 2, None, None, None])
+
+    def test_stream_rows_sets_headers(self):
+        response = stream_rows(self.columns, self.declared_types, iter(self.batches), "ndjson", "gzip")
+        self.assertEqual(response.media_type, "application/x-ndjson")
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+
+if __name__ == "__main__":
+    unittest.main()
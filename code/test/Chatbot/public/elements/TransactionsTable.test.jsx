@@ -2,18 +2,24 @@ import React from "react";
 import { render, screen, fireEvent } from "@testing-library/react";
 import TransactionsTable from "@/Chatbot/public/elements/TransactionsTable";
 
+// One page as /dbgetTransaction returns it when paging parameters are sent
+const mockPage = () =>
+  jest.fn(() =>
+    Promise.resolve({
+      json: () =>
+        Promise.resolve({
+          transactions: [
+            { id: "1", date: "2023-10-01", executerId: "E1", amount: 100 },
+          ],
+          next_cursor: null,
+          total_estimate: 1,
+        }),
+    })
+  );
+
 describe("TransactionsTable Component", () => {
   it("renders the component and displays transactions", async () => {
-    global.fetch = jest.fn(() =>
-      Promise.resolve({
-        json: () =>
-          Promise.resolve({
-            transactions: [
-              { id: "1", date: "2023-10-01", executerId: "E1", amount: 100 },
-            ],
-          }),
-      })
-    );
+    global.fetch = mockPage();
 
     render(<TransactionsTable />);
 
@@ -25,18 +31,9 @@ describe("TransactionsTable Component", () => {
   });
 
   it("filters transactions by search term", async () => {
-    global.fetch = jest.fn(() =>
-      Promise.resolve({
-        json: () =>
-          Promise.resolve({
-            transactions: [
-              { id: "1", date: "2023-10-01", executerId: "E1", amount: 100 },
-            ],
-          }),
-      })
-    );
+    global.fetch = mockPage();
 
-    render(<TransactionsTable />);
+    render(<TransactionsTable sessionId="s1" />);
 
     const searchInput = await screen.findByPlaceholderText(
       "Search transactions..."
@@ -44,19 +41,14 @@ describe("TransactionsTable Component", () => {
     fireEvent.change(searchInput, { target: { value: "E1" } });
 
     expect(await screen.findByText("E1")).toBeInTheDocument();
+    // The search goes to the server, over every column the table search covers, for this session
+    const params = new URL(global.fetch.mock.calls.at(-1)[0]).searchParams;
+    expect(params.get("filter")).toBe("Transaction ID|executerId|date~E1");
+    expect(params.get("session_id")).toBe("s1");
   });
 
   it("handles audit button click", async () => {
-    global.fetch = jest.fn(() =>
-      Promise.resolve({
-        json: () =>
-          Promise.resolve({
-            transactions: [
-              { id: "1", date: "2023-10-01", executerId: "E1", amount: 100 },
-            ],
-          }),
-      })
-    );
+    global.fetch = mockPage();
 
     render(<TransactionsTable />);
 
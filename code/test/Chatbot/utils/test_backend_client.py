@@ -0,0 +1,110 @@
+import unittest
+from unittest.mock import patch
+import httpx
+from Chatbot.utils import backend_client
+from Chatbot.utils.backend_client import request, run_job, BackendError, format_job_progress
+
+
+def use_transport(handler):
+    backend_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://backend")
+
+
+class TestBackendClient(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await backend_client.close_client()
+
+    @patch("Chatbot.utils.backend_client.RETRY_BACKOFF", 0)
+    async def test_request_retries_unavailable_get(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503 if len(calls) < 3 else 200, json={"ok": True})
+
+        use_transport(handler)
+        response = await request("GET", "/dbgetTransaction")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 3)
+
+    @patch("Chatbot.utils.backend_client.RETRY_BACKOFF", 0)
+    async def test_request_does_not_retry_post_response(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+
+        use_transport(handler)
+        response = await request("POST", "/uploadTransactionCSV/0")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(calls), 1)
+
+    @patch("Chatbot.utils.backend_client.RETRY_BACKOFF", 0)
+    async def test_connection_errors_raise_backend_error(self):
+        def handler(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        use_transport(handler)
+        with self.assertRaises(BackendError):
+            await request("GET", "/dbhealth", retries=1)
+
+    async def test_run_job_polls_when_events_unavailable(self):
+        statuses = iter(["running", "succeeded"])
+        progress = []
+
+        def handler(request):
+            if request.method == "POST":
+                return httpx.Response(200, json={"job_id": "abc", "status": "queued"})
+            if request.url.path == "/jobs/abc/result":
+                return httpx.Response(200, json={"failed_transactions": 3})
+            if request.url.path == "/jobs/abc/events":
+                return httpx.Response(404, json={"detail": "Not Found"})
+            return httpx.Response(200, json={"job_id": "abc", "status": next(statuses), "progress": 0.5})
+
+        use_transport(handler)
+        result = await run_job("/jobs/rules/validate/fed_default", poll_interval=0,
+                               on_progress=lambda job: progress.append(job["status"]))
+        self.assertEqual(result, {"failed_transactions": 3})
+        self.assertEqual(progress, ["running", "succeeded"])
+
+    async def test_run_job_follows_progress_events(self):
+        progress = []
+        events = (
+            'event: progress\ndata: {"job_id": "abc", "status": "running", "progress": 0.5}\n\n'
+            'event: done\ndata: {"job_id": "abc", "status": "succeeded", "progress": 1.0}\n\n'
+        )
+
+        def handler(request):
+            if request.method == "POST":
+                return httpx.Response(200, json={"job_id": "abc", "status": "queued"})
+            if request.url.path == "/jobs/abc/events":
+                return httpx.Response(200, text=events, headers={"content-type": "text/event-stream"})
+            if request.url.path == "/jobs/abc/result":
+                return httpx.Response(200, json={"total_anomalies": 2})
+            raise AssertionError("status should not be polled while events stream")
+
+        use_transport(handler)
+        result = await run_job("/jobs/anamoly_detection_pipeline", on_progress=lambda job: progress.append(job["progress"]))
+        self.assertEqual(result, {"total_anomalies": 2})
+        self.assertEqual(progress, [0.5, 1.0])
+
+    async def test_run_job_raises_on_failure(self):
+        def handler(request):
+            if request.method == "POST":
+                return httpx.Response(200, json={"job_id": "abc", "status": "queued"})
+            return httpx.Response(200, json={"job_id": "abc", "status": "failed", "error": "boom"})
+
+        use_transport(handler)
+        with self.assertRaises(BackendError) as context:
+            await run_job("/jobs/anamoly_detection_pipeline", poll_interval=0)
+        self.assertEqual(str(context.exception), "boom")
+
+    def test_format_job_progress(self):
+        job = {"stage": "validate", "progress": 0.42, "rows_per_sec": 5300.4, "eta_seconds": 72,
+               "details": {"rules_completed": 120, "total_rules": 286}}
+        self.assertEqual(format_job_progress(job), "validate · 42% · 120/286 rules · 5,300 rows/sec · ETA 1:12")
+
+
+if __name__ == "__main__":
+    unittest.main()
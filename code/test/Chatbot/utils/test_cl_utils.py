@@ -1,6 +1,9 @@
 import unittest
 from unittest.mock import AsyncMock, patch
-from Chatbot.utils.cl_utils import send_message, send_animated_message
+import pytest
+
+pytest.importorskip("chainlit")
+from Chatbot.utils.cl_utils import send_message, send_animated_message, send_progress_message
 import asyncio
 
 
@@ -40,6 +43,14 @@ class TestCLUtils(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(mock_update.called)
         self.assertGreaterEqual(mock_update.call_count, len(frames))
 
+    @patch("chainlit.Message.update", new_callable=AsyncMock)
+    @patch("chainlit.Message.send", new_callable=AsyncMock)
+    async def test_send_progress_message(self, mock_send, mock_update):
+        update = await send_progress_message("Validating")
+        await update({"stage": "validate", "progress": 0.5, "details": {}})
+        mock_send.assert_called_once()
+        mock_update.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()